@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.profiling.QueryProfilerMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,6 +85,16 @@ DATABASES = {
     'default': env.db('DATABASE_URL', default='sqlite:///db.sqlite3')
 }
 
+# Cache
+# The inventory caches (category tree, scan lookups, live search) are
+# invalidated across requests, so every worker process must share one cache:
+# CACHE_URL=dbcache://jerv_cache (after `manage.py createcachetable`),
+# memcache://... or redis://... The default per-process memory cache is only
+# right for a single process (runserver, tests).
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -140,6 +151,41 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Inventory settings
+# What happens when a stock movement would make stock negative:
+# 'clamp' (stop at zero), 'reject' (refuse the movement) or 'allow_negative'
+INVENTORY_STOCK_POLICY = env('INVENTORY_STOCK_POLICY', default='clamp')
+# Seconds a live search (products/search.json) result is served from cache
+INVENTORY_SEARCH_CACHE_TTL = env.int('INVENTORY_SEARCH_CACHE_TTL', default=30)
+# Per-process barcode scan cache (code -> product id): entries and lifetime in seconds
+INVENTORY_SCAN_LRU_SIZE = env.int('INVENTORY_SCAN_LRU_SIZE', default=50000)
+INVENTORY_SCAN_LRU_TTL = env.int('INVENTORY_SCAN_LRU_TTL', default=300)
+# Seconds a scan payload (which carries the stock) is kept in the shared cache;
+# bounds how stale it gets if a write ever bypasses the invalidation
+INVENTORY_SCAN_CACHE_TTL = env.int('INVENTORY_SCAN_CACHE_TTL', default=60)
+# Product image thumbnails: box sizes in px and background threads (0 renders inline)
+INVENTORY_THUMBNAIL_SIZES = env.list('INVENTORY_THUMBNAIL_SIZES', cast=int, default=[120, 480])
+INVENTORY_THUMBNAIL_WORKERS = env.int('INVENTORY_THUMBNAIL_WORKERS', default=2)
+# Uploaded product images are downscaled so their longer side is at most this many px
+INVENTORY_IMAGE_MAX_DIMENSION = env.int('INVENTORY_IMAGE_MAX_DIMENSION', default=2048)
+# Seconds an image file stored or reused by an upload is kept even if no row
+# references it yet; longer than any upload request (manage.py sweep_image_blobs)
+INVENTORY_IMAGE_BLOB_GRACE = env.int('INVENTORY_IMAGE_BLOB_GRACE', default=3600)
+# Reorder suggestions: lead time of suppliers without their own, and the days
+# of consumption an order covers beyond it
+INVENTORY_REORDER_LEAD_TIME_DAYS = env.int('INVENTORY_REORDER_LEAD_TIME_DAYS', default=7)
+INVENTORY_REORDER_COVER_DAYS = env.int('INVENTORY_REORDER_COVER_DAYS', default=14)
+
+# SQL query profiler (core.profiling.QueryProfilerMiddleware)
+# Share of requests profiled, Server-Timing header, and raising instead of
+# logging when a view exceeds its @query_budget (for tests). The header shows
+# SQL counts and timings to every client, so only development turns it on.
+QUERY_PROFILER_ENABLED = env.bool('QUERY_PROFILER_ENABLED', default=False)
+QUERY_PROFILER_SAMPLE_RATE = env.float('QUERY_PROFILER_SAMPLE_RATE', default=1.0)
+QUERY_PROFILER_HEADER = env.bool('QUERY_PROFILER_HEADER', default=False)
+QUERY_PROFILER_SLOWEST = 5
+QUERY_PROFILER_RAISE = env.bool('QUERY_PROFILER_RAISE', default=False)
+
 # Session settings
 SESSION_COOKIE_AGE = 3600  # 1 hour default
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
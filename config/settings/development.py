@@ -4,6 +4,11 @@ from .base import *
 DEBUG = True
 ENVIRONMENT = 'development'
 
+# Profile every request, show it in Server-Timing and fail loudly on query budget overruns
+QUERY_PROFILER_ENABLED = True
+QUERY_PROFILER_HEADER = True
+QUERY_PROFILER_RAISE = True
+
 # Allow all hosts for development
 ALLOWED_HOSTS = ['*']
 
@@ -24,5 +29,9 @@ LOGGING = {
             'handlers': ['console'],
             'level': 'INFO',
         },
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
     },
 }
\ No newline at end of file
@@ -4,6 +4,11 @@ from .base import *
 DEBUG = False
 ENVIRONMENT = 'production'
 
+# Shared by every gunicorn worker; needs `manage.py createcachetable`
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dbcache://jerv_cache'),
+}
+
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -7,7 +7,8 @@ from django.conf import settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
 django.setup()
 
-from inventory.models import Category, Supplier, Product
+from inventory.importer import import_products
+from inventory.models import Category, Supplier
 
 def create_sample_data():
     print("Creating sample inventory data...")
@@ -75,9 +76,9 @@ def create_sample_data():
         {
             "name": "Dell Laptop Inspiron 15",
             "sku": "DELL-INSP-15-001",
-            "price": 250000,
-            "category": categories["Számítástechnika"],
-            "supplier": suppliers["TechCorp Kft."],
+            "net_price": 250000,
+            "category": "Számítástechnika",
+            "supplier": "TechCorp Kft.",
             "stock_quantity": 5,
             "min_stock_level": 2,
             "description": "15.6\" Full HD laptop, Intel Core i5, 8GB RAM, 256GB SSD"
@@ -85,9 +86,9 @@ def create_sample_data():
         {
             "name": "HP LaserJet Pro nyomtató",
             "sku": "HP-LJP-PRO-001",
-            "price": 45000,
-            "category": categories["Elektronika"],
-            "supplier": suppliers["TechCorp Kft."],
+            "net_price": 45000,
+            "category": "Elektronika",
+            "supplier": "TechCorp Kft.",
             "stock_quantity": 3,
             "min_stock_level": 1,
             "description": "Lézer nyomtató, fekete-fehér, USB és hálózati csatlakozás"
@@ -95,9 +96,9 @@ def create_sample_data():
         {
             "name": "Office szék ergonomikus",
             "sku": "OFFICE-CHAIR-ERG-001",
-            "price": 35000,
-            "category": categories["Bútor"],
-            "supplier": suppliers["FurnitureMax Kft."],
+            "net_price": 35000,
+            "category": "Bútor",
+            "supplier": "FurnitureMax Kft.",
             "stock_quantity": 8,
             "min_stock_level": 3,
             "description": "Fekete ergonomikus irodai szék, állítható magasság"
@@ -105,9 +106,9 @@ def create_sample_data():
         {
             "name": "A4 papír 500 lap",
             "sku": "PAPER-A4-500-001",
-            "price": 1200,
-            "category": categories["Irodaszer"],
-            "supplier": suppliers["OfficePlus Zrt."],
+            "net_price": 1200,
+            "category": "Irodaszer",
+            "supplier": "OfficePlus Zrt.",
             "stock_quantity": 50,
             "min_stock_level": 10,
             "description": "80g/m² A4 fehér papír, 500 lapos csomag"
@@ -115,9 +116,9 @@ def create_sample_data():
         {
             "name": "Logitech vezeték nélküli egér",
             "sku": "LOGI-MOUSE-WL-001",
-            "price": 8500,
-            "category": categories["Számítástechnika"],
-            "supplier": suppliers["TechCorp Kft."],
+            "net_price": 8500,
+            "category": "Számítástechnika",
+            "supplier": "TechCorp Kft.",
             "stock_quantity": 12,
             "min_stock_level": 5,
             "description": "Vezeték nélküli optikai egér, USB receiver"
@@ -125,30 +126,20 @@ def create_sample_data():
         {
             "name": "Pilot toll kék",
             "sku": "PILOT-PEN-BLUE-001",
-            "price": 250,
-            "category": categories["Irodaszer"],
-            "supplier": suppliers["OfficePlus Zrt."],
+            "net_price": 250,
+            "category": "Irodaszer",
+            "supplier": "OfficePlus Zrt.",
             "stock_quantity": 100,
             "min_stock_level": 20,
             "description": "Kék golyóstoll, 0.7mm, dobozban 12 db"
         },
     ]
 
-    for prod_data in products_data:
-        prod, created = Product.objects.get_or_create(
-            sku=prod_data["sku"],
-            defaults={
-                "name": prod_data["name"],
-                "price": prod_data["price"],
-                "category": prod_data["category"],
-                "supplier": prod_data["supplier"],
-                "stock_quantity": prod_data["stock_quantity"],
-                "min_stock_level": prod_data["min_stock_level"],
-                "description": prod_data["description"]
-            }
-        )
-        if created:
-            print(f"Created product: {prod.name} ({prod.sku})")
+    # Upsert by SKU in one statement; existing products keep their stock
+    result = import_products(enumerate(products_data, start=1))
+    print(f"Products: {result.created} created, {result.updated} updated")
+    for line, message in result.errors:
+        print(f"Product {line}: {message}")
 
     print("Sample data creation completed!")
 
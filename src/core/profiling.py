@@ -0,0 +1,153 @@
+"""
+Per-request SQL query profiling.
+
+QueryProfilerMiddleware records every query a sampled request runs (count,
+total time, repeated statements, the slowest ones), reports them in a
+structured log line (and a Server-Timing header with QUERY_PROFILER_HEADER,
+development only), and enforces the query
+budget a view declares with @query_budget:
+
+    @query_budget(12)
+    def product_list(request): ...
+
+Over budget requests are logged as warnings, or raise QueryBudgetExceeded
+when QUERY_PROFILER_RAISE is set (use it in tests to catch N+1 regressions).
+Queries run while a StreamingHttpResponse is consumed are not counted.
+"""
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryProfile:
+    """Queries recorded by profile_queries()"""
+
+    def __init__(self):
+        self.queries = []  # (alias, sql, params, seconds)
+
+    def record(self, alias, sql, params, seconds):
+        self.queries.append((alias, sql, params, seconds))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(seconds for *_, seconds in self.queries) * 1000
+
+    @property
+    def duplicates(self):
+        """Queries repeated with the very same SQL and parameters"""
+        exact = Counter((alias, sql, repr(params)) for alias, sql, params, _ in self.queries)
+        return sum(n - 1 for n in exact.values())
+
+    def repeated(self, limit=3):
+        """Statements run most often with different parameters - the N+1 suspects"""
+        statements = Counter(sql for _, sql, _, _ in self.queries)
+        return [(sql, n) for sql, n in statements.most_common(limit) if n > 1]
+
+    def slowest(self, limit=5):
+        ordered = sorted(self.queries, key=lambda query: query[3], reverse=True)
+        return [(sql, round(seconds * 1000, 2)) for _, sql, _, seconds in ordered[:limit]]
+
+    def server_timing(self):
+        return f'db;dur={self.total_ms:.1f};desc="{self.count} queries, {self.duplicates} duplicates"'
+
+    def as_dict(self, slowest=5):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.total_ms, 2),
+            'duplicates': self.duplicates,
+            'repeated': [{'sql': sql, 'count': n} for sql, n in self.repeated()],
+            'slowest': [{'sql': sql, 'ms': ms} for sql, ms in self.slowest(slowest)],
+        }
+
+
+@contextmanager
+def profile_queries(aliases=None):
+    """Record the queries run on the given (default: all) database connections"""
+    profile = QueryProfile()
+
+    def wrapper_for(alias):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                profile.record(alias, sql, params, time.perf_counter() - start)
+        return wrapper
+
+    with ExitStack() as stack:
+        for alias in aliases or connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper_for(alias)))
+        yield profile
+
+
+def query_budget(max_queries):
+    """Declare how many queries a view may run per request"""
+    def decorator(view_func):
+        # Decorators applied on top (login_required...) copy the attribute along
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def check_budget(profile, budget, label, raise_error=False):
+    """Log (or raise, with QUERY_PROFILER_RAISE) when `profile` exceeds `budget` queries"""
+    if budget is None or profile.count <= budget:
+        return
+    message = f"{label} ran {profile.count} queries, budget is {budget}"
+    if raise_error or getattr(settings, 'QUERY_PROFILER_RAISE', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message, extra={'query_profile': profile.as_dict()})
+
+
+class QueryProfilerMiddleware:
+    """Profile sampled requests; see the module docstring for the settings"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self._sampled():
+            return self.get_response(request)
+
+        request.query_budget = None
+        with profile_queries() as profile:
+            response = self.get_response(request)
+
+        data = profile.as_dict(getattr(settings, 'QUERY_PROFILER_SLOWEST', 5))
+        data.update(method=request.method, path=request.path, status=response.status_code)
+        logger.info(
+            "%s %s: %d queries in %.1f ms (%d duplicates)",
+            request.method, request.path, profile.count, profile.total_ms, profile.duplicates,
+            extra={'query_profile': data},
+        )
+        if getattr(settings, 'QUERY_PROFILER_HEADER', settings.DEBUG):
+            response['Server-Timing'] = profile.server_timing()
+        check_budget(profile, request.query_budget, f"{request.method} {request.path}")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'query_budget'):
+            request.query_budget = getattr(view_func, 'query_budget', None)
+
+    @staticmethod
+    def _sampled():
+        if not getattr(settings, 'QUERY_PROFILER_ENABLED', False):
+            return False
+        rate = getattr(settings, 'QUERY_PROFILER_SAMPLE_RATE', 1.0)
+        return rate >= 1 or random.random() < rate
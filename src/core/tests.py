@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import (
+    QueryBudgetExceeded, QueryProfilerMiddleware, check_budget, profile_queries, query_budget,
+)
+from inventory import scan
+from inventory.models import Category, Product
+
+
+def run_queries(count):
+    def view(request):
+        for _ in range(count):
+            get_user_model().objects.exists()
+        return HttpResponse('ok')
+    return view
+
+
+@override_settings(
+    QUERY_PROFILER_ENABLED=True, QUERY_PROFILER_HEADER=True, QUERY_PROFILER_RAISE=False, QUERY_PROFILER_SAMPLE_RATE=1.0,
+)
+class QueryProfilerMiddlewareTests(TestCase):
+    def get(self, view):
+        """Run `view` through the middleware the way the handler does"""
+        request = RequestFactory().get('/stub/')
+        request.user = AnonymousUser()
+
+        def get_response(request):
+            return middleware.process_view(request, view, (), {}) or view(request)
+
+        middleware = QueryProfilerMiddleware(get_response)
+        return middleware(request)
+
+    def test_within_budget(self):
+        response = self.get(query_budget(2)(run_queries(2)))
+        self.assertIn('desc="2 queries, 1 duplicates"', response['Server-Timing'])
+
+    @override_settings(QUERY_PROFILER_HEADER=False)
+    def test_header_can_be_turned_off(self):
+        response = self.get(query_budget(2)(run_queries(2)))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(QUERY_PROFILER_RAISE=True)
+    def test_over_budget_raises(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "GET /stub/ ran 3 queries, budget is 2"):
+            self.get(query_budget(2)(run_queries(3)))
+
+    def test_over_budget_logs(self):
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            self.get(query_budget(2)(run_queries(3)))
+        self.assertEqual(logs.records[0].query_profile['queries'], 3)
+
+    @override_settings(QUERY_PROFILER_RAISE=True)
+    def test_views_without_budget(self):
+        self.assertEqual(self.get(run_queries(5)).status_code, 200)
+
+    @override_settings(QUERY_PROFILER_RAISE=True)
+    def test_budget_survives_outer_decorators(self):
+        view = login_required(query_budget(1)(run_queries(2)))
+        self.assertEqual(view.query_budget, 1)
+        request = RequestFactory().get('/stub/')
+        request.user = get_user_model().objects.create_user('raktar')
+        middleware = QueryProfilerMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+        with self.assertRaises(QueryBudgetExceeded):
+            middleware(request)
+
+    @override_settings(QUERY_PROFILER_SAMPLE_RATE=0.0, QUERY_PROFILER_RAISE=True)
+    def test_unsampled_requests_are_not_checked(self):
+        response = self.get(query_budget(0)(run_queries(3)))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_check_budget(self):
+        with profile_queries() as profile:
+            run_queries(2)(None)
+        self.assertEqual(profile.count, 2)
+        self.assertEqual(profile.repeated(), [(profile.queries[0][1], 2)])
+        check_budget(profile, 2, 'stub', raise_error=True)
+        check_budget(profile, None, 'stub', raise_error=True)
+        with self.assertRaises(QueryBudgetExceeded):
+            check_budget(profile, 1, 'stub', raise_error=True)
+
+
+@override_settings(QUERY_PROFILER_ENABLED=True, QUERY_PROFILER_RAISE=True, QUERY_PROFILER_SAMPLE_RATE=1.0)
+class QueryBudgetTests(TestCase):
+    """The JSON endpoints stay within their declared budgets, session and user lookups included"""
+
+    def setUp(self):
+        cache.clear()
+        scan.local_codes.clear()
+        self.client.force_login(get_user_model().objects.create_user('raktar'))
+        category = Category.objects.create(name="Papír")
+        for i in range(30):
+            Product.objects.create(name=f"Füzet {i:02}", sku=f'F-{i:02}', net_price=100, category=category)
+
+    def test_product_search(self):
+        response = self.client.get(reverse('inventory:product_search_json'), {'q': 'füzet'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'])
+
+    def test_scan_lookup(self):
+        for _ in range(2):
+            response = self.client.get(reverse('inventory:scan_lookup', args=['F-01']))
+            self.assertEqual(response.json()['sku'], 'F-01')
+
+    def test_scan_batch(self):
+        codes = '&'.join(f'code=F-{i:02}' for i in range(30))
+        response = self.client.get(reverse('inventory:scan_batch') + '?' + codes)
+        self.assertEqual(len(response.json()['results']), 30)
@@ -1,36 +1,97 @@
-from django.contrib import admin
-from .models import Category, Supplier, Product, StockMovement, ProductImage
+import io
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.template.response import TemplateResponse
+from django.urls import path
+from core.profiling import check_budget, profile_queries
+from .forms import ProductImportUploadForm
+from .importer import import_products, read_csv
+from .models import Category, Supplier, Product, StockMovement, ProductImage, PriceChange
+from .search import search_products
+
+
+class QueryBudgetMixin:
+    """
+    Fail loudly when a changelist page issues more than
+    `changelist_query_budget` queries, which is how N+1 regressions show up.
+    Raises in DEBUG, logs a warning otherwise.
+    """
+    changelist_query_budget = None
+
+    def changelist_view(self, request, extra_context=None):
+        if self.changelist_query_budget is None:
+            return super().changelist_view(request, extra_context)
+
+        with profile_queries() as profile:
+            response = super().changelist_view(request, extra_context)
+            # The changelist is a TemplateResponse: render inside the profiled block
+            if hasattr(response, 'render'):
+                response.render()
+
+        check_budget(
+            profile, self.changelist_query_budget, f"{type(self).__name__} changelist", raise_error=settings.DEBUG
+        )
+        return response
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'parent', 'get_product_count']
+class CategoryAdmin(QueryBudgetMixin, admin.ModelAdmin):
+    list_display = ['name', 'full_name', 'get_product_count']
     list_filter = ['parent']
     search_fields = ['name', 'description']
     ordering = ['name']
+    changelist_query_budget = 10
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(product_count=Count('product'))
 
     def get_product_count(self, obj):
-        return obj.product_set.count()
+        return obj.product_count
     get_product_count.short_description = "Termékek száma"
+    get_product_count.admin_order_field = 'product_count'
 
 
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
-    list_display = ['name', 'contact_person', 'email', 'phone']
+    list_display = ['name', 'contact_person', 'email', 'phone', 'lead_time_days']
     search_fields = ['name', 'contact_person', 'email']
     ordering = ['name']
 
 
+class PriceChangeInline(admin.TabularInline):
+    """Read-only price history on the product page"""
+    model = PriceChange
+    fields = ['valid_from', 'net_price', 'vat_rate', 'source', 'changed_by']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('changed_by')
+
+
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(QueryBudgetMixin, admin.ModelAdmin):
     list_display = [
         'name', 'sku', 'brutto_price', 'image_count', 'stock_quantity',
         'min_stock_level', 'category', 'supplier', 'stock_status'
     ]
     list_filter = ['category', 'supplier']
+    list_select_related = ['category', 'supplier']
     search_fields = ['name', 'sku', 'ean13', 'description']
     ordering = ['name']
     readonly_fields = ['created_at', 'updated_at', 'brutto_price']
+    inlines = [PriceChangeInline]
+    changelist_query_budget = 12
 
     fieldsets = (
         ('Alapadatok', {
@@ -51,13 +112,67 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='inventory_product_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a CSV file and upsert its products by SKU"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+
+        result = None
+        if request.method == 'POST':
+            form = ProductImportUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                stream = io.TextIOWrapper(form.cleaned_data['file'], encoding='utf-8-sig', newline='')
+                try:
+                    result = import_products(
+                        read_csv(stream), dry_run=form.cleaned_data['dry_run'], user=request.user,
+                    )
+                except UnicodeDecodeError:
+                    form.add_error('file', "A fájl nem UTF-8 kódolású.")
+                else:
+                    level = messages.SUCCESS if result.ok else messages.WARNING
+                    self.message_user(
+                        request,
+                        f"{result.created} új, {result.updated} frissített termék, {len(result.errors)} hibás sor.",
+                        level,
+                    )
+        else:
+            form = ProductImportUploadForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Termékek importálása",
+            'form': form,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/inventory/product/import.html', context)
+
+    def save_model(self, request, obj, form, change):
+        """Record who changed the price"""
+        obj.save(changed_by=request.user)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Use the indexed product search instead of icontains over search_fields"""
+        return search_products(queryset, search_term), False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_image_count().with_brutto_price()
+
     def image_count(self, obj):
         return obj.image_count
     image_count.short_description = "Képek száma"
+    image_count.admin_order_field = 'image_total'
 
     def brutto_price(self, obj):
         return f"{obj.brutto_price:.2f} Ft"
     brutto_price.short_description = "Bruttó ár"
+    brutto_price.admin_order_field = 'annotated_brutto_price'
 
     def stock_status(self, obj):
         if obj.stock_quantity == 0:
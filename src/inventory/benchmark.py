@@ -0,0 +1,227 @@
+"""
+Benchmarks of the inventory hot paths.
+
+Each scenario issues one request through the test client (middleware, view,
+template and all) against a synthetic data set and is timed `repeat` times
+after `warmup` untimed runs. Results are plain dicts, so runs on SQLite and
+PostgreSQL, or before and after a change, can be saved as JSON and compared:
+
+    manage.py benchmark_inventory --products 20000 --output base.json
+    manage.py benchmark_inventory --products 20000 --compare base.json
+
+compare() flags a scenario whose median time grew by more than `threshold`
+or which runs more queries than in the baseline.
+"""
+import math
+import platform
+import statistics
+import time
+from dataclasses import dataclass
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.profiling import profile_queries
+
+from .models import Category, Product
+from .synthetic import NOUNS
+
+
+# Settings that would otherwise add work to every timed request; a private
+# cache so clearing it between scenarios leaves the real one alone
+BENCHMARK_SETTINGS = {
+    'DEBUG': False,
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'inventory-benchmark',
+        },
+    },
+    'ALLOWED_HOSTS': ['testserver'],
+    'SECURE_SSL_REDIRECT': False,
+    'QUERY_PROFILER_ENABLED': False,
+}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+@dataclass
+class Scenario:
+    """One request: `url(context, run)` and, for POST, `data(context, run)`"""
+    name: str
+    url: object
+    data: object = None
+    status: int = 200
+
+    def request(self, client, context, run):
+        url = self.url(context, run)
+        if self.data is None:
+            return client.get(url)
+        return client.post(url, self.data(context, run))
+
+
+class Context:
+    """Objects the scenarios request, sampled once per data set"""
+
+    SAMPLE_SIZE = 50
+
+    def __init__(self):
+        bounds = Product.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            raise BenchmarkError("There are no products to benchmark")
+        # Spread over the whole table, one indexed lookup each
+        step = max(1, (bounds['high'] - bounds['low']) // self.SAMPLE_SIZE)
+        self.products = sorted({
+            Product.objects.filter(pk__gte=pk).order_by('pk').values_list('pk', 'sku')[:1].get()
+            for pk in range(bounds['low'], bounds['high'] + 1, step)
+        })[:self.SAMPLE_SIZE]
+        self.category_id = Category.objects.filter(depth=0).order_by('pk').values_list('pk', flat=True).first()
+        self.term = NOUNS[0]
+
+    def product_id(self, run):
+        return self.products[run % len(self.products)][0]
+
+    def product_code(self, run):
+        return self.products[run % len(self.products)][1]
+
+
+def _url(name):
+    return lambda context, run: reverse(name)
+
+
+def _search_url(name):
+    return lambda context, run: f'{reverse(name)}?q={context.term}'
+
+
+SCENARIOS = [
+    Scenario('product_list', _url('inventory:product_list')),
+    Scenario('product_list_search', _search_url('inventory:product_list')),
+    Scenario('product_list_category', lambda context, run: (
+        f"{reverse('inventory:product_list')}?category={context.category_id or ''}"
+    )),
+    Scenario('product_search_json', _search_url('inventory:product_search_json')),
+    Scenario('product_warnings', _url('inventory:product_warnings')),
+    Scenario('product_detail', lambda context, run: (
+        reverse('inventory:product_detail', args=[context.product_id(run)])
+    )),
+    Scenario(
+        'stock_movement_create',
+        _url('inventory:stock_movement_create'),
+        data=lambda context, run: {
+            'code': context.product_code(run),
+            'movement_type': 'IN',
+            'quantity': 1,
+            'reason': 'benchmark',
+        },
+        status=302,
+    ),
+    Scenario('stock_movement_list', _url('inventory:stock_movement_list')),
+    Scenario('valuation_report', _url('inventory:valuation_report')),
+    Scenario('reorder_suggestions', _url('inventory:reorder_suggestions')),
+    Scenario('admin_product_changelist', _url('admin:inventory_product_changelist')),
+    Scenario('admin_product_search', _search_url('admin:inventory_product_changelist')),
+    Scenario('admin_category_changelist', _url('admin:inventory_category_changelist')),
+]
+
+
+def get_scenarios(names=None):
+    if not names:
+        return SCENARIOS
+    by_name = {scenario.name: scenario for scenario in SCENARIOS}
+    unknown = set(names) - set(by_name)
+    if unknown:
+        raise BenchmarkError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return [by_name[name] for name in names]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_scenario(scenario, client, context, repeat=20, warmup=3):
+    """Timings (ms) and query counts of one scenario"""
+    timings = []
+    queries = []
+    for run in range(warmup + repeat):
+        with profile_queries() as profile:
+            start = time.perf_counter()
+            response = scenario.request(client, context, run)
+            elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != scenario.status:
+            raise BenchmarkError(
+                f"{scenario.name} returned {response.status_code}, expected {scenario.status}"
+            )
+        if run >= warmup:
+            timings.append(elapsed)
+            queries.append(profile.count)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': max(queries),
+    }
+
+
+def database_info():
+    version = ''
+    if connection.vendor == 'postgresql':
+        version = connection.pg_version
+    elif connection.vendor == 'sqlite':
+        version = connection.Database.sqlite_version
+    return {'vendor': connection.vendor, 'version': str(version)}
+
+
+def run(user, scenarios=None, repeat=20, warmup=3, shape=None):
+    """Run `scenarios` logged in as `user`; returns the JSON-serializable results"""
+    results = {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'database': database_info(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'warmup': warmup,
+            'shape': shape or {},
+        },
+        'scenarios': {},
+    }
+    with override_settings(**BENCHMARK_SETTINGS):
+        client = Client()
+        client.force_login(user)
+        context = Context()
+        for scenario in get_scenarios(scenarios):
+            cache.clear()
+            results['scenarios'][scenario.name] = run_scenario(scenario, client, context, repeat, warmup)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    (scenario, message) pairs for every regression of `results` against
+    `baseline`: median slower by more than `threshold`, or more queries.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['median_ms'] > previous['median_ms'] * (1 + threshold):
+            regressions.append((name, (
+                f"median {previous['median_ms']:.2f} ms -> {current['median_ms']:.2f} ms "
+                f"(+{current['median_ms'] / previous['median_ms'] * 100 - 100:.0f}%)"
+            )))
+        if current['queries'] > previous['queries']:
+            regressions.append((name, f"queries {previous['queries']} -> {current['queries']}"))
+    return regressions
@@ -0,0 +1,81 @@
+"""
+Cached category tree.
+
+Categories change a few times a week but are read on every product page
+and form, so the serialized tree is kept in the shared cache under a
+version number that is bumped whenever a category changes. Bumping the
+version (instead of deleting the key) means a request that read the old
+tree cannot write it back after the change. Every worker must see the
+same cache for the bump to reach it (see CACHES in the settings).
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+
+VERSION_KEY = 'inventory:category-tree:version'
+TREE_KEY = 'inventory:category-tree:{}'
+TREE_TIMEOUT = 24 * 60 * 60
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def get_category_tree():
+    """All categories as dicts (id, name, full_name, path, depth, parent_id), in tree order"""
+    from .models import Category
+
+    key = TREE_KEY.format(_version())
+    tree = cache.get(key)
+    if tree is None:
+        tree = tree_order(Category.objects.values('id', 'name', 'full_name', 'path', 'depth', 'parent_id'))
+        cache.set(key, tree, TREE_TIMEOUT)
+    return tree
+
+
+def tree_order(categories):
+    """
+    Category dicts depth first, every category followed by its subtree and
+    siblings by name. Sorting by full_name is not enough: "Zöld (régi)"
+    sorts between "Zöld" and "Zöld > Alma".
+    """
+    children = {}
+    for category in categories:
+        children.setdefault(category['parent_id'], []).append(category)
+    for siblings in children.values():
+        siblings.sort(key=lambda category: (category['name'].lower(), category['id']), reverse=True)
+
+    ordered = []
+    stack = list(children.get(None, []))
+    while stack:
+        category = stack.pop()
+        ordered.append(category)
+        stack.extend(children.get(category['id'], []))
+    return ordered
+
+
+def get_category_path(category_id):
+    """Materialized path of a category from the cached tree, None if unknown"""
+    try:
+        category_id = int(category_id)
+    except (TypeError, ValueError):
+        return None
+    for category in get_category_tree():
+        if category['id'] == category_id:
+            return category['path']
+    return None
+
+
+def invalidate_category_tree():
+    """Switch readers to a fresh tree once the current transaction commits"""
+    def bump():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, 1, None)
+
+    transaction.on_commit(bump)
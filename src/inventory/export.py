@@ -0,0 +1,173 @@
+"""
+Streaming product export.
+
+Rows are read with values_list().iterator(), which uses a server-side cursor
+on PostgreSQL, and written straight into a StreamingHttpResponse, so memory
+use does not depend on the number of exported products. XLSX files are
+assembled with zipfile on the fly; no spreadsheet library is needed.
+"""
+import csv
+import itertools
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from .models import calculate_brutto_many
+
+
+EXPORT_CHUNK_SIZE = 2000
+STREAM_BUFFER_SIZE = 64 * 1024
+
+EXPORT_HEADERS = [
+    "Cikkszám", "EAN-13", "Név", "Kategória", "Szállító",
+    "Nettó ár", "ÁFA kulcs (%)", "Bruttó ár", "Készlet", "Minimum készlet",
+]
+
+
+def product_rows(queryset):
+    """Export rows of a Product queryset, in name order"""
+    rows = queryset.order_by('name', 'id').values_list(
+        'sku', 'ean13', 'name', 'category__full_name', 'supplier__name',
+        'net_price', 'vat_rate', 'stock_quantity', 'min_stock_level',
+    )
+    rows = rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while chunk := list(itertools.islice(rows, EXPORT_CHUNK_SIZE)):
+        # Brutto prices are computed column-wise, a chunk at a time
+        brutto_prices = calculate_brutto_many([row[5] for row in chunk], [row[6] for row in chunk])
+        for (sku, ean13, name, category, supplier, net_price, vat_rate, stock, min_level), brutto in zip(
+            chunk, brutto_prices
+        ):
+            yield (
+                sku, ean13 or '', name, category or '', supplier or '',
+                net_price, vat_rate, brutto, stock, min_level,
+            )
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+# Spreadsheets evaluate a cell starting with these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    """Text cells that would be read as a formula get a leading apostrophe"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows, headers=EXPORT_HEADERS):
+    """CSV lines; the BOM and the semicolon delimiter make Excel open it as is"""
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '﻿' + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+class _StreamBuffer:
+    """Unseekable file object collecting zipfile output until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+        self.pending = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        self.pending += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Termékek" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_TAIL = '</sheetData></worksheet>'
+
+# Control characters are not allowed in XML 1.0
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_INVALID.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(rows, headers=EXPORT_HEADERS):
+    """XLSX file bytes with one worksheet, compressed and yielded as it is written"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((SHEET_HEAD + _xlsx_row(headers)).encode())
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode())
+                if buffer.pending >= STREAM_BUFFER_SIZE:
+                    yield buffer.drain()
+            sheet.write(SHEET_TAIL.encode())
+    yield buffer.drain()
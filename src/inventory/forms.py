@@ -1,5 +1,13 @@
+import datetime
+
 from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
+from django.utils import timezone
+from . import scan
+from .categories import get_category_tree
 from .models import Product, Category, Supplier, StockMovement, ProductImage
 from decimal import Decimal
 
@@ -12,6 +20,32 @@ def validate_image_size(value):
             raise ValidationError('A kép mérete nem lehet nagyobb 5MB-nál.')
 
 
+def ean13_check_digit(code):
+    """Check digit for the first 12 digits of an EAN-13 code"""
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(code[:12]))
+    return str((10 - total % 10) % 10)
+
+
+class CachedCategoryIterator(ModelChoiceIterator):
+    """Category choices from the cached tree instead of a query per render"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for category in get_category_tree():
+            yield (category['id'], category['full_name'])
+
+    def __len__(self):
+        return len(get_category_tree()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_category_tree())
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    iterator = CachedCategoryIterator
+
+
 class ProductForm(forms.ModelForm):
     """Form for Product model with custom validation"""
 
@@ -41,6 +75,9 @@ class ProductForm(forms.ModelForm):
             'name', 'description', 'sku', 'ean13', 'net_price', 'vat_rate',
             'category', 'supplier', 'stock_quantity', 'min_stock_level'
         ]
+        field_classes = {
+            'category': CategoryChoiceField,
+        }
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
             'net_price': forms.NumberInput(attrs={'step': '0.01'}),
@@ -86,7 +123,7 @@ class ProductForm(forms.ModelForm):
         price_input_type = cleaned_data.get('price_input_type')
         net_price = cleaned_data.get('net_price')
         gross_price = cleaned_data.get('gross_price')
-        vat_rate = cleaned_data.get('vat_rate', 27.00)
+        vat_rate = cleaned_data.get('vat_rate', Decimal('27.00'))
 
         if price_input_type == 'gross':
             if not gross_price:
@@ -109,13 +146,35 @@ class ProductForm(forms.ModelForm):
             # Basic EAN-13 validation (13 digits)
             if not ean13.isdigit() or len(ean13) != 13:
                 raise forms.ValidationError('Az EAN-13 vonalkódnak 13 számjegyből kell állnia.')
+            if ean13[12] != ean13_check_digit(ean13):
+                raise forms.ValidationError('Az EAN-13 vonalkód ellenőrző számjegye hibás.')
         return ean13
 
 
+class ProductImportForm(ProductForm):
+    """
+    ProductForm rules for one import row. Category, supplier and uniqueness
+    are resolved in bulk by inventory.importer, not per row.
+    """
+
+    class Meta(ProductForm.Meta):
+        fields = [
+            'name', 'description', 'sku', 'ean13', 'net_price', 'vat_rate',
+            'stock_quantity', 'min_stock_level'
+        ]
+
+    def validate_unique(self):
+        # Existing SKUs are updated, not rejected
+        pass
+
+
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
         fields = ['name', 'description', 'parent']
+        field_classes = {
+            'parent': CategoryChoiceField,
+        }
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
         }
@@ -124,12 +183,26 @@ class CategoryForm(forms.ModelForm):
 class SupplierForm(forms.ModelForm):
     class Meta:
         model = Supplier
-        fields = ['name', 'contact_person', 'email', 'phone', 'address']
+        fields = ['name', 'contact_person', 'email', 'phone', 'address', 'lead_time_days']
         widgets = {
             'address': forms.Textarea(attrs={'rows': 3}),
         }
 
 
+class ProductImportUploadForm(forms.Form):
+    """Admin upload of a product CSV file"""
+
+    file = forms.FileField(
+        label='CSV fájl',
+        help_text='Fejléc: cikkszám, név, nettó vagy bruttó ár, ÁFA kulcs, kategória, szállító...'
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label='Csak ellenőrzés',
+        help_text='A sorok ellenőrzése mentés nélkül.'
+    )
+
+
 class ProductImageForm(forms.ModelForm):
     """Form for ProductImage model"""
 
@@ -147,7 +220,12 @@ class ProductImageForm(forms.ModelForm):
             validate_image_size(image)
         return image
 class StockMovementForm(forms.ModelForm):
-    """Form for StockMovement model"""
+    """Form for StockMovement model; the product is given by its SKU or EAN-13 code"""
+
+    code = forms.CharField(
+        label='Termék',
+        widget=forms.TextInput(attrs={'placeholder': 'Cikkszám vagy EAN-13', 'autofocus': True})
+    )
 
     class Meta:
         model = StockMovement
@@ -159,6 +237,18 @@ class StockMovementForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.product = kwargs.pop('product', None)
         super().__init__(*args, **kwargs)
+        if self.product:
+            # Booked for a given product (see save())
+            del self.fields['code']
+
+    def clean_code(self):
+        """Resolve the code like a scan, without listing the catalog"""
+        code = self.cleaned_data['code'].strip()
+        payload = scan.lookup(code)
+        if payload is None:
+            raise forms.ValidationError('Ismeretlen cikkszám vagy EAN-13 kód.')
+        self.instance.product_id = payload['id']
+        return code
 
     def save(self, commit=True):
         instance = super().save(commit=False)
@@ -166,4 +256,116 @@ class StockMovementForm(forms.ModelForm):
             instance.product = self.product
         if commit:
             instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+class StockMovementFilterForm(forms.Form):
+    """Filters of the stock movement list; each one is backed by an index"""
+
+    date_from = forms.DateField(
+        required=False,
+        label='Dátumtól',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        label='Dátumig',
+        widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    code = forms.CharField(
+        required=False,
+        label='Termék',
+        widget=forms.TextInput(attrs={'placeholder': 'Cikkszám vagy EAN-13'})
+    )
+    # Set by links from a product page instead of a typed code
+    product = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    movement_type = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Összes típus')] + StockMovement.MOVEMENT_TYPES,
+        label='Típus'
+    )
+    created_by = forms.ModelChoiceField(
+        queryset=get_user_model().objects.order_by('username'),
+        required=False,
+        empty_label='Összes felhasználó',
+        label='Rögzítő'
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('A kezdő dátum nem lehet későbbi a záró dátumnál.')
+
+        code = (cleaned_data.get('code') or '').strip()
+        if code:
+            payload = scan.lookup(code)
+            if payload is None:
+                self.add_error('code', 'Ismeretlen cikkszám vagy EAN-13 kód.')
+            else:
+                cleaned_data['product'] = payload['id']
+        return cleaned_data
+
+    @staticmethod
+    def _day_start(day):
+        start = datetime.datetime.combine(day, datetime.time.min)
+        return timezone.make_aware(start) if settings.USE_TZ else start
+
+    def filter(self, movements):
+        """Apply the cleaned filters to a StockMovement queryset"""
+        data = self.cleaned_data
+        # Plain range conditions on created_at, not __date, so the indexes apply
+        if data.get('date_from'):
+            movements = movements.filter(created_at__gte=self._day_start(data['date_from']))
+        if data.get('date_to'):
+            movements = movements.filter(
+                created_at__lt=self._day_start(data['date_to'] + datetime.timedelta(days=1))
+            )
+        if data.get('product'):
+            movements = movements.filter(product_id=data['product'])
+        if data.get('movement_type'):
+            movements = movements.filter(movement_type=data['movement_type'])
+        if data.get('created_by'):
+            movements = movements.filter(created_by=data['created_by'])
+        return movements
+
+
+class StockMovementBatchForm(forms.Form):
+    """Batch booking: one movement type and reason, many `code quantity` lines"""
+
+    movement_type = forms.ChoiceField(
+        choices=StockMovement.MOVEMENT_TYPES,
+        initial='IN',
+        label='Mozgás típusa'
+    )
+    reason = forms.CharField(
+        required=False,
+        label='Indok',
+        widget=forms.Textarea(attrs={'rows': 2})
+    )
+    lines = forms.CharField(
+        label='Tételek',
+        help_text='Soronként egy tétel: cikkszám vagy EAN-13, majd a mennyiség (pl. "SKU-001;10").',
+        widget=forms.Textarea(attrs={'rows': 12})
+    )
+
+    def clean_lines(self):
+        """Parse `code;quantity` (or whitespace separated) lines"""
+        parsed = []
+        for number, raw in enumerate(self.cleaned_data['lines'].splitlines(), start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            parts = raw.replace(';', ' ').replace('\t', ' ').split()
+            if len(parts) != 2:
+                raise forms.ValidationError(f'{number}. sor: a formátum "cikkszám;mennyiség".')
+            parsed.append({'code': parts[0], 'quantity': parts[1]})
+        if not parsed:
+            raise forms.ValidationError('Legalább egy tételt meg kell adni.')
+        return parsed
+
+    def get_lines(self):
+        """Lines in the format expected by ledger.book_movements"""
+        return [
+            dict(line, movement_type=self.cleaned_data['movement_type'], reason=self.cleaned_data['reason'])
+            for line in self.cleaned_data['lines']
+        ]
@@ -0,0 +1,300 @@
+"""
+Bulk product import with upsert by SKU.
+
+Rows are streamed from CSV and handled in chunks: every row is validated
+with the ProductForm rules (ProductImportForm), categories and suppliers
+are resolved from in-memory maps, uniqueness is checked with one query per
+chunk and the valid rows are written with a single
+bulk_create(update_conflicts=True). Invalid rows are reported with their
+line number and never stop the rest of the file.
+
+Existing products are only updated in the columns the file has; a file
+with just sku;name;net_price leaves the description, categories, VAT rate
+etc. as they are. Missing columns of such rows are validated with the
+stored values, and DEFAULTS fill in for new products only.
+
+Stock of existing products is left alone: it only changes through the
+stock ledger. The stock column is used for new products only.
+"""
+import csv
+import itertools
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+
+from . import prices, scan, valuation
+from .categories import get_category_tree
+from .export import FORMULA_PREFIXES
+from .forms import ProductImportForm
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+# CSV header -> field; the Hungarian headers are the ones of the product export
+COLUMN_ALIASES = {
+    'sku': 'sku', 'cikkszám': 'sku',
+    'ean13': 'ean13', 'ean-13': 'ean13',
+    'name': 'name', 'név': 'name',
+    'description': 'description', 'leírás': 'description',
+    'category': 'category', 'kategória': 'category',
+    'supplier': 'supplier', 'szállító': 'supplier',
+    'net_price': 'net_price', 'nettó ár': 'net_price',
+    'gross_price': 'gross_price', 'bruttó ár': 'gross_price',
+    'vat_rate': 'vat_rate', 'áfa kulcs (%)': 'vat_rate',
+    'stock_quantity': 'stock_quantity', 'készlet': 'stock_quantity',
+    'min_stock_level': 'min_stock_level', 'minimum készlet': 'min_stock_level',
+}
+
+DECIMAL_FIELDS = ['net_price', 'gross_price', 'vat_rate']
+DEFAULTS = {'vat_rate': '27.00', 'stock_quantity': '0', 'min_stock_level': '0'}
+
+# Column -> field it updates on existing products
+UPDATE_FIELDS = {
+    'name': 'name', 'description': 'description', 'ean13': 'ean13',
+    'net_price': 'net_price', 'gross_price': 'net_price', 'vat_rate': 'vat_rate',
+    'category': 'category', 'supplier': 'supplier', 'min_stock_level': 'min_stock_level',
+}
+# Stored values standing in for the columns a row does not have
+CURRENT_FIELDS = ['name', 'description', 'ean13', 'net_price', 'vat_rate', 'stock_quantity', 'min_stock_level']
+
+LOW_STOCK = ExpressionWrapper(
+    Q(stock_quantity__lte=F('min_stock_level')) | Q(stock_quantity__lt=0),
+    output_field=BooleanField(),
+)
+
+
+class ImportResult:
+    """Outcome of an import: created / updated counts and per-line errors"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_error(self, line, message):
+        self.errors.append((line, str(message)))
+
+    def as_dict(self):
+        return {
+            'ok': self.ok,
+            'created': self.created,
+            'updated': self.updated,
+            'errors': [{'line': line, 'error': message} for line, message in self.errors],
+        }
+
+
+def read_csv(stream):
+    """
+    Yield (line number, row dict) from a text stream. The delimiter (`;`,
+    `,` or tab) is taken from the header line; unknown columns are ignored.
+    The apostrophe the CSV export puts before formula-like cells is removed.
+    """
+    stream = iter(stream)
+    header = next(stream, '')
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(itertools.chain([header], stream), dialect)
+    columns = [COLUMN_ALIASES.get(column.strip().lower()) for column in next(reader, [])]
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        # Every column of the header is in the row, empty where the line is short
+        yield reader.line_num, {
+            column: _unescape_cell(value)
+            for column, value in itertools.zip_longest(columns, values[:len(columns)], fillvalue='')
+            if column
+        }
+
+
+def _unescape_cell(value):
+    """A cell without the leading apostrophe export._csv_cell() adds"""
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def _form_data(row, current=None):
+    """
+    Form data of a row; columns it does not have (and empty DEFAULTS
+    columns) are taken from `current`, the stored product's data, or from
+    DEFAULTS for a new product
+    """
+    data = {field: str(row.get(field) or '').strip() for field in set(COLUMN_ALIASES.values())}
+    for field in DECIMAL_FIELDS:
+        data[field] = data[field].replace(' ', '').replace(',', '.')
+    data['price_input_type'] = 'gross' if data['gross_price'] and not data['net_price'] else 'net'
+    for field, value in (DEFAULTS if current is None else current).items():
+        if field not in row or (field in DEFAULTS and not data[field]):
+            data[field] = value
+    return data
+
+
+def _update_fields(row, lookups):
+    """Fields an existing product is updated in from this row"""
+    fields = {UPDATE_FIELDS[column] for column in row if column in UPDATE_FIELDS}
+    if lookups.supplier is not None:
+        fields.add('supplier')
+    return tuple(sorted(fields)) + ('updated_at',)
+
+
+def _form_errors(form):
+    messages = []
+    for field, errors in form.errors.items():
+        label = form.fields[field].label if field in form.fields else None
+        for error in errors:
+            messages.append(f'{label}: {error}' if label else error)
+    return '; '.join(messages)
+
+
+class _Lookups:
+    """Category and supplier name maps, loaded once per import"""
+
+    def __init__(self, supplier=None):
+        from .models import Supplier
+
+        self.categories = {}
+        for category in get_category_tree():
+            self.categories.setdefault(category['name'].lower(), category['id'])
+            self.categories[category['full_name'].lower()] = category['id']
+        self.suppliers = {}
+        for pk, name in Supplier.objects.order_by('-id').values_list('id', 'name'):
+            self.suppliers[name.strip().lower()] = pk
+        self.supplier = supplier
+
+
+def _resolve_relations(product, row, lookups):
+    """Set category / supplier from their names; return an error message or None"""
+    category = (row.get('category') or '').strip()
+    if category:
+        product.category_id = lookups.categories.get(category.lower())
+        if product.category_id is None:
+            return f'Ismeretlen kategória: {category}'
+    if lookups.supplier is not None:
+        product.supplier_id = lookups.supplier.pk
+    else:
+        supplier = (row.get('supplier') or '').strip()
+        if supplier:
+            product.supplier_id = lookups.suppliers.get(supplier.lower())
+            if product.supplier_id is None:
+                return f'Ismeretlen szállító: {supplier}'
+    return None
+
+
+def _import_chunk(chunk, result, lookups, seen_skus, seen_eans, dry_run, user):
+    from .models import PriceChange, Product
+
+    skus = {str(row.get('sku') or '').strip() for _, row in chunk}
+    current = {
+        values.pop('sku'): {field: '' if value is None else str(value) for field, value in values.items()}
+        for values in Product.objects.filter(sku__in=skus).values('sku', *CURRENT_FIELDS)
+    }
+
+    valid = []
+    for line, row in chunk:
+        data = _form_data(row, current.get(str(row.get('sku') or '').strip()))
+        form = ProductImportForm(data=data)
+        if not form.is_valid():
+            result.add_error(line, _form_errors(form))
+            continue
+        product = form.save(commit=False)
+        error = _resolve_relations(product, row, lookups)
+        if error is None and product.sku in seen_skus:
+            error = f'A cikkszám többször szerepel a fájlban: {product.sku}'
+        if error is None and product.ean13 and product.ean13 in seen_eans:
+            error = f'Az EAN-13 kód többször szerepel a fájlban: {product.ean13}'
+        if error:
+            result.add_error(line, error)
+            continue
+        seen_skus.add(product.sku)
+        if product.ean13:
+            seen_eans.add(product.ean13)
+        valid.append((line, product, _update_fields(row, lookups)))
+
+    if not valid:
+        return
+
+    # One query for both: which SKUs exist and who owns the EAN-13 codes
+    skus = [product.sku for _, product, _ in valid]
+    eans = [product.ean13 for _, product, _ in valid if product.ean13]
+    existing = dict(Product.objects.filter(Q(sku__in=skus) | Q(ean13__in=eans)).values_list('sku', 'ean13'))
+    ean_owners = {ean: sku for sku, ean in existing.items() if ean}
+
+    products = []
+    update_fields = {}
+    for line, product, fields in valid:
+        owner = ean_owners.get(product.ean13)
+        if product.ean13 and owner is not None and owner != product.sku:
+            result.add_error(line, f'Az EAN-13 kód már a(z) {owner} cikkszámú terméké: {product.ean13}')
+            continue
+        # New products only; existing stock changes go through the ledger
+        product.refresh_low_stock()
+        products.append((line, product))
+        update_fields.setdefault(fields, []).append(product)
+
+    if dry_run:
+        created = sum(1 for _, product in products if product.sku not in existing)
+        result.created += created
+        result.updated += len(products) - created
+        return
+
+    try:
+        with transaction.atomic():
+            skus = [product.sku for _, product in products]
+            valuation.record_products(Product.objects.filter(sku__in=skus), -1)
+            # The rows are locked now, so these are the prices being replaced
+            before = {
+                pk: (net_price, vat_rate)
+                for pk, net_price, vat_rate in Product.objects.filter(sku__in=skus).values_list(
+                    'pk', 'net_price', 'vat_rate'
+                )
+            }
+            # One statement per set of columns, i.e. one for a CSV file
+            for fields, group in update_fields.items():
+                Product.objects.bulk_create(
+                    group, update_conflicts=True, unique_fields=['sku'], update_fields=list(fields),
+                )
+            # bulk_create skips save() and signals: refresh the low stock
+            # flag of updated rows, the valuation and the scan caches here
+            written = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'id'))
+            ids = list(written.values())
+            Product.objects.filter(id__in=ids).update(is_low_stock=LOW_STOCK)
+            valuation.record_products(Product.objects.filter(id__in=ids))
+            prices.record_bulk(
+                {written[product.sku]: prices.price_of(product) for _, product in products},
+                before, PriceChange.SOURCE_IMPORT, user=user,
+            )
+            scan.invalidate(ids, [code for _, product in products for code in (product.sku, product.ean13)])
+    except IntegrityError as e:
+        for line, _ in products:
+            result.add_error(line, f'Mentési hiba: {e}')
+        return
+
+    created = sum(1 for _, product in products if product.sku not in existing)
+    result.created += created
+    result.updated += len(products) - created
+
+
+def import_products(rows, supplier=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False, user=None):
+    """
+    Upsert products from (line number, row dict) pairs, e.g. read_csv().
+
+    `supplier` (a Supplier) overrides the supplier column. With dry_run=True
+    rows are validated and counted but nothing is written. Price changes
+    are recorded in the price history as made by `user`.
+    """
+    result = ImportResult()
+    lookups = _Lookups(supplier)
+    seen_skus, seen_eans = set(), set()
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, result, lookups, seen_skus, seen_eans, dry_run, user)
+    return result
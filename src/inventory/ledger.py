@@ -0,0 +1,248 @@
+"""
+Stock ledger: applies stock movements to Product.stock_quantity with a single
+conditional UPDATE, so concurrent bookings never lose updates and never
+rewrite the whole product row.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import scan, valuation
+
+
+POLICY_CLAMP = 'clamp'
+POLICY_REJECT = 'reject'
+POLICY_ALLOW_NEGATIVE = 'allow_negative'
+POLICIES = (POLICY_CLAMP, POLICY_REJECT, POLICY_ALLOW_NEGATIVE)
+
+
+class InsufficientStock(ValidationError):
+    """Raised by the reject policy when a movement would make stock negative"""
+
+
+def get_policy(policy=None):
+    """Resolve the negative stock policy (explicit argument or INVENTORY_STOCK_POLICY)"""
+    policy = policy or getattr(settings, 'INVENTORY_STOCK_POLICY', POLICY_CLAMP)
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown stock policy: {policy!r}")
+    return policy
+
+
+def movement_delta(movement_type, quantity):
+    """Signed stock change of a movement"""
+    if movement_type == 'OUT':
+        return -quantity
+    # IN adds, ADJUSTMENT carries its own sign
+    return quantity
+
+
+def _product_table():
+    from .models import Product
+    opts = Product._meta
+    qn = connection.ops.quote_name
+    return (
+        qn(opts.db_table),
+        qn(opts.pk.column),
+        qn(opts.get_field('stock_quantity').column),
+        qn(opts.get_field('min_stock_level').column),
+        qn(opts.get_field('is_low_stock').column),
+        qn(opts.get_field('updated_at').column),
+    )
+
+
+def apply_delta(product_id, delta, policy=None):
+    """
+    Atomically add `delta` to a product's stock and return the new balance.
+
+    clamp: the balance never goes below zero
+    reject: raise InsufficientStock instead of going below zero
+    allow_negative: apply the delta as is
+    """
+    return apply_change(product_id, delta, policy)[0]
+
+
+def apply_change(product_id, delta, policy=None):
+    """
+    apply_delta() returning (new balance, change actually applied). The two
+    differ only when the clamp policy stopped a withdrawal at zero.
+    """
+    from .models import Product
+
+    policy = get_policy(policy)
+    table, pk, stock, min_level, low_stock, updated_at = _product_table()
+
+    if policy == POLICY_CLAMP:
+        new_value = f'CASE WHEN {stock} + %s < 0 THEN 0 ELSE {stock} + %s END'
+        value_params = [delta, delta]
+    else:
+        new_value = f'{stock} + %s'
+        value_params = [delta]
+    # SET expressions see the old row, so the low stock flag repeats the new value
+    sql = (
+        f'UPDATE {table} SET {stock} = {new_value}, '
+        f'{low_stock} = ({new_value} <= {min_level} OR {new_value} < 0), '
+        f'{updated_at} = %s WHERE {pk} = %s'
+    )
+    params = value_params * 3 + [timezone.now(), product_id]
+    if policy == POLICY_REJECT and delta < 0:
+        sql += f' AND {stock} + %s >= 0'
+        params.append(delta)
+
+    # PostgreSQL and SQLite 3.35+ hand the new balance back in the same statement
+    returning = connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+    with transaction.atomic():
+        before = None
+        if policy == POLICY_CLAMP and delta < 0:
+            # Lock the row first: the clamp may take less than `delta`, and the
+            # stock history (inventory.snapshots) needs the amount really taken
+            before = Product.objects.select_for_update().filter(pk=product_id).values_list(
+                'stock_quantity', flat=True
+            ).first()
+        with connection.cursor() as cursor:
+            if returning:
+                cursor.execute(f'{sql} RETURNING {stock}', params)
+                row = cursor.fetchone()
+            else:
+                cursor.execute(sql, params)
+                row = None
+                if cursor.rowcount:
+                    # The UPDATE holds the row lock, so this read is consistent
+                    row = (Product.objects.filter(pk=product_id).values_list('stock_quantity', flat=True).get(),)
+        if row is not None:
+            change = delta if before is None else row[0] - before
+            valuation.record_stock_changes({product_id: change})
+
+    if row is None:
+        if not Product.objects.filter(pk=product_id).exists():
+            raise Product.DoesNotExist(f"Product {product_id} does not exist")
+        raise InsufficientStock("Nincs elegendő készlet a mozgás rögzítéséhez.", code='insufficient_stock')
+
+    scan.invalidate([product_id])
+    return row[0], change
+
+
+class BatchResult:
+    """Outcome of a batch booking: created movements, new balances and per-line errors"""
+
+    def __init__(self):
+        self.movements = []
+        self.balances = {}
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_error(self, line, message):
+        self.errors.append((line, str(message)))
+
+    def as_dict(self):
+        return {
+            'ok': self.ok,
+            'booked': len(self.movements),
+            'balances': {str(pk): balance for pk, balance in self.balances.items()},
+            'errors': [{'line': line, 'error': message} for line, message in self.errors],
+        }
+
+
+def _as_int(value):
+    """Whole number from a JSON value or text; None for anything else (int() would truncate 1.5 and take True)"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, (int, str)):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+def resolve_codes(codes):
+    """Map SKUs / EAN-13 codes to products with a single query"""
+    from django.db.models import Q
+    from .models import Product
+
+    codes = {code for code in codes if code}
+    products = {}
+    if not codes:
+        return products
+    for product in Product.objects.filter(Q(sku__in=codes) | Q(ean13__in=codes)):
+        products[product.sku] = product
+        if product.ean13:
+            products[product.ean13] = product
+    return products
+
+
+def book_movements(lines, user=None, policy=None):
+    """
+    Book many stock movements in one transaction.
+
+    Each line is a dict with `product` (id) or `code` (SKU / EAN-13),
+    `movement_type`, `quantity` and optional `reason`. Lines are validated
+    in one pass; if any is invalid nothing is booked. Movements are inserted
+    with bulk_create and every product gets a single UPDATE with its summed
+    delta (the negative stock policy is applied to that sum; what a clamp
+    held back is recorded on the product's last movement).
+    """
+    from .models import Product, StockMovement
+
+    result = BatchResult()
+    valid_types = dict(StockMovement.MOVEMENT_TYPES)
+    by_code = resolve_codes(line.get('code') for line in lines)
+    by_id = Product.objects.in_bulk(
+        {_as_int(line.get('product')) for line in lines if _as_int(line.get('product'))}
+    )
+
+    movements = []
+    deltas = {}
+    for number, line in enumerate(lines, start=1):
+        product = by_code.get(line.get('code')) if line.get('code') else by_id.get(_as_int(line.get('product')))
+        movement_type = line.get('movement_type')
+        quantity = _as_int(line.get('quantity'))
+
+        if product is None:
+            result.add_error(number, "Ismeretlen termék.")
+        elif movement_type not in valid_types:
+            result.add_error(number, "Érvénytelen mozgás típus.")
+        elif quantity is None or quantity == 0:
+            result.add_error(number, "A mennyiségnek nem nulla egész számnak kell lennie.")
+        elif movement_type != 'ADJUSTMENT' and quantity < 0:
+            result.add_error(number, "Beérkezés és kivétel mennyisége nem lehet negatív.")
+        else:
+            movement = StockMovement(
+                product=product,
+                movement_type=movement_type,
+                quantity=quantity,
+                reason=line.get('reason') or '',
+                created_by=user,
+            )
+            movements.append(movement)
+            deltas[product.pk] = deltas.get(product.pk, 0) + movement.delta
+
+    if not result.ok:
+        return result
+
+    try:
+        with transaction.atomic():
+            # Fixed lock order keeps concurrent batches from deadlocking
+            changes = {}
+            for product_id in sorted(deltas):
+                result.balances[product_id], changes[product_id] = apply_change(
+                    product_id, deltas[product_id], policy=policy
+                )
+            for movement in movements:
+                movement.stock_change = movement.delta
+            for movement in reversed(movements):
+                if movement.product_id in changes:
+                    movement.stock_change += changes.pop(movement.product_id) - deltas[movement.product_id]
+            # bulk_create skips StockMovement.save(), so nothing is applied twice
+            result.movements = StockMovement.objects.bulk_create(movements)
+    except InsufficientStock as e:
+        failed = next(m.product for m in movements if m.product_id == product_id)
+        result.balances = {}
+        result.add_error(None, f"{failed}: {e.messages[0]}")
+    return result
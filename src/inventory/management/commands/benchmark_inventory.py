@@ -0,0 +1,114 @@
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from inventory import benchmark
+from inventory.models import Product
+from inventory.synthetic import Shape, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the inventory hot paths on a synthetic data set in a throwaway test database "
+        "and optionally compare the results with a saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        defaults = Shape()
+        parser.add_argument('--products', type=int, default=defaults.products)
+        parser.add_argument('--category-depth', type=int, default=defaults.category_depth)
+        parser.add_argument('--category-fanout', type=int, default=defaults.category_fanout)
+        parser.add_argument('--suppliers', type=int, default=defaults.suppliers)
+        parser.add_argument('--movements', type=int, default=defaults.movements)
+        parser.add_argument('--images', type=int, default=defaults.images)
+        parser.add_argument('--history-days', type=int, default=defaults.history_days)
+        parser.add_argument('--seed', type=int, default=defaults.seed)
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help="Run only this scenario (repeatable)")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+        parser.add_argument('--compare', help="Baseline JSON file to check for regressions")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed median slowdown against the baseline (0.2 = 20%%)")
+        parser.add_argument('--keepdb', action='store_true',
+                            help="Keep the test database and reuse its data on the next run")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+        try:
+            benchmark.get_scenarios(options['scenarios'])
+        except benchmark.BenchmarkError as e:
+            raise CommandError(e)
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+
+        shape = Shape(**{name: options[name] for name in Shape.__dataclass_fields__ if name in options})
+        verbosity = options['verbosity']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, keepdb=options['keepdb'])
+        # The placeholder image of the synthetic rows stays out of the real media
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                results = self.run_benchmarks(shape, options)
+        except benchmark.BenchmarkError as e:
+            raise CommandError(e)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity, keepdb=options['keepdb'])
+
+        for name, result in results['scenarios'].items():
+            self.stdout.write(
+                f"{name:<32} median {result['median_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+                f"{result['queries']:>3} queries"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            self.check_baseline(results, baseline, options['threshold'])
+
+    def run_benchmarks(self, shape, options):
+        User = get_user_model()
+        user = User.objects.filter(username='benchmark').first()
+        if user is None:
+            user = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+
+        if Product.objects.exists():
+            self.stdout.write("Reusing the data of the kept test database")
+        else:
+            self.stdout.write(f"Generating {shape.products} products...")
+            generated = generate(shape, user=user)
+            self.stdout.write(", ".join(f"{n} {name}" for name, n in generated.as_dict().items()))
+
+        return benchmark.run(
+            user,
+            scenarios=options['scenarios'],
+            repeat=options['repeat'],
+            warmup=options['warmup'],
+            shape=shape.as_dict(),
+        )
+
+    def check_baseline(self, results, baseline, threshold):
+        if baseline.get('meta', {}).get('database') != results['meta']['database']:
+            self.stderr.write(self.style.WARNING("The baseline was recorded on a different database"))
+        if baseline.get('meta', {}).get('shape') != results['meta']['shape']:
+            self.stderr.write(self.style.WARNING("The baseline was recorded with a different data set"))
+
+        regressions = benchmark.compare(results, baseline, threshold)
+        for name, message in regressions:
+            self.stderr.write(self.style.ERROR(f"{name}: {message}"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
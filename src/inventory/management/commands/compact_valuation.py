@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from inventory import valuation
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold the recorded inventory valuation changes into one row per category, supplier "
+        "and VAT rate; snapshot_stock does it too, so only run it when that is not scheduled"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recompute the valuation from the products instead (locks them meanwhile)")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            before = valuation.current_values()
+            valuation.rebuild()
+            after = valuation.current_values()
+            drift = sum(after.values()) - sum(before.values())
+            self.stdout.write(f"Valuation rebuilt, {len(after)} groups (total changed by {drift:.2f})")
+        else:
+            rows = valuation.compact()
+            self.stdout.write(f"Valuation compacted into {rows} rows")
+        self.stdout.write(self.style.SUCCESS("Done"))
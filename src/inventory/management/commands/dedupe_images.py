@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import ProductImage
+from inventory.storage import CONTENT_ADDRESSED, content_hash, content_name
+from inventory.thumbnails import delete_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Move product images uploaded before content addressing to their content hash names"
+
+    def handle(self, *args, **options):
+        storage = ProductImage._meta.get_field('image').storage
+        names = {
+            name for name in ProductImage.objects.exclude(image='').values_list('image', flat=True).distinct()
+            if not CONTENT_ADDRESSED.search(name)
+        }
+
+        moved = shared = freed = 0
+        for name in sorted(names):
+            if not storage.exists(name):
+                self.stderr.write(f"{name}: file missing, skipped")
+                continue
+            with storage.open(name, 'rb') as f:
+                target = content_name(name, content_hash(f))
+                if storage.exists(target):
+                    shared += 1
+                    freed += storage.size(name)
+                else:
+                    storage.save_exact(target, f)
+            ProductImage.objects.filter(image=name).update(image=target, has_thumbnails=False)
+            delete_thumbnails(name, storage)
+            storage.delete(name)
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} files moved, {shared} were duplicates ({freed} bytes freed). "
+            f"Run generate_thumbnails to render the moved images again."
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import ProductImage
+from inventory.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Render missing product image thumbnails (all of them with --all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Re-render existing thumbnails too")
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.exclude(image='').order_by('pk')
+        if not options['all']:
+            images = images.filter(has_thumbnails=False)
+
+        done = failed = 0
+        for product_image in images.iterator(chunk_size=500):
+            try:
+                generate_thumbnails(product_image)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{product_image.image.name}: {e}")
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f"{done} images rendered, {failed} failed"))
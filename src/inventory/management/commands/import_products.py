@@ -0,0 +1,47 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importer import IMPORT_CHUNK_SIZE, import_products, read_csv
+from inventory.models import Supplier
+
+
+class Command(BaseCommand):
+    help = "Import products from a CSV file, creating new SKUs and updating existing ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, or - for standard input")
+        parser.add_argument('--supplier', help="Supplier name to set on every imported product")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, write nothing")
+
+    def handle(self, *args, **options):
+        supplier = None
+        if options['supplier']:
+            supplier = Supplier.objects.filter(name=options['supplier']).order_by('id').first()
+            if supplier is None:
+                raise CommandError(f"Unknown supplier: {options['supplier']}")
+
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding=options['encoding'], newline='')
+        else:
+            try:
+                stream = open(options['path'], encoding=options['encoding'], newline='')
+            except OSError as e:
+                raise CommandError(e)
+
+        with stream:
+            result = import_products(
+                read_csv(stream),
+                supplier=supplier,
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run'],
+            )
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        verb = "would be" if options['dry_run'] else "were"
+        summary = f"{result.created} products {verb} created, {result.updated} updated, {len(result.errors)} rows failed"
+        self.stdout.write(self.style.SUCCESS(summary) if result.ok else self.style.WARNING(summary))
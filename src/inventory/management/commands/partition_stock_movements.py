@@ -0,0 +1,50 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import partitioning
+
+
+def month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Expected a month as YYYY-MM, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage the monthly partitions of the stock movement table (PostgreSQL): convert it once "
+        "with --convert, then run regularly to create the upcoming months"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help="Rebuild the table as a partitioned one (locks it while the rows are copied)")
+        parser.add_argument('--ahead', type=int, default=partitioning.DEFAULT_MONTHS_AHEAD,
+                            help="Months to create in advance")
+        parser.add_argument('--detach-before', type=month, metavar='YYYY-MM',
+                            help="Detach the partitions of the months before this one for archiving")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        try:
+            if options['convert']:
+                partitions = partitioning.convert(options['ahead'], using=using)
+                self.stdout.write(self.style.SUCCESS(
+                    f"Stock movements partitioned into {len(partitions)} monthly partitions"
+                ))
+            else:
+                for name in partitioning.ensure_partitions(options['ahead'], using=using):
+                    self.stdout.write(f"Created {name}")
+
+            if options['detach_before']:
+                for name in partitioning.detach_before(options['detach_before'], using=using):
+                    self.stdout.write(f"Detached {name}; dump it and DROP TABLE it to free the space")
+        except partitioning.PartitioningError as e:
+            raise CommandError(e)
+
+        if options['verbosity'] > 1:
+            for start, name in partitioning.list_partitions(using).items():
+                self.stdout.write(f"{start:%Y-%m}  {name}")
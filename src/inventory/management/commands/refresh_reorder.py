@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory import reorder
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the consumption velocity behind the reorder suggestions for the products "
+        "whose withdrawals changed since the last run; run it hourly or nightly from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recompute every product (after seeding or deleting stock movements)")
+
+    def handle(self, *args, **options):
+        since = None if options['full'] else reorder.last_refresh()
+        count = reorder.refresh(full=options['full'])
+        if since is None:
+            self.stdout.write(f"Velocity of all products recomputed, {count} with withdrawals")
+        else:
+            since = timezone.localtime(since)
+            self.stdout.write(f"Velocity of {count} products recomputed from the changes since {since:%Y-%m-%d %H:%M}")
+        self.stdout.write(self.style.SUCCESS("Done"))
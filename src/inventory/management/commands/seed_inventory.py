@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from inventory.models import Product
+from inventory.synthetic import BATCH_SIZE, SKU_PREFIX, Shape, generate, sku
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic products (valid EAN-13 codes, category tree, suppliers, "
+        "multi-year stock movement histories) for load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--movements-per-product', type=float, default=10,
+                            help="Average number of stock movements per product")
+        parser.add_argument('--images-per-product', type=float, default=0.5,
+                            help="Average number of image rows per product (all share one blob)")
+        parser.add_argument('--years', type=float, default=3, help="Length of the movement history")
+        parser.add_argument('--category-depth', type=int, default=3)
+        parser.add_argument('--category-fanout', type=int, default=6)
+        parser.add_argument('--suppliers', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--offset', type=int,
+                            help="Number the new products from OFFSET + 1 (default: after the existing ones)")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Processes writing product batches in parallel (not on SQLite)")
+        parser.add_argument('--user', help="Username recorded as the creator of the movements")
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(f"{connection.vendor} does not return primary keys from bulk inserts")
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError("SQLite allows a single writer, use --workers 1")
+        if options['products'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--products and --batch-size must be positive")
+
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Unknown user: {options['user']}")
+
+        offset = options['offset']
+        if offset is None:
+            last = Product.objects.filter(sku__startswith=SKU_PREFIX).order_by('-sku').values_list('sku', flat=True).first()
+            offset = int(last[len(SKU_PREFIX):]) if last else 0
+
+        products = options['products']
+        shape = Shape(
+            products=products,
+            category_depth=options['category_depth'],
+            category_fanout=options['category_fanout'],
+            suppliers=options['suppliers'],
+            movements=round(products * options['movements_per_product']),
+            images=round(products * options['images_per_product']),
+            history_days=round(options['years'] * 365),
+            seed=options['seed'],
+            offset=offset,
+        )
+        self.stdout.write(f"Generating products {sku(offset + 1)}..{sku(offset + products)}")
+
+        started = time.monotonic()
+        verbosity = options['verbosity']
+
+        def progress(generated):
+            if verbosity > 1 or generated.products == products:
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{generated.products}/{products} products, {generated.movements} movements "
+                    f"({generated.products / elapsed:.0f} products/s)"
+                )
+
+        generated = generate(
+            shape, user=user, batch_size=options['batch_size'], workers=options['workers'], progress=progress,
+        )
+        summary = ", ".join(f"{n} {name}" for name, n in generated.as_dict().items())
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.monotonic() - started:.1f} s: {summary}"))
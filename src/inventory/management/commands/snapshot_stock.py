@@ -0,0 +1,55 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory import snapshots, valuation
+
+
+def moment(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f"Expected a date and time like 2025-01-01T00:00, got {value!r}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+class Command(BaseCommand):
+    help = (
+        "Store every product's stock (and its valuation) at the start of the current day or month, "
+        "the anchors of point-in-time stock queries, and compact the recorded valuation changes; "
+        "run it daily from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=snapshots.PERIODS, default='day')
+        parser.add_argument('--at', type=moment, help="Take the snapshot at this moment instead")
+        parser.add_argument('--backfill', type=int, default=0, metavar='N',
+                            help="Also take the snapshots of the N previous periods")
+        parser.add_argument('--keep-days', type=int, metavar='DAYS',
+                            help="Delete older snapshots, except those taken at the start of a month")
+        parser.add_argument('--no-compact', action='store_false', dest='compact',
+                            help="Leave the valuation changes as they are (see compact_valuation)")
+
+    def handle(self, *args, **options):
+        period = options['period']
+        at = options['at'] or snapshots.period_start(period)
+        moments = [at]
+        for _ in range(options['backfill']):
+            moments.append(snapshots.previous_period_start(period, moments[-1]))
+
+        # Oldest first, so each snapshot starts from the previous one
+        for taken_at in reversed(moments):
+            count = snapshots.take_snapshot(taken_at)
+            valuation.freeze_snapshot(taken_at)
+            self.stdout.write(f"{timezone.localtime(taken_at):%Y-%m-%d %H:%M}: {count} products")
+
+        if options['keep_days'] is not None:
+            before = timezone.now() - datetime.timedelta(days=options['keep_days'])
+            deleted = snapshots.prune_snapshots(before)
+            self.stdout.write(f"Deleted {deleted} old snapshot rows")
+
+        # Every ledger booking adds a row the live valuation report sums up
+        if options['compact']:
+            self.stdout.write(f"Valuation compacted into {valuation.compact()} rows")
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,51 @@
+import posixpath
+
+from django.core.management.base import BaseCommand
+
+from inventory.models import ProductImage
+from inventory.storage import CONTENT_ADDRESSED, release_blob
+
+
+BATCH_SIZE = 1000
+
+
+def stored_blobs(storage, directory=''):
+    """Names of the content-addressed files under `directory`, thumbnails excluded"""
+    directories, files = storage.listdir(directory)
+    for name in files:
+        name = posixpath.join(directory, name)
+        if CONTENT_ADDRESSED.search(name):
+            yield name
+    for subdirectory in directories:
+        if subdirectory != 'thumbs':
+            yield from stored_blobs(storage, posixpath.join(directory, subdirectory))
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete product image files no image references any more, which were kept because an "
+        "upload had touched them shortly before; run it nightly from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List the unreferenced files only")
+
+    def handle(self, *args, **options):
+        storage = ProductImage._meta.get_field('image').storage
+        names = sorted(stored_blobs(storage)) if storage.exists('') else []
+        unused = []
+        for start in range(0, len(names), BATCH_SIZE):
+            batch = names[start:start + BATCH_SIZE]
+            used = set(ProductImage.objects.filter(image__in=batch).values_list('image', flat=True))
+            unused += [name for name in batch if name not in used]
+
+        if options['dry_run']:
+            for name in unused:
+                self.stdout.write(name)
+            self.stdout.write(self.style.SUCCESS(f"{len(unused)} of {len(names)} files are unreferenced"))
+            return
+
+        deleted = sum(1 for name in unused if release_blob(name, storage))
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} unreferenced files deleted, {len(unused) - deleted} kept as recently used"
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_alter_productimage_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='inventory_product_name_id_idx'),
+        ),
+    ]
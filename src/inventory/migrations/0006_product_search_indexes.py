@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS inventory_product_search_idx ON inventory_product USING gin (
+        to_tsvector('simple', coalesce("inventory_product"."name", '') || ' ' ||
+        coalesce("inventory_product"."sku", '') || ' ' ||
+        coalesce("inventory_product"."ean13", '') || ' ' ||
+        coalesce("inventory_product"."description", ''))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS inventory_product_name_trgm_idx ON inventory_product USING gin (name gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS inventory_product_name_trgm_idx",
+    "DROP INDEX IF EXISTS inventory_product_search_idx",
+]
+
+
+def forwards(apps, schema_editor):
+    # SQLite gets its FTS5 table from inventory.search.install_sqlite_fts (post_migrate)
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_BACKWARD:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_product_name_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
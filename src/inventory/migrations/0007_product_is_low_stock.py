@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:53
+
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def fill_is_low_stock(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    Product.objects.filter(
+        Q(stock_quantity__lte=F('min_stock_level')) | Q(stock_quantity__lt=0)
+    ).update(is_low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_product_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='is_low_stock',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Alacsony készlet'),
+        ),
+        migrations.RunPython(fill_is_low_stock, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['stock_quantity', 'name', 'id'], name='inventory_product_low_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Category = apps.get_model('inventory', 'Category')
+    categories = {c.pk: c for c in Category.objects.all()}
+    resolved = {}
+
+    def resolve(category):
+        if category.pk not in resolved:
+            parent = categories.get(category.parent_id)
+            if parent is None:
+                resolved[category.pk] = (f'/{category.pk}/', category.name, 0)
+            else:
+                path, full_name, depth = resolve(parent)
+                resolved[category.pk] = (f'{path}{category.pk}/', f'{full_name} > {category.name}', depth + 1)
+        return resolved[category.pk]
+
+    for category in categories.values():
+        category.path, category.full_name, category.depth = resolve(category)
+    Category.objects.bulk_update(categories.values(), ['path', 'full_name', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_product_is_low_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='full_name',
+            field=models.TextField(default='', editable=False, verbose_name='Teljes útvonal'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
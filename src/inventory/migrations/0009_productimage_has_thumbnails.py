@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_category_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='has_thumbnails',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Bélyegképek elkészültek'),
+        ),
+    ]
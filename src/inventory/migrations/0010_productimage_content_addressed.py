@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+import inventory.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_productimage_has_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(storage=inventory.storage.product_image_storage, upload_to='products/', verbose_name='Kép'),
+        ),
+        migrations.AddIndex(
+            model_name='productimage',
+            index=models.Index(fields=['image'], name='inventory_image_blob_idx'),
+        ),
+    ]
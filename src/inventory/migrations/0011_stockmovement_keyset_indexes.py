@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_productimage_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['-created_at', '-id'], name='inventory_move_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='inventory_move_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['movement_type', '-created_at', '-id'], name='inventory_move_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='inventory_move_user_idx'),
+        ),
+    ]
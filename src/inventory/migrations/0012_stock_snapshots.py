@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_stockmovement_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='stock_change',
+            field=models.IntegerField(editable=False, null=True, verbose_name='Készletváltozás'),
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(verbose_name='Időpont')),
+                ('quantity', models.IntegerField(verbose_name='Készlet')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.product', verbose_name='Termék')),
+            ],
+            options={
+                'verbose_name': 'Készlet pillanatkép',
+                'verbose_name_plural': 'Készlet pillanatképek',
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['taken_at'], name='inventory_snapshot_taken_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'taken_at'), name='inventory_snapshot_unique'),
+        ),
+    ]
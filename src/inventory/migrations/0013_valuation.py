@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:29
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+import django.db.models.deletion
+
+
+def fill_valuation(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    ValuationChange = apps.get_model('inventory', 'ValuationChange')
+    value = ExpressionWrapper(F('stock_quantity') * F('net_price'), output_field=DecimalField(max_digits=18, decimal_places=2))
+    rows = Product.objects.order_by().values_list('category', 'supplier', 'vat_rate').annotate(value=Sum(value))
+    ValuationChange.objects.bulk_create([
+        ValuationChange(category_id=category, supplier_id=supplier, vat_rate=vat_rate, net_value=value)
+        for category, supplier, vat_rate, value in rows if value
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValuationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vat_rate', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='ÁFA kulcs (%)')),
+                ('net_value', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='Nettó érték')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.category', verbose_name='Kategória')),
+                ('supplier', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.supplier', verbose_name='Szállító')),
+            ],
+            options={
+                'verbose_name': 'Készletérték változás',
+                'verbose_name_plural': 'Készletérték változások',
+            },
+        ),
+        migrations.CreateModel(
+            name='ValuationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(verbose_name='Időpont')),
+                ('vat_rate', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='ÁFA kulcs (%)')),
+                ('net_value', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='Nettó érték')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.category', verbose_name='Kategória')),
+                ('supplier', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.supplier', verbose_name='Szállító')),
+            ],
+            options={
+                'verbose_name': 'Készletérték pillanatkép',
+                'verbose_name_plural': 'Készletérték pillanatképek',
+                'indexes': [models.Index(fields=['taken_at'], name='inventory_valuation_taken_idx')],
+            },
+        ),
+        migrations.RunPython(fill_valuation, migrations.RunPython.noop),
+    ]
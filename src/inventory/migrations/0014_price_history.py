@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_initial_prices(apps, schema_editor):
+    # The current price is the only one known, dated back to the product's creation
+    Product = apps.get_model('inventory', 'Product')
+    PriceChange = apps.get_model('inventory', 'PriceChange')
+    rows = Product.objects.order_by('pk').values_list('pk', 'net_price', 'vat_rate', 'created_at')
+    batch = []
+    for pk, net_price, vat_rate, created_at in rows.iterator(chunk_size=2000):
+        batch.append(PriceChange(
+            product_id=pk, net_price=net_price, vat_rate=vat_rate, valid_from=created_at, source='initial',
+        ))
+        if len(batch) == 2000:
+            PriceChange.objects.bulk_create(batch)
+            batch = []
+    PriceChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0013_valuation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('net_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Nettó ár')),
+                ('vat_rate', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='ÁFA kulcs (%)')),
+                ('valid_from', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Érvényes ettől')),
+                ('source', models.CharField(choices=[('form', 'Termék mentése'), ('import', 'Import'), ('initial', 'Kezdeti ár')], max_length=10, verbose_name='Forrás')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Módosította')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_changes', to='inventory.product', verbose_name='Termék')),
+            ],
+            options={
+                'verbose_name': 'Árváltozás',
+                'verbose_name_plural': 'Árváltozások',
+                'ordering': ['-valid_from', '-id'],
+                'indexes': [models.Index(fields=['product', '-valid_from', '-id'], name='inventory_price_product_idx')],
+            },
+        ),
+        migrations.RunPython(fill_initial_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_price_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='lead_time_days',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Rendeléstől beérkezésig; üresen az alapértelmezett', null=True, verbose_name='Szállítási idő (nap)'),
+        ),
+        migrations.CreateModel(
+            name='ProductVelocity',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='velocity', serialize=False, to='inventory.product', verbose_name='Termék')),
+                ('out_7d', models.IntegerField(default=0, verbose_name='Kivét (7 nap)')),
+                ('out_30d', models.IntegerField(default=0, verbose_name='Kivét (30 nap)')),
+                ('out_90d', models.IntegerField(default=0, verbose_name='Kivét (90 nap)')),
+                ('daily_velocity', models.FloatField(verbose_name='Napi fogyás')),
+                ('computed_at', models.DateTimeField(verbose_name='Számítva')),
+            ],
+            options={
+                'verbose_name': 'Termék fogyás',
+                'verbose_name_plural': 'Termék fogyások',
+                'indexes': [models.Index(fields=['computed_at'], name='inventory_velocity_at_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,15 @@
-from django.db import models
+import functools
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import models, transaction
+from django.db.models import Count, F, Func, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.conf import settings
+from django.utils import timezone
+
+from .storage import product_image_storage
 
 
 class Category(models.Model):
@@ -15,6 +24,11 @@ class Category(models.Model):
         related_name='subcategories',
         verbose_name="Szülő kategória"
     )
+    # Materialized path: ids from the root down to this category, e.g. "/1/5/12/".
+    # Maintained by save() together with the rest of the subtree.
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    full_name = models.TextField(editable=False, default='', verbose_name="Teljes útvonal")
+    depth = models.PositiveSmallIntegerField(editable=False, default=0)
 
     class Meta:
         verbose_name = "Kategória"
@@ -22,15 +36,74 @@ class Category(models.Model):
         ordering = ['name']
 
     def __str__(self):
-        if self.parent:
-            return f"{self.parent} > {self.name}"
-        return self.name
+        return self.get_full_path()
 
     def get_full_path(self):
         """Get the full category path"""
-        if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
-        return self.name
+        return self.full_name or self.name
+
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if f'/{self.pk}/' in parent_path:
+                raise ValidationError({'parent': "Egy kategória nem lehet a saját alkategóriája."})
+
+    def _tree_fields(self):
+        """path, full_name and depth derived from the parent as stored in the database"""
+        if self.parent_id:
+            parent_path, parent_name, parent_depth = Category.objects.filter(
+                pk=self.parent_id
+            ).values_list('path', 'full_name', 'depth').get()
+            return f'{parent_path}{self.pk}/', f'{parent_name} > {self.name}', parent_depth + 1
+        return f'/{self.pk}/', self.name, 0
+
+    def save(self, *args, **kwargs):
+        """Maintain the materialized path of this category and its subtree"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'path', 'full_name', 'depth'}
+
+        with transaction.atomic():
+            if self.pk is None:
+                # The path contains our own id, so it can only be set after the insert
+                super().save(*args, **kwargs)
+                self.path, self.full_name, self.depth = self._tree_fields()
+                Category.objects.filter(pk=self.pk).update(
+                    path=self.path, full_name=self.full_name, depth=self.depth
+                )
+                return
+
+            old = Category.objects.filter(pk=self.pk).values_list('path', 'full_name', 'depth').first()
+            self.path, self.full_name, self.depth = self._tree_fields()
+            super().save(*args, **kwargs)
+
+            if old and old[:2] != (self.path, self.full_name):
+                old_path, old_full_name, old_depth = old
+                # Re-root the whole subtree in a single UPDATE
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(
+                        Value(self.path), Substr('path', len(old_path) + 1),
+                        output_field=models.CharField(),
+                    ),
+                    full_name=Concat(
+                        Value(self.full_name), Substr('full_name', len(old_full_name) + 1),
+                        output_field=models.TextField(),
+                    ),
+                    depth=F('depth') + (self.depth - old_depth),
+                )
+
+    def get_ancestors(self):
+        """Ancestors from the root down, in one query"""
+        ids = [int(pk) for pk in self.path.strip('/').split('/')[:-1] if pk]
+        return Category.objects.filter(pk__in=ids).order_by('depth')
+
+    def get_descendants(self, include_self=False):
+        """Every category below this one, in one query"""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
 
 
 class Supplier(models.Model):
@@ -40,6 +113,12 @@ class Supplier(models.Model):
     email = models.EmailField(blank=True, verbose_name="Email")
     phone = models.CharField(max_length=20, blank=True, verbose_name="Telefon")
     address = models.TextField(blank=True, verbose_name="Cím")
+    lead_time_days = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Szállítási idő (nap)",
+        help_text="Rendeléstől beérkezésig; üresen az alapértelmezett"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Létrehozva")
 
     class Meta:
@@ -51,6 +130,123 @@ class Supplier(models.Model):
         return self.name
 
 
+CENT = Decimal('0.01')
+
+
+@functools.lru_cache(maxsize=256)
+def _vat_multiplier(vat_rate):
+    return 1 + Decimal(vat_rate) / 100
+
+
+def calculate_brutto(net_price, vat_rate):
+    """Brutto price from net price and VAT rate, rounded half up to 2 decimals"""
+    if net_price is None or vat_rate is None:
+        return Decimal('0.00')
+
+    # Ensure Decimal math and round to 2 decimal places for display/storage
+    return (Decimal(net_price) * _vat_multiplier(vat_rate)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def calculate_brutto_many(net_prices, vat_rates):
+    """
+    calculate_brutto() of two whole columns (e.g. an export chunk), with one
+    multiplier per distinct VAT rate instead of new Decimals per row
+    """
+    multipliers = {}
+    result = []
+    for net_price, vat_rate in zip(net_prices, vat_rates):
+        if net_price is None or vat_rate is None:
+            result.append(Decimal('0.00'))
+            continue
+        multiplier = multipliers.get(vat_rate)
+        if multiplier is None:
+            multiplier = multipliers[vat_rate] = _vat_multiplier(vat_rate)
+        result.append((Decimal(net_price) * multiplier).quantize(CENT, ROUND_HALF_UP))
+    return result
+
+
+class BruttoPrice(Func):
+    """
+    calculate_brutto() in SQL: net price × (1 + VAT rate / 100), rounded half
+    up to 2 decimals
+    """
+    output_field = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __init__(self, net_price='net_price', vat_rate='vat_rate', **extra):
+        super().__init__(net_price, vat_rate, **extra)
+
+    def _compile(self, compiler):
+        net_price, net_params = compiler.compile(self.source_expressions[0])
+        vat_rate, vat_params = compiler.compile(self.source_expressions[1])
+        return net_price, tuple(net_params), vat_rate, tuple(vat_params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # Exact numeric arithmetic; ROUND() takes halves away from zero
+        net_price, net_params, vat_rate, vat_params = self._compile(compiler)
+        return f'ROUND(({net_price}) * (100 + ({vat_rate})) / 100, 2)', net_params + vat_params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite stores decimals as floats: work in integer cents and
+        # hundredths of a percent, adding half a cent away from zero before
+        # the division truncates toward it
+        net_price, net_params, vat_rate, vat_params = self._compile(compiler)
+        cents = f'CAST(ROUND(({net_price}) * 100) AS INTEGER)'
+        multiplier = f'CAST(ROUND((100 + ({vat_rate})) * 100) AS INTEGER)'
+        half = f'CASE WHEN ({net_price}) < 0 THEN -5000 ELSE 5000 END'
+        sql = f'(({cents} * {multiplier} + {half}) / 10000) / 100.0'
+        return sql, net_params + vat_params + net_params
+
+    @staticmethod
+    def convert_value(value, expression, connection):
+        # Back from SQLite's float to exactly 2 decimals
+        return None if value is None else Decimal(value).quantize(CENT)
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def in_category_tree(self, category):
+        """Products of a category (instance or id) and all of its subcategories"""
+        from .categories import get_category_path
+
+        path = category.path if isinstance(category, Category) else get_category_path(category)
+        if not path:
+            return self.none()
+        return self.filter(category__path__startswith=path)
+
+    def with_image_count(self):
+        """Annotate `image_total` with a correlated subquery (no GROUP BY over product columns)"""
+        images = ProductImage.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        total = Subquery(images.annotate(total=Count('pk')).values('total'), output_field=models.IntegerField())
+        return self.annotate(image_total=Coalesce(total, 0))
+
+    def with_main_image(self):
+        """
+        Prefetch the images main-first in one query, so main_image and
+        image_count need no further queries
+        """
+        ordered = ProductImage.objects.order_by(*ProductImage.MAIN_FIRST)
+        return self.prefetch_related(Prefetch('images', queryset=ordered, to_attr='prefetched_images'))
+
+    def with_price_at(self, when):
+        """Annotate `net_price_at` and `vat_rate_at`, the prices at `when` (see inventory.prices)"""
+        from .prices import annotate_price_at
+        return annotate_price_at(self, when)
+
+    def with_brutto_price(self):
+        """Annotate the brutto price computed by the database (used by Product.brutto_price)"""
+        return self.annotate(annotated_brutto_price=BruttoPrice())
+
+    def with_reorder(self):
+        """Annotate velocity, days until stockout and suggested reorder quantity (see inventory.reorder)"""
+        from .reorder import annotate_reorder
+        return annotate_reorder(self)
+
+    def with_stock_at(self, when):
+        """Annotate `stock_at`, the stock at the moment `when` (see inventory.snapshots)"""
+        from .snapshots import annotate_stock_at
+        return annotate_stock_at(self, when)
+
+
 class Product(models.Model):
     """Product model with inventory tracking"""
     name = models.CharField(max_length=200, verbose_name="Név")
@@ -108,45 +304,91 @@ class Product(models.Model):
         verbose_name="Minimum készlet szint",
         help_text="Figyelmeztetés alatt ez a szint"
     )
+    # Denormalized from stock_quantity / min_stock_level so the warnings page
+    # can use an index; kept in sync by save() and the stock ledger
+    is_low_stock = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Alacsony készlet"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Létrehozva")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Módosítva")
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Termék"
         verbose_name_plural = "Termékek"
         ordering = ['name']
+        indexes = [
+            # Keyset pagination key of product_list
+            models.Index(fields=['name', 'id'], name='inventory_product_name_id_idx'),
+            # Partial index holding only the rows product_warnings shows, in its order
+            models.Index(
+                fields=['stock_quantity', 'name', 'id'],
+                condition=models.Q(is_low_stock=True),
+                name='inventory_product_low_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
+    def save(self, *args, changed_by=None, **kwargs):
+        """
+        Keep the low stock flag and the valuation in sync with the stock
+        fields, and record price changes (made by `changed_by`) in the history
+        """
+        from . import prices, valuation
+
+        self.refresh_low_stock()
+        # The prices may have changed since the row was read
+        self.__dict__.pop('annotated_brutto_price', None)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'stock_quantity', 'min_stock_level'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'is_low_stock'}
+        if update_fields is not None and not valuation.VALUE_FIELDS & set(update_fields):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            stored = None if self._state.adding else self._stored_row()
+            super().save(*args, **kwargs)
+            valuation.record_saved_product(self, stored)
+            prices.record_saved_product(self, stored, user=changed_by)
+
+    def _stored_row(self):
+        """The locked row as stored, before save() overwrites it"""
+        return Product.objects.select_for_update().filter(pk=self.pk).values(
+            'category', 'supplier', 'vat_rate', 'net_price', 'stock_quantity'
+        ).first()
+
+    def refresh_low_stock(self):
+        """Recompute is_low_stock: at or below the minimum level, or negative"""
+        self.is_low_stock = self.stock_quantity <= self.min_stock_level or self.stock_quantity < 0
+
     @property
     def brutto_price(self):
-        """Calculate brutto price from net price and VAT rate"""
-        from decimal import Decimal, ROUND_HALF_UP
-        if self.net_price is None or self.vat_rate is None:
-            return Decimal('0.00')
-
-        # Ensure Decimal math and round to 2 decimal places for display/storage
-        net = Decimal(self.net_price)
-        vat_mult = Decimal(1) + (Decimal(self.vat_rate) / Decimal(100))
-        brutto = (net * vat_mult).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        return brutto
+        """Brutto price, from with_brutto_price() when annotated, else calculated"""
+        if hasattr(self, 'annotated_brutto_price'):
+            return self.annotated_brutto_price
+        return calculate_brutto(self.net_price, self.vat_rate)
 
     @property
     def main_image(self):
-        """Get the main product image"""
-        return self.images.filter(is_main=True).first() or self.images.first()
+        """Get the main product image (from with_main_image() when prefetched)"""
+        if hasattr(self, 'prefetched_images'):
+            return self.prefetched_images[0] if self.prefetched_images else None
+        return self.images.order_by(*ProductImage.MAIN_FIRST).first()
 
     @property
     def image_count(self):
-        """Get the number of images for this product"""
+        """Get the number of images for this product (from with_image_count() or with_main_image())"""
+        if hasattr(self, 'image_total'):
+            return self.image_total
+        if hasattr(self, 'prefetched_images'):
+            return len(self.prefetched_images)
         return self.images.count()
 
-    @property
-    def is_low_stock(self):
-        """Check if product is below minimum stock level"""
-        return self.stock_quantity <= self.min_stock_level
-
     @property
     def stock_status(self):
         """Get stock status as string"""
@@ -166,8 +408,10 @@ class ProductImage(models.Model):
         related_name='images',
         verbose_name="Termék"
     )
+    # Content-addressed: rows with identical images share one stored file
     image = models.ImageField(
         upload_to='products/',
+        storage=product_image_storage,
         verbose_name="Kép"
     )
     alt_text = models.CharField(
@@ -183,13 +427,26 @@ class ProductImage(models.Model):
         default=0,
         verbose_name="Sorrend"
     )
+    # Set by inventory.thumbnails once the renditions are stored
+    has_thumbnails = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Bélyegképek elkészültek"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Feltöltve")
 
+    # The main image, then the others in display order
+    MAIN_FIRST = ['-is_main', 'order', 'created_at', 'pk']
+
     class Meta:
         verbose_name = "Termékkép"
         verbose_name_plural = "Termékképek"
         ordering = ['order', 'created_at']
         # unique_together = ['product', 'is_main']  # Removed, handled in save()
+        indexes = [
+            # Reference count of a stored blob (storage.release_blob)
+            models.Index(fields=['image'], name='inventory_image_blob_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - Kép {self.order + 1}"
@@ -200,6 +457,16 @@ class ProductImage(models.Model):
             # Set all other images for this product to not main
             ProductImage.objects.filter(product=self.product).exclude(pk=self.pk).update(is_main=False)
         super().save(*args, **kwargs)
+
+    def thumbnail_url(self, size=120, fmt='webp'):
+        """URL of the smallest rendition covering `size` px, the original until it exists"""
+        from .thumbnails import pick_size, thumbnail_name
+
+        if not self.has_thumbnails:
+            return self.image.url
+        return self.image.storage.url(thumbnail_name(self.image.name, pick_size(size), fmt))
+
+
 class StockMovement(models.Model):
     """Stock movement tracking"""
     MOVEMENT_TYPES = [
@@ -226,31 +493,202 @@ class StockMovement(models.Model):
         null=True,
         verbose_name="Létrehozó"
     )
+    # Change the ledger really applied to the stock; differs from the signed
+    # quantity when the clamp policy stopped at zero. Null on movements
+    # booked before it was recorded, whose signed quantity is assumed.
+    stock_change = models.IntegerField(null=True, editable=False, verbose_name="Készletváltozás")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Létrehozva")
 
     class Meta:
         verbose_name = "Készletmozgás"
         verbose_name_plural = "Készletmozgások"
         ordering = ['-created_at']
+        # Keyset pagination key of stock_movement_list, alone and behind each filter
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='inventory_move_created_idx'),
+            models.Index(fields=['product', '-created_at', '-id'], name='inventory_move_product_idx'),
+            models.Index(fields=['movement_type', '-created_at', '-id'], name='inventory_move_type_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='inventory_move_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.get_movement_type_display()} ({self.quantity})"
 
-    def save(self, *args, **kwargs):
-        """Update product stock when movement is saved"""
-        super().save(*args, **kwargs)
+    @property
+    def delta(self):
+        """Signed change this movement makes to the product stock"""
+        from .ledger import movement_delta
+        return movement_delta(self.movement_type, self.quantity)
+
+    def save(self, *args, policy=None, **kwargs):
+        """Book the movement on the stock ledger when it is first saved"""
+        from .ledger import apply_change
+
+        if not self._state.adding:
+            # Editing an already booked movement must not re-apply it
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            balance, self.stock_change = apply_change(self.product_id, self.delta, policy=policy)
+            super().save(*args, **kwargs)
+        # Keep an already loaded product in sync without reloading it
+        if self._meta.get_field('product').is_cached(self):
+            self.product.stock_quantity = balance
+            self.product.refresh_low_stock()
+
 
-        # Update product stock quantity
-        if self.movement_type == 'IN':
-            self.product.stock_quantity += self.quantity
-        elif self.movement_type == 'OUT':
-            self.product.stock_quantity -= self.quantity
-        elif self.movement_type == 'ADJUSTMENT':
-            # For adjustments, quantity can be positive or negative
-            self.product.stock_quantity += self.quantity
+class StockSnapshot(models.Model):
+    """Stock of a product at a point in time, written by `manage.py snapshot_stock`"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name="Termék"
+    )
+    taken_at = models.DateTimeField(verbose_name="Időpont")
+    quantity = models.IntegerField(verbose_name="Készlet")
+
+    class Meta:
+        verbose_name = "Készlet pillanatkép"
+        verbose_name_plural = "Készlet pillanatképek"
+        ordering = ['-taken_at']
+        constraints = [
+            # Also the index of "latest snapshot of a product before a time"
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='inventory_snapshot_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['taken_at'], name='inventory_snapshot_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity}"
+
+
+class ValuationChange(models.Model):
+    """
+    Signed change of the stock value (stock × net price) of a category,
+    supplier and VAT rate group, written by inventory.valuation whenever a
+    stock movement or a product edit changes it. Their sum per group is
+    the current valuation; compact_valuation folds them into one row each.
+    """
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Kategória"
+    )
+    supplier = models.ForeignKey(
+        Supplier,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Szállító"
+    )
+    vat_rate = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="ÁFA kulcs (%)")
+    net_value = models.DecimalField(max_digits=18, decimal_places=2, verbose_name="Nettó érték")
+
+    class Meta:
+        verbose_name = "Készletérték változás"
+        verbose_name_plural = "Készletérték változások"
 
-        # Ensure stock doesn't go below 0
-        if self.product.stock_quantity < 0:
-            self.product.stock_quantity = 0
 
-        self.product.save()
+class ValuationSnapshot(models.Model):
+    """Stock value of a group at a StockSnapshot, frozen when the snapshot is taken"""
+    taken_at = models.DateTimeField(verbose_name="Időpont")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Kategória"
+    )
+    supplier = models.ForeignKey(
+        Supplier,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Szállító"
+    )
+    vat_rate = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="ÁFA kulcs (%)")
+    net_value = models.DecimalField(max_digits=18, decimal_places=2, verbose_name="Nettó érték")
+
+    class Meta:
+        verbose_name = "Készletérték pillanatkép"
+        verbose_name_plural = "Készletérték pillanatképek"
+        indexes = [
+            models.Index(fields=['taken_at'], name='inventory_valuation_taken_idx'),
+        ]
+
+
+class PriceChange(models.Model):
+    """Append-only history of a product's net price and VAT rate, written by inventory.prices"""
+    SOURCE_FORM = 'form'
+    SOURCE_IMPORT = 'import'
+    SOURCE_INITIAL = 'initial'
+    SOURCE_CHOICES = [
+        (SOURCE_FORM, 'Termék mentése'),
+        (SOURCE_IMPORT, 'Import'),
+        (SOURCE_INITIAL, 'Kezdeti ár'),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='price_changes',
+        verbose_name="Termék"
+    )
+    net_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Nettó ár")
+    vat_rate = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="ÁFA kulcs (%)")
+    valid_from = models.DateTimeField(default=timezone.now, verbose_name="Érvényes ettől")
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, verbose_name="Forrás")
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Módosította"
+    )
+
+    class Meta:
+        verbose_name = "Árváltozás"
+        verbose_name_plural = "Árváltozások"
+        ordering = ['-valid_from', '-id']
+        indexes = [
+            # Latest price of a product at a moment: one index probe per product
+            models.Index(fields=['product', '-valid_from', '-id'], name='inventory_price_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.net_price} ({self.valid_from:%Y-%m-%d %H:%M})"
+
+
+class ProductVelocity(models.Model):
+    """
+    Quantity taken out of a product (OUT movements) in the rolling windows
+    of inventory.reorder and the daily consumption derived from them,
+    refreshed by `manage.py refresh_reorder`. Products without withdrawals
+    in the windows have no row.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='velocity',
+        verbose_name="Termék"
+    )
+    out_7d = models.IntegerField(default=0, verbose_name="Kivét (7 nap)")
+    out_30d = models.IntegerField(default=0, verbose_name="Kivét (30 nap)")
+    out_90d = models.IntegerField(default=0, verbose_name="Kivét (90 nap)")
+    daily_velocity = models.FloatField(verbose_name="Napi fogyás")
+    computed_at = models.DateTimeField(verbose_name="Számítva")
+
+    class Meta:
+        verbose_name = "Termék fogyás"
+        verbose_name_plural = "Termék fogyások"
+        indexes = [
+            models.Index(fields=['computed_at'], name='inventory_velocity_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name}: {self.daily_velocity:.2f}/nap"
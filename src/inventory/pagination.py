@@ -0,0 +1,157 @@
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, QueryDict
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(Exception):
+    """Raised when a pagination token cannot be decoded"""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its millisecond truncation of times"""
+
+    def default(self, o):
+        # A truncated timestamp would skip the rows of the same millisecond
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    """One page of a keyset paginated queryset"""
+
+    def __init__(self, object_list, page_size, next_cursor=None, previous_cursor=None, params=None):
+        self.object_list = object_list
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _querystring(self, cursor):
+        params = self.params.copy() if self.params is not None else QueryDict(mutable=True)
+        params['cursor'] = cursor
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        return self._querystring(self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_querystring(self):
+        return self._querystring(self.previous_cursor) if self.has_previous else ''
+
+
+class KeysetPaginator:
+    """
+    Cursor based paginator: every page is fetched with a WHERE on the ordering
+    key instead of OFFSET, so page N costs the same as page 1.
+
+    `ordering` must be unique (end it with the primary key) and must not
+    contain nullable fields.
+    """
+
+    def __init__(self, queryset, ordering, page_size=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, name) for name, _ in self._fields()]
+        payload = json.dumps({'d': direction, 'v': values}, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            direction, values = payload['d'], payload['v']
+        except (ValueError, TypeError, KeyError, UnicodeDecodeError):
+            raise InvalidCursor(cursor)
+        fields = self._fields()
+        if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(fields):
+            raise InvalidCursor(cursor)
+        opts = self.queryset.model._meta
+        try:
+            values = [opts.get_field(name).to_python(value) for (name, _), value in zip(fields, values)]
+        except Exception:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, reverse):
+        """Build the lexicographic "row comes after the key" condition"""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self._fields(), values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def page(self, cursor=None, params=None):
+        direction, values = ('next', None)
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        reverse = direction == 'prev'
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(rows[-1], 'next')
+            if (has_more and reverse) or (values is not None and not reverse):
+                previous_cursor = self.encode_cursor(rows[0], 'prev')
+        return KeysetPage(rows, self.page_size, next_cursor, previous_cursor, params)
+
+
+def paginate_request(request, queryset, ordering):
+    """Paginate a queryset using the `cursor` and `page_size` GET parameters"""
+    try:
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    paginator = KeysetPaginator(queryset, ordering, page_size)
+    try:
+        return paginator.page(request.GET.get('cursor'), params)
+    except InvalidCursor:
+        raise Http404("Érvénytelen lapozási token.")
@@ -0,0 +1,221 @@
+"""
+Optional monthly range partitioning of the stock movement table (PostgreSQL).
+
+    manage.py partition_stock_movements --convert       # once, in a maintenance window
+    manage.py partition_stock_movements                 # monthly: create the next months
+    manage.py partition_stock_movements --detach-before 2024-01
+
+convert() rebuilds inventory_stockmovement as a table partitioned by
+created_at, one partition per calendar month (in TIME_ZONE) plus a default
+partition for anything outside them, and copies the rows over. The primary
+key becomes (id, created_at) as PostgreSQL requires; ids stay unique since
+they still come from one sequence, so Django keeps using `id` alone. Indexes
+and foreign keys are recreated on the parent and cascade to every partition.
+No other table may reference stock movements with a foreign key.
+
+Old months are archived by detaching their partition, which only touches
+the catalog; the detached table loses its foreign keys and can then be
+dumped and dropped.
+"""
+import datetime
+import re
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import StockMovement
+
+
+TABLE = StockMovement._meta.db_table
+DEFAULT_MONTHS_AHEAD = 3
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def month_start(value):
+    """First moment (in TIME_ZONE) of the month of a date or datetime"""
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+    start = datetime.datetime(value.year, value.month, 1)
+    return timezone.make_aware(start, timezone.get_default_timezone())
+
+
+def add_months(start, months):
+    month = start.month - 1 + months
+    return month_start(datetime.date(start.year + month // 12, month % 12 + 1, 1))
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start.year:04d}_{start.month:02d}'
+
+
+def _literal(moment):
+    # DDL takes no parameters; the value is always a datetime formatted here
+    return "'%s'" % moment.isoformat()
+
+
+def _bounds(start):
+    return f'FROM ({_literal(start)}) TO ({_literal(add_months(start, 1))})'
+
+
+def _check_vendor(connection):
+    if connection.vendor != 'postgresql':
+        raise PartitioningError("Partitioning the stock movements needs PostgreSQL")
+
+
+def is_partitioned(using='default'):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions(using='default'):
+    """{month start: partition name} of the monthly partitions, oldest first"""
+    pattern = re.compile(rf'^{re.escape(TABLE)}_p(\d{{4}})_(\d{{2}})$')
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            months[month_start(datetime.date(int(match[1]), int(match[2]), 1))] = name
+    return dict(sorted(months.items()))
+
+
+def create_partition(cursor, start):
+    """
+    Add the partition of one month. Rows of that month already stored in the
+    default partition are moved into it before it is attached.
+    """
+    name = partition_name(start)
+    qn = cursor.db.ops.quote_name
+    table, default, partition = qn(TABLE), qn(f'{TABLE}_default'), qn(name)
+    end = add_months(start, 1)
+    cursor.execute(f'CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {default} WHERE created_at >= {_literal(start)} '
+        f'AND created_at < {_literal(end)} RETURNING *) INSERT INTO {partition} SELECT * FROM moved'
+    )
+    cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES {_bounds(start)}')
+    return name
+
+
+def ensure_partitions(months_ahead=DEFAULT_MONTHS_AHEAD, using='default'):
+    """Create the missing partitions from the current month to `months_ahead` later"""
+    connection = connections[using]
+    _check_vendor(connection)
+    if not is_partitioned(using):
+        raise PartitioningError("The stock movement table is not partitioned, run --convert first")
+
+    existing = list_partitions(using)
+    current = month_start(timezone.now())
+    created = []
+    with transaction.atomic(using), connection.cursor() as cursor:
+        for n in range(months_ahead + 1):
+            start = add_months(current, n)
+            if start not in existing:
+                created.append(create_partition(cursor, start))
+    return created
+
+
+def convert(months_ahead=DEFAULT_MONTHS_AHEAD, using='default'):
+    """
+    Rebuild the stock movement table as a monthly partitioned one, in a
+    single transaction holding an exclusive lock. Returns the partitions.
+    """
+    connection = connections[using]
+    _check_vendor(connection)
+    if is_partitioned(using):
+        raise PartitioningError("The stock movement table is already partitioned")
+
+    qn = connection.ops.quote_name
+    table, old = qn(TABLE), qn(f'{TABLE}_old')
+    with transaction.atomic(using), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes i JOIN pg_class c ON c.relname = i.indexname "
+            "JOIN pg_index x ON x.indexrelid = c.oid "
+            "WHERE i.tablename = %s AND NOT x.indisprimary",
+            [TABLE],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id'), is_identity = 'YES' FROM information_schema.columns "
+            "WHERE table_name = %s AND column_name = 'id'",
+            [TABLE, TABLE],
+        )
+        sequence, identity = cursor.fetchone()
+        cursor.execute(f'SELECT min(created_at) FROM {table}')
+        oldest = cursor.fetchone()[0] or timezone.now()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE TABLE {qn(f"{TABLE}_default")} PARTITION OF {table} DEFAULT')
+        partitions = []
+        start, last = month_start(oldest), add_months(month_start(timezone.now()), months_ahead)
+        while start <= last:
+            name = partition_name(start)
+            cursor.execute(f'CREATE TABLE {qn(name)} PARTITION OF {table} FOR VALUES {_bounds(start)}')
+            partitions.append(name)
+            start = add_months(start, 1)
+
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        if identity:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) FROM {table}",
+                [TABLE],
+            )
+        elif sequence:
+            # A serial column's sequence would be dropped together with the old table
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        cursor.execute(f'DROP TABLE {old}')
+
+        # Names are free again now that the old table is gone
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {qn(f"{TABLE}_pkey")} PRIMARY KEY (id, created_at)')
+        for sql in indexes:
+            cursor.execute(sql)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {qn(name)} {definition}')
+    return partitions
+
+
+def detach_before(month, using='default'):
+    """Detach the partitions of the months before `month`; returns their names"""
+    connection = connections[using]
+    _check_vendor(connection)
+    qn = connection.ops.quote_name
+    cutoff = month_start(month)
+    detached = []
+    with transaction.atomic(using), connection.cursor() as cursor:
+        for start, name in list_partitions(using).items():
+            if start < cutoff:
+                cursor.execute(f'ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}')
+                # The archived rows must not keep their products and users from being deleted
+                cursor.execute(
+                    "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                    [name],
+                )
+                for (constraint,) in cursor.fetchall():
+                    cursor.execute(f'ALTER TABLE {qn(name)} DROP CONSTRAINT {qn(constraint)}')
+                detached.append(name)
+    return detached
@@ -0,0 +1,82 @@
+"""
+Price history.
+
+Product.net_price and vat_rate hold the current price. Every change is also
+appended to PriceChange, with the time it took effect and who made it:
+Product.save() records it for the product form and the admin, the CSV
+import for its upserts, and new products start with their first price.
+Rows are never updated; they go away only with their product.
+
+    prices_at(when, products=[1, 2, 3])    # {product id: (net price, VAT rate)}
+    Product.objects.with_price_at(when)    # annotates net_price_at, vat_rate_at
+
+Either way it is a single query, a correlated subquery per product that
+reads one entry of the (product, valid_from) index.
+"""
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import PriceChange, Product
+
+
+def latest_prices(when, product=OuterRef('pk')):
+    """PriceChange rows valid at `when` of the (outer) product, newest first"""
+    return PriceChange.objects.filter(product=product, valid_from__lte=when).order_by('-valid_from', '-id')
+
+
+def annotate_price_at(products, when):
+    """Annotate a Product queryset with `net_price_at` and `vat_rate_at` (None before its first price)"""
+    latest = latest_prices(when)
+    return products.annotate(
+        net_price_at=Subquery(latest.values('net_price')[:1]),
+        vat_rate_at=Subquery(latest.values('vat_rate')[:1]),
+    )
+
+
+def prices_at(when, products=None):
+    """
+    {product id: (net price, VAT rate)} at `when` for a Product queryset or
+    iterable of products / ids (every product by default); products that
+    had no price yet are left out
+    """
+    if products is None:
+        products = Product.objects.all()
+    elif not hasattr(products, 'query'):
+        products = Product.objects.filter(pk__in=[getattr(p, 'pk', p) for p in products])
+    rows = annotate_price_at(products, when).values_list('pk', 'net_price_at', 'vat_rate_at')
+    return {pk: (net_price, vat_rate) for pk, net_price, vat_rate in rows if net_price is not None}
+
+
+def price_of(product):
+    """(net price, VAT rate) of a product instance as Decimals"""
+    opts = Product._meta
+    return (
+        opts.get_field('net_price').to_python(product.net_price),
+        opts.get_field('vat_rate').to_python(product.vat_rate),
+    )
+
+
+def record_saved_product(product, stored, user=None):
+    """Append the price of a saved product if it differs from `stored`, its row from before the save"""
+    net_price, vat_rate = price_of(product)
+    if stored is not None and (stored['net_price'], stored['vat_rate']) == (net_price, vat_rate):
+        return
+    PriceChange.objects.create(
+        product=product, net_price=net_price, vat_rate=vat_rate, changed_by=user, source=PriceChange.SOURCE_FORM,
+    )
+
+
+def record_bulk(prices, before, source, user=None):
+    """
+    Append the prices ({product id: (net price, VAT rate)}) of products
+    written in bulk that differ from `before`, their prices beforehand
+    (missing for new products)
+    """
+    valid_from = timezone.now()
+    return PriceChange.objects.bulk_create([
+        PriceChange(
+            product_id=pk, net_price=net_price, vat_rate=vat_rate,
+            valid_from=valid_from, source=source, changed_by=user,
+        )
+        for pk, (net_price, vat_rate) in prices.items() if before.get(pk) != (net_price, vat_rate)
+    ])
@@ -0,0 +1,187 @@
+"""
+Reorder suggestions from consumption velocity.
+
+`manage.py refresh_reorder` sums the OUT movements of the last 7, 30 and 90
+days per product in one grouped aggregate (conditional SUMs over the
+longest window, served by the (movement_type, created_at) index) and
+stores the sums with the daily velocity derived from them in
+ProductVelocity:
+
+    velocity = 0.5 × out_7d / 7  +  0.3 × out_30d / 30  +  0.2 × out_90d / 90
+
+Windows longer than the product's age are divided by its age instead, so
+new products are not underestimated. The withdrawn quantity is the demand,
+also where the clamp policy gave out less.
+
+Runs are incremental: a product's sums only change when an OUT movement is
+booked or one falls out of a window, so only those products (and ones
+younger than the longest window) are recomputed. `--full` recomputes
+everything, after seeding or deleting movements.
+
+The rest is computed live from the stored velocity, the current stock and
+the supplier's lead time, so the suggestions follow every stock movement:
+
+    days until stockout = stock / velocity
+    reorder point       = velocity × lead time + minimum stock level
+    suggested quantity  = velocity × (lead time + cover days) + minimum
+                          stock level - stock, once stock <= reorder point
+
+    Product.objects.with_reorder().filter(suggested_quantity__gt=0)
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Max, Q, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Ceil, Coalesce
+from django.utils import timezone
+
+from .models import Product, ProductVelocity, StockMovement
+
+
+# ProductVelocity field: (window in days, weight in the velocity)
+WINDOWS = {
+    'out_7d': (7, 0.5),
+    'out_30d': (30, 0.3),
+    'out_90d': (90, 0.2),
+}
+LONGEST_WINDOW = datetime.timedelta(days=max(days for days, _ in WINDOWS.values()))
+# Movements are stamped before their transaction commits; look back this
+# much further so ones committed during the previous run are not missed
+OVERLAP = datetime.timedelta(minutes=10)
+BATCH_SIZE = 2000
+
+
+def lead_time_days():
+    """Lead time of suppliers without their own (INVENTORY_REORDER_LEAD_TIME_DAYS)"""
+    return getattr(settings, 'INVENTORY_REORDER_LEAD_TIME_DAYS', 7)
+
+
+def cover_days():
+    """Days of consumption an order covers beyond the lead time (INVENTORY_REORDER_COVER_DAYS)"""
+    return getattr(settings, 'INVENTORY_REORDER_COVER_DAYS', 14)
+
+
+def daily_velocity(sums, age):
+    """Weighted daily consumption from {window field: quantity} of a product `age` old"""
+    age_days = max(age.total_seconds() / 86400, 1)
+    return round(sum(weight * sums[name] / min(days, age_days) for name, (days, weight) in WINDOWS.items()), 4)
+
+
+def window_sums(products, now):
+    """
+    {product id: ({window field: quantity taken out}, created_at)} for the
+    products of a Product queryset with withdrawals in the longest window
+    """
+    sums = {
+        name: Sum('quantity', filter=Q(created_at__gt=now - datetime.timedelta(days=days)))
+        for name, (days, _) in WINDOWS.items()
+    }
+    rows = StockMovement.objects.filter(
+        movement_type='OUT', created_at__gt=now - LONGEST_WINDOW, created_at__lte=now, product__in=products,
+    ).order_by().values('product', 'product__created_at').annotate(**sums)
+    return {
+        row['product']: ({name: row[name] or 0 for name in WINDOWS}, row['product__created_at'])
+        for row in rows
+    }
+
+
+def changed_products(since, now):
+    """Products whose velocity may have changed since the run at `since`"""
+    since -= OVERLAP
+    moved = Q(created_at__gt=since)
+    for days, _ in WINDOWS.values():
+        window = datetime.timedelta(days=days)
+        # Fell out of the window since then
+        moved |= Q(created_at__gt=since - window, created_at__lte=now - window)
+    movements = StockMovement.objects.filter(moved, movement_type='OUT').values('product')
+    return Product.objects.filter(Q(pk__in=movements) | Q(created_at__gt=now - LONGEST_WINDOW))
+
+
+def last_refresh():
+    return ProductVelocity.objects.aggregate(at=Max('computed_at'))['at']
+
+
+def refresh(full=False, now=None):
+    """
+    Recompute the velocity of the products changed since the last run (of
+    every product when `full` or on the first run); returns the number of
+    products with a velocity written
+    """
+    now = now or timezone.now()
+    since = None if full else last_refresh()
+    products = Product.objects.all() if since is None else changed_products(since, now)
+    products = products.values('pk')
+
+    rows = [
+        ProductVelocity(
+            product_id=pk, daily_velocity=daily_velocity(sums, now - created_at), computed_at=now, **sums,
+        )
+        for pk, (sums, created_at) in window_sums(products, now).items()
+    ]
+    with transaction.atomic():
+        stale = ProductVelocity.objects.all() if since is None else ProductVelocity.objects.filter(product__in=products)
+        stale.delete()
+        ProductVelocity.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def annotate_reorder(products):
+    """
+    Annotate a Product queryset with `daily_velocity`, `days_until_stockout`
+    (None without consumption), `reorder_point` and `suggested_quantity`
+    """
+    velocity = Coalesce(F('velocity__daily_velocity'), Value(0.0))
+    lead_time = Coalesce(F('supplier__lead_time_days'), Value(lead_time_days()))
+    products = products.annotate(
+        daily_velocity=velocity,
+        reorder_point=ExpressionWrapper(
+            F('daily_velocity') * lead_time + F('min_stock_level'),
+            output_field=FloatField(),
+        ),
+        target_stock=ExpressionWrapper(
+            F('daily_velocity') * (lead_time + Value(cover_days())) + F('min_stock_level'),
+            output_field=FloatField(),
+        ),
+    )
+    return products.annotate(
+        days_until_stockout=Case(
+            When(stock_quantity__lte=0, then=Value(0.0)),
+            When(daily_velocity__gt=0, then=F('stock_quantity') / F('daily_velocity')),
+            default=None,
+            output_field=FloatField(),
+        ),
+        suggested_quantity=Case(
+            When(
+                stock_quantity__lte=F('reorder_point'),
+                then=Cast(Ceil(F('target_stock') - F('stock_quantity')), IntegerField()),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+
+
+def suggestions(products=None):
+    """Products to reorder, by supplier and most urgent first"""
+    if products is None:
+        products = Product.objects.all()
+    # Without consumption only products at or below their minimum level qualify
+    products = products.filter(Q(velocity__isnull=False) | Q(is_low_stock=True))
+    return annotate_reorder(products).filter(suggested_quantity__gt=0).order_by(
+        'supplier__name', 'supplier', F('days_until_stockout').asc(nulls_last=True), 'name', 'pk',
+    )
+
+
+def supplier_totals(products=None):
+    """Number of products to reorder and their net value per supplier: [{supplier, supplier__name, lines, value}]"""
+    value = ExpressionWrapper(
+        F('suggested_quantity') * F('net_price'), output_field=DecimalField(max_digits=18, decimal_places=2)
+    )
+    return list(
+        suggestions(products).order_by('supplier__name', 'supplier').values('supplier', 'supplier__name').annotate(
+            lines=Count('pk'), value=Sum(value),
+        )
+    )
@@ -0,0 +1,156 @@
+"""
+Barcode scan lookup: resolves an EAN-13 or SKU to a compact product payload.
+
+Two cache layers keep scans off the database:
+- an in-process LRU mapping code -> product id (codes are practically
+  immutable; entries expire after INVENTORY_SCAN_LRU_TTL seconds because
+  another worker's invalidation cannot reach this process)
+- the shared Django cache (CACHES must be shared by every worker, see the
+  settings) holding code -> id and id -> payload; payloads are dropped on
+  Product save/delete and on every stock booking, and expire after
+  INVENTORY_SCAN_CACHE_TTL seconds in case a write bypasses that
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+
+CODE_KEY = 'inventory:scan:code:{}'
+PRODUCT_KEY = 'inventory:scan:product:{}'
+MAX_BATCH_CODES = 500
+
+
+class LRUCache:
+    """Small thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_codes = LRUCache(settings.INVENTORY_SCAN_LRU_SIZE, settings.INVENTORY_SCAN_LRU_TTL)
+
+
+def product_payload(product):
+    """Compact representation sent to scanners"""
+    return {
+        'id': product.pk,
+        'sku': product.sku,
+        'ean13': product.ean13,
+        'name': product.name,
+        'stock': product.stock_quantity,
+        'brutto_price': str(product.brutto_price),
+    }
+
+
+def _matches(payload, code):
+    return payload is not None and code in (payload['sku'], payload['ean13'])
+
+
+def lookup_many(codes):
+    """Resolve many scanned codes; unknown codes map to None"""
+    from .models import Product
+
+    codes = list(dict.fromkeys(code.strip() for code in codes if code and code.strip()))
+    ids = {}
+
+    missing = []
+    for code in codes:
+        product_id = local_codes.get(code)
+        if product_id is None:
+            missing.append(code)
+        else:
+            ids[code] = product_id
+    if missing:
+        shared = cache.get_many([CODE_KEY.format(code) for code in missing])
+        for code in missing:
+            product_id = shared.get(CODE_KEY.format(code))
+            if product_id is not None:
+                ids[code] = product_id
+                local_codes.set(code, product_id)
+
+    payloads = {}
+    if ids:
+        shared = cache.get_many([PRODUCT_KEY.format(pk) for pk in set(ids.values())])
+        payloads = {payload['id']: payload for payload in shared.values()}
+
+    # Unknown codes, evicted payloads and codes moved to another product
+    # are resolved again through the unique sku / ean13 indexes
+    unresolved = [code for code in codes if not _matches(payloads.get(ids.get(code)), code)]
+    if unresolved:
+        products = Product.objects.filter(Q(sku__in=unresolved) | Q(ean13__in=unresolved)).only(
+            'id', 'sku', 'ean13', 'name', 'stock_quantity'
+        ).with_brutto_price()
+        to_cache = {}
+        for product in products:
+            payload = product_payload(product)
+            payloads[product.pk] = payload
+            to_cache[PRODUCT_KEY.format(product.pk)] = payload
+            for code in (product.sku, product.ean13):
+                if code:
+                    to_cache[CODE_KEY.format(code)] = product.pk
+                    ids[code] = product.pk
+                    local_codes.set(code, product.pk)
+        cache.set_many(to_cache, settings.INVENTORY_SCAN_CACHE_TTL)
+
+    results = {}
+    for code in codes:
+        payload = payloads.get(ids.get(code))
+        if not _matches(payload, code):
+            local_codes.delete(code)
+            payload = None
+        results[code] = payload
+    return results
+
+
+def lookup(code):
+    """Resolve one scanned code, None if unknown"""
+    return lookup_many([code]).get(code.strip())
+
+
+def invalidate(product_ids, codes=()):
+    """Drop cached payloads (and code mappings) once the current transaction commits"""
+    keys = [PRODUCT_KEY.format(pk) for pk in product_ids]
+    keys += [CODE_KEY.format(code) for code in codes if code]
+
+    def drop():
+        cache.delete_many(keys)
+        for code in codes:
+            if code:
+                local_codes.delete(code)
+
+    transaction.on_commit(drop)
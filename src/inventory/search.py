@@ -0,0 +1,218 @@
+"""
+Product search backends.
+
+Every backend filters a Product queryset so that each word of the query
+matches (in any order) the name, SKU, EAN-13 or description of a product:
+
+- PostgresSearchBackend: tsvector prefix match plus pg_trgm similarity on
+  the name, both served by the GIN indexes of migration 0006
+- SqliteFTSSearchBackend: FTS5 table kept in sync by triggers, installed by
+  install_sqlite_fts after every migrate (development)
+- ContainsSearchBackend: plain icontains, works everywhere without indexes
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+def search_terms(query):
+    """Split a query into words, dropping everything a search syntax could choke on"""
+    return re.findall(r'\w+', query or '')
+
+
+class ContainsSearchBackend:
+    """Fallback backend: every term must be contained in one of the fields"""
+
+    fields = ['name', 'sku', 'ean13', 'description']
+
+    def filter(self, queryset, query):
+        for term in search_terms(query):
+            condition = Q()
+            for field in self.fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def search(self, queryset, query, ranked=False):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        queryset = self.filter(queryset, query)
+        if ranked:
+            queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset
+
+
+class PostgresSearchBackend(ContainsSearchBackend):
+    """Full-text prefix search with trigram fuzzy matching on the name"""
+
+    # Must stay identical to the expression indexed in migration 0006
+    document = (
+        "to_tsvector('simple', coalesce(\"inventory_product\".\"name\", '') || ' ' || "
+        "coalesce(\"inventory_product\".\"sku\", '') || ' ' || "
+        "coalesce(\"inventory_product\".\"ean13\", '') || ' ' || "
+        "coalesce(\"inventory_product\".\"description\", ''))"
+    )
+
+    def _tsquery(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def search(self, queryset, query, ranked=False):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        tsquery = self._tsquery(terms)
+        # Codes are compared as typed: SKUs are case sensitive
+        code = query.strip()
+        matches = RawSQL(
+            f"({self.document} @@ to_tsquery('simple', %s) OR \"inventory_product\".\"name\" %% %s)",
+            [tsquery, query],
+            output_field=BooleanField(),
+        )
+        queryset = queryset.filter(matches | Q(sku=code) | Q(ean13=code))
+        if ranked:
+            # An exact SKU / EAN-13 hit outranks every text match
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"ts_rank({self.document}, to_tsquery('simple', %s)) + similarity(\"inventory_product\".\"name\", %s)"
+                f" + CASE WHEN \"inventory_product\".\"sku\" = %s OR \"inventory_product\".\"ean13\" = %s"
+                f" THEN 2 ELSE 0 END",
+                [tsquery, query, code, code],
+                output_field=FloatField(),
+            ))
+        return queryset
+
+
+class SqliteFTSSearchBackend(ContainsSearchBackend):
+    """FTS5 prefix search for SQLite development databases"""
+
+    table = 'inventory_product_fts'
+
+    def _match(self, terms):
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query, ranked=False):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        match = self._match(terms)
+        if ranked:
+            # Join the FTS table so MATCH runs once; its rank column is bm25(),
+            # lower for better matches. A correlated subquery would repeat the
+            # MATCH for every candidate row.
+            return queryset.extra(
+                select={'search_rank': f'-{self.table}.rank'},
+                tables=[self.table],
+                where=[f'{self.table} MATCH %s', f'{self.table}.rowid = "inventory_product"."id"'],
+                params=[match],
+            )
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match]
+        ))
+
+
+FTS_TABLE = SqliteFTSSearchBackend.table
+
+SQLITE_FTS_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inventory_product BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, sku, ean13, description)
+            VALUES (new.id, new.name, new.sku, new.ean13, new.description);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inventory_product BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, ean13, description)
+            VALUES ('delete', old.id, old.name, old.sku, old.ean13, old.description);
+        END
+    """,
+    # Only the searched columns, so stock bookings never touch the index
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF name, sku, ean13, description ON inventory_product BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, ean13, description)
+            VALUES ('delete', old.id, old.name, old.sku, old.ean13, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, name, sku, ean13, description)
+            VALUES (new.id, new.name, new.sku, new.ean13, new.description);
+        END
+    """,
+}
+
+
+def install_sqlite_fts(using='default', **kwargs):
+    """
+    Create the FTS5 table and its sync triggers on SQLite.
+
+    Runs after every migrate: SQLite rebuilds tables on most ALTERs, which
+    silently drops the triggers, so missing ones are recreated and the
+    index is rebuilt from the product table.
+    """
+    from django.db import connections
+
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        if not any('FTS5' in row[0] for row in cursor.fetchall()):
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        if 'inventory_product' not in existing:
+            return
+        missing = [name for name in [FTS_TABLE, *SQLITE_FTS_TRIGGERS] if name not in existing]
+        if not missing:
+            return
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                name, sku, ean13, description,
+                content='inventory_product', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        for sql in SQLITE_FTS_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+_backend = None
+
+
+def _fts_table_exists():
+    with connection.cursor() as cursor:
+        return FTS_TABLE in connection.introspection.table_names(cursor)
+
+
+def get_search_backend():
+    """Backend from INVENTORY_SEARCH_BACKEND, or picked from the database vendor"""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'INVENTORY_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        elif connection.vendor == 'sqlite' and _fts_table_exists():
+            _backend = SqliteFTSSearchBackend()
+        else:
+            _backend = ContainsSearchBackend()
+    return _backend
+
+
+def normalize_query(query):
+    """Canonical form of a query: word order and case do not change the matches"""
+    return ' '.join(sorted(set(term.lower() for term in search_terms(query))))
+
+
+def search_products(queryset, query, ranked=False):
+    """
+    Filter `queryset` by `query`. With ranked=True the results carry a
+    `search_rank` annotation and are ordered best match first.
+    """
+    queryset = get_search_backend().search(queryset, query, ranked=ranked)
+    if ranked and search_terms(query):
+        queryset = queryset.order_by('-search_rank', 'name', 'id')
+    return queryset
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import scan, thumbnails, valuation
+from .categories import invalidate_category_tree
+from .storage import release_blob
+from .models import Category, Product, ProductImage
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_scan_cache(sender, instance, **kwargs):
+    """Scanned payloads must not outlive a product change"""
+    scan.invalidate([instance.pk], [instance.sku, instance.ean13])
+
+
+@receiver(pre_delete, sender=Product)
+def remove_from_valuation(sender, instance, **kwargs):
+    """The stock value of a deleted product leaves the valuation"""
+    valuation.record_products(Product.objects.filter(pk=instance.pk), -1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """Any category change (including subtree moves) invalidates the cached tree"""
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=ProductImage)
+def schedule_thumbnails(sender, instance, **kwargs):
+    """Render thumbnails for new uploads (and images whose renditions are missing)"""
+    if not instance.has_thumbnails and instance.image:
+        thumbnails.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=ProductImage)
+def release_image_blob(sender, instance, **kwargs):
+    """Drop the stored file once the last image row using it is gone"""
+    name, storage = instance.image.name, instance.image.storage
+    transaction.on_commit(lambda: release_blob(name, storage))
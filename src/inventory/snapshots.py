@@ -0,0 +1,125 @@
+"""
+Point-in-time stock.
+
+`manage.py snapshot_stock` stores every product's stock at the start of the
+day (or month) in StockSnapshot. The stock at any moment T is then
+
+    latest snapshot at or before T  +  stock changes booked after it, up to T
+
+or, for products without such a snapshot, the current stock minus the
+changes booked after T. Changes are StockMovement.stock_change, what the
+ledger really applied (a clamped withdrawal takes less than its quantity),
+so no history has to be replayed from the beginning. Stock edited on the
+product form without a movement is only picked up by the next snapshot.
+
+    stock_at(datetime(2025, 12, 31, 23, 59, 59), products=[1, 2, 3])
+    Product.objects.filter(category=...).with_stock_at(when)
+
+Either way it is a single query: correlated subqueries per product that
+use the (product, taken_at) and (product, created_at) indexes.
+"""
+import datetime
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot, ValuationSnapshot
+
+
+PERIODS = ('day', 'month')
+
+# Signed change of a movement; the quantity stands in for rows booked before
+# stock_change was recorded
+STOCK_CHANGE = Coalesce(
+    F('stock_change'),
+    Case(When(movement_type='OUT', then=-F('quantity')), default=F('quantity')),
+    output_field=IntegerField(),
+)
+
+
+def _change_sum(movements):
+    """Sum of the stock changes of `movements`, a queryset correlated to the product"""
+    total = movements.order_by().values('product').annotate(total=Sum(STOCK_CHANGE)).values('total')
+    return Coalesce(Subquery(total, output_field=IntegerField()), 0)
+
+
+def annotate_stock_at(products, when):
+    """Annotate a Product queryset with `stock_at`, its stock at `when`"""
+    snapshots = StockSnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=when).order_by('-taken_at')
+    movements = StockMovement.objects.filter(product=OuterRef('pk'))
+    products = products.annotate(
+        stock_snapshot_at=Subquery(snapshots.values('taken_at')[:1]),
+        stock_snapshot_quantity=Subquery(snapshots.values('quantity')[:1]),
+    )
+    return products.annotate(stock_at=Case(
+        When(created_at__gt=when, then=Value(0)),
+        When(
+            stock_snapshot_at__isnull=False,
+            then=F('stock_snapshot_quantity') + _change_sum(
+                movements.filter(created_at__gt=OuterRef('stock_snapshot_at'), created_at__lte=when)
+            ),
+        ),
+        default=F('stock_quantity') - _change_sum(movements.filter(created_at__gt=when)),
+        output_field=IntegerField(),
+    ))
+
+
+def stock_at(when, products=None):
+    """
+    {product id: stock at `when`} for a Product queryset or iterable of
+    products / ids (every product by default)
+    """
+    if products is None:
+        products = Product.objects.all()
+    elif not hasattr(products, 'query'):
+        products = Product.objects.filter(pk__in=[getattr(p, 'pk', p) for p in products])
+    return dict(annotate_stock_at(products, when).values_list('pk', 'stock_at'))
+
+
+def period_start(period, moment=None):
+    """Start of the day or month containing `moment` (default: now), in TIME_ZONE"""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown snapshot period: {period!r}")
+    local = timezone.localtime(moment or timezone.now())
+    start = datetime.datetime(local.year, local.month, 1 if period == 'month' else local.day)
+    return timezone.make_aware(start)
+
+
+def previous_period_start(period, start):
+    """Start of the day or month before the one starting at `start`"""
+    if period == 'day':
+        return period_start(period, start - datetime.timedelta(hours=12))
+    return period_start(period, start - datetime.timedelta(days=1))
+
+
+def take_snapshot(at):
+    """
+    Store the stock of every product that existed at `at` with a single
+    INSERT ... SELECT, replacing a snapshot already taken at that moment.
+    Returns the number of rows written.
+    """
+    rows = annotate_stock_at(Product.objects.filter(created_at__lte=at).order_by(), at).values_list('pk', 'stock_at')
+    sql, params = rows.query.sql_with_params()
+    qn = connection.ops.quote_name
+    opts = StockSnapshot._meta
+    columns = ', '.join(qn(opts.get_field(name).column) for name in ('product', 'taken_at', 'quantity'))
+    with transaction.atomic():
+        StockSnapshot.objects.filter(taken_at=at).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {qn(opts.db_table)} ({columns}) '
+                f'SELECT rows.{qn("id")}, %s, rows.{qn("stock_at")} FROM ({sql}) AS rows',
+                [connection.ops.adapt_datetimefield_value(at), *params],
+            )
+            return cursor.rowcount
+
+
+def prune_snapshots(before):
+    """Delete the snapshots older than `before`, except those taken at the start of a month"""
+    old = StockSnapshot.objects.filter(taken_at__lt=before).values_list('taken_at', flat=True).distinct()
+    daily = [moment for moment in old if moment != period_start('month', moment)]
+    ValuationSnapshot.objects.filter(taken_at__in=daily).delete()
+    deleted, _ = StockSnapshot.objects.filter(taken_at__in=daily).delete()
+    return deleted
@@ -0,0 +1,148 @@
+"""
+Content-addressed storage for product images.
+
+Files are named after the SHA-256 of their bytes,
+
+    products/photo.jpg -> products/3a/7f/3a7f...c2.jpg
+
+so the same pack shot uploaded for many SKUs is stored once and every
+ProductImage row points to the same blob. A blob is removed only when the
+last row referencing it is deleted (see signals.release_image_blob).
+
+An upload that finds its blob already stored only touches it, and its row
+is committed later; so does one that loses the race to store the same new
+content, instead of getting a suffixed copy. A blob touched within INVENTORY_IMAGE_BLOB_GRACE
+seconds is therefore never released; `manage.py sweep_image_blobs`
+deletes the unreferenced ones once they are older.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def blob_grace():
+    """Seconds a stored or reused blob is kept even without rows (INVENTORY_IMAGE_BLOB_GRACE)"""
+    return getattr(settings, 'INVENTORY_IMAGE_BLOB_GRACE', 3600)
+
+
+def content_hash(content):
+    """SHA-256 hex digest of a File, read in chunks and rewound afterwards"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, digest):
+    """Storage name of a blob: directory of `name`, two fan-out levels, digest and extension"""
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+
+class _AlreadyStored(Exception):
+    pass
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct file content only once"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content_hash(content))
+        if self.touch(name):
+            return name
+        try:
+            return super().save(name, content, max_length=max_length)
+        except _AlreadyStored:
+            # A concurrent upload of the same content stored it first
+            self.wait_until_written(name)
+            self.touch(name)
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        """A blob is never renamed: an existing file under its name is the same content"""
+        if CONTENT_ADDRESSED.search(name):
+            if self.exists(name):
+                raise _AlreadyStored(name)
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def wait_until_written(self, name):
+        """Block while another save still holds the blob's write lock"""
+        with open(self.path(name), 'rb') as f:
+            locks.lock(f, locks.LOCK_SH)
+            locks.unlock(f)
+
+    def touch(self, name):
+        """Mark a stored blob as just used, so it is not released meanwhile; False if it is missing"""
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete_unused(self, name, grace):
+        """
+        Delete a blob not touched for `grace` seconds; True if it was deleted.
+        It is moved aside before its age is read: an upload reusing it either
+        touched it first, and it is put back, or finds it gone and stores it
+        again. Either way the content under the name is the same.
+        """
+        path = self.path(name)
+        released = f'{path}.{uuid.uuid4().hex}.released'
+        try:
+            os.rename(path, released)
+        except FileNotFoundError:
+            return False
+        if time.time() - os.stat(released).st_mtime < grace:
+            os.replace(released, path)
+            return False
+        os.remove(released)
+        return True
+
+    def save_exact(self, name, content):
+        """Store under `name` as given, for files derived from a blob (thumbnails)"""
+        return super().save(name, content)
+
+
+def product_image_storage():
+    return ContentAddressedStorage()
+
+
+def release_blob(name, storage, grace=None):
+    """
+    Delete a blob and its thumbnails once no ProductImage references it and
+    it was not touched for `grace` seconds (blob_grace()); True if deleted
+    """
+    from .models import ProductImage
+    from .thumbnails import delete_thumbnails
+
+    if not name or ProductImage.objects.filter(image=name).exists():
+        return False
+    if isinstance(storage, ContentAddressedStorage):
+        if not storage.delete_unused(name, blob_grace() if grace is None else grace):
+            return False
+    else:
+        storage.delete(name)
+    delete_thumbnails(name, storage)
+    return True
@@ -0,0 +1,335 @@
+"""
+Synthetic inventory data for benchmarks and load tests.
+
+generate() builds a reproducible data set of a given shape: a category tree
+`category_depth` levels deep with `category_fanout` children per node,
+suppliers, products with valid EAN-13 codes, stock movements spread over
+the last `history_days` days whose sum is the product's stock, and image
+rows that all share one placeholder blob.
+
+Products are numbered from `offset` + 1 (SKU `SYN-00000001`, EAN-13
+599000000001x) and created in batches, each seeded from (seed, first
+number), so the same arguments always produce the same rows and batches can
+be written by several processes at once. The category tree and suppliers
+are reused when they already exist, so a data set can be grown by running
+again with a higher offset.
+"""
+import multiprocessing
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+from PIL import Image
+
+from . import reorder, valuation
+from .forms import ean13_check_digit
+from .models import Category, PriceChange, Product, ProductImage, StockMovement, Supplier
+from .uploads import MAX_IMAGES
+
+
+BATCH_SIZE = 1000
+# Rows per UPDATE ... CASE of set_created_at(): three parameters each, under SQLite's 999
+TIMESTAMP_CHUNK = 300
+
+SKU_PREFIX = 'SYN-'
+# GS1 prefix of Hungary; the rest of the code is the product number
+EAN_PREFIX = '599'
+
+ROOT_CATEGORIES = [
+    'Elektronika', 'Irodaszer', 'Bútor', 'Számítástechnika', 'Szerszámok', 'Háztartás',
+    'Világítás', 'Kertészet', 'Autóalkatrész', 'Csomagolóanyag',
+]
+ADJECTIVES = [
+    'Prémium', 'Klasszikus', 'Professzionális', 'Kompakt', 'Vezeték nélküli', 'Ergonomikus',
+    'Rozsdamentes', 'Digitális', 'Hordozható', 'Ipari', 'Mini', 'Extra erős',
+]
+NOUNS = [
+    'csavarhúzó', 'fúrógép', 'laptop', 'egér', 'billentyűzet', 'monitor', 'kábel', 'lámpa',
+    'szék', 'asztal', 'nyomtató', 'fejhallgató', 'töltő', 'kalapács', 'fogó', 'mérőszalag',
+]
+VAT_RATES = [Decimal('27.00'), Decimal('27.00'), Decimal('27.00'), Decimal('18.00'), Decimal('5.00')]
+IN_REASONS = ['Beszállítói szállítmány', 'Vevői visszáru', 'Nyitókészlet']
+OUT_REASONS = ['Értékesítés', 'Webshop rendelés', 'Belső felhasználás', 'Selejtezés']
+
+
+@dataclass
+class Shape:
+    """Size of the generated data set"""
+    products: int = 1000
+    category_depth: int = 3
+    category_fanout: int = 4
+    suppliers: int = 20
+    movements: int = 5000
+    images: int = 1000
+    history_days: int = 730
+    seed: int = 1
+    offset: int = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+
+@dataclass
+class Generated:
+    categories: int = 0
+    suppliers: int = 0
+    products: int = 0
+    movements: int = 0
+    images: int = 0
+    category_ids: list = field(default_factory=list, repr=False)
+
+    def as_dict(self):
+        return {
+            'categories': self.categories,
+            'suppliers': self.suppliers,
+            'products': self.products,
+            'movements': self.movements,
+            'images': self.images,
+        }
+
+    def add(self, counts):
+        products, movements, images = counts
+        self.products += products
+        self.movements += movements
+        self.images += images
+
+
+def ean13(number):
+    """Valid EAN-13 code for a product number"""
+    code = f'{EAN_PREFIX}{number:09d}'
+    return code + ean13_check_digit(code)
+
+
+def sku(number):
+    return f'{SKU_PREFIX}{number:08d}'
+
+
+def product_name(rng):
+    return f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.randint(100, 9999)}'
+
+
+def create_categories(depth, fanout):
+    """Category tree `depth` levels deep (existing nodes are reused); returns every id"""
+    ids = []
+    level = [None]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for n in range(1, fanout + 1):
+                if parent:
+                    name = f'{parent.name}.{n}'
+                else:
+                    name = ROOT_CATEGORIES[n - 1] if n <= len(ROOT_CATEGORIES) else f'Kategória {n}'
+                category = Category.objects.filter(name=name).first()
+                if category is None:
+                    # save() fills in path, full_name and depth
+                    category = Category(name=name, parent=parent)
+                    category.save()
+                next_level.append(category)
+        ids.extend(category.pk for category in next_level)
+        level = next_level
+    return ids
+
+
+def create_suppliers(count):
+    """Suppliers `Szállító 1 Kft.`..., reusing the ones that already exist"""
+    names = [f'Szállító {n} Kft.' for n in range(1, count + 1)]
+    existing = dict(Supplier.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = [
+        Supplier(
+            name=name,
+            contact_person=f'Kapcsolattartó {n}',
+            email=f'rendeles@szallito{n}.hu',
+            phone=f'+36 1 {n:03d} {n * 7 % 10000:04d}',
+        )
+        for n, name in enumerate(names, start=1) if name not in existing
+    ]
+    existing.update((supplier.name, supplier.pk) for supplier in Supplier.objects.bulk_create(missing))
+    return [existing[name] for name in names]
+
+
+def movement_history(rng, count, since, until):
+    """
+    (movement_type, quantity, reason, created_at) tuples between `since` and
+    `until`, starting with a receipt and never going below zero, and the
+    resulting balance.
+    """
+    span = (until - since).total_seconds()
+    moments = sorted(rng.random() * span for _ in range(count))
+    history = []
+    balance = 0
+    for i, moment in enumerate(moments):
+        created_at = since + timedelta(seconds=moment)
+        if i == 0 or balance == 0 or rng.random() < 0.3:
+            quantity = rng.randint(5, 200)
+            history.append(('IN', quantity, rng.choice(IN_REASONS), created_at))
+            balance += quantity
+        else:
+            quantity = rng.randint(1, max(1, balance // 3))
+            history.append(('OUT', quantity, rng.choice(OUT_REASONS), created_at))
+            balance -= quantity
+    return history, balance
+
+
+def _spread(total, count, rng):
+    """Split `total` into `count` random non-negative parts"""
+    parts = [0] * count
+    for _ in range(total):
+        parts[rng.randrange(count)] += 1
+    return parts
+
+
+def placeholder_image(storage, name='products/placeholder.png'):
+    """Store (once, content-addressed) the image every generated row points to"""
+    output = BytesIO()
+    Image.new('RGB', (64, 64), (200, 200, 200)).save(output, 'PNG')
+    return storage.save(name, ContentFile(output.getvalue()))
+
+
+def product_batch(shape, start, count, category_ids, supplier_ids, until):
+    """
+    Unsaved products start + 1..start + count with their movement histories
+    and image counts, generated from (seed, start) alone.
+    """
+    rng = random.Random(f'{shape.seed}:{start}')
+    movement_counts = _spread(round(shape.movements * count / shape.products), count, rng)
+    image_counts = _spread(round(shape.images * count / shape.products), count, rng)
+    history_start = until - timedelta(days=shape.history_days)
+
+    rows = []
+    for offset in range(count):
+        number = start + offset + 1
+        history, balance = movement_history(rng, movement_counts[offset], history_start, until)
+        product = Product(
+            name=product_name(rng),
+            sku=sku(number),
+            ean13=ean13(number),
+            net_price=Decimal(rng.randint(100, 500000)) / 100,
+            vat_rate=rng.choice(VAT_RATES),
+            category_id=rng.choice(category_ids) if category_ids else None,
+            supplier_id=rng.choice(supplier_ids) if supplier_ids else None,
+            stock_quantity=balance,
+            min_stock_level=rng.choice([0, 5, 10, 20, 50]),
+            created_at=history[0][3] if history else history_start,
+        )
+        product.refresh_low_stock()
+        rows.append((product, history, min(image_counts[offset], MAX_IMAGES)))
+    return rows
+
+
+def set_created_at(model, objects, timestamps):
+    """
+    Overwrite the created_at bulk_create() stamped on saved `objects` with
+    `timestamps`, one UPDATE ... CASE per chunk. The auto_now_add field is
+    left alone: it is shared by every thread of the process.
+    """
+    for start in range(0, len(objects), TIMESTAMP_CHUNK):
+        chunk = list(zip(objects[start:start + TIMESTAMP_CHUNK], timestamps[start:start + TIMESTAMP_CHUNK]))
+        model.objects.filter(pk__in=[obj.pk for obj, _ in chunk]).update(created_at=Case(
+            *[When(pk=obj.pk, then=Value(created_at)) for obj, created_at in chunk],
+            output_field=DateTimeField(),
+        ))
+        for obj, created_at in chunk:
+            obj.created_at = created_at
+
+
+def save_batch(rows, user_id=None, image_name=None):
+    """Insert a product_batch() with its movements and images; returns the counts"""
+    with transaction.atomic():
+        # bulk_create() stamps now() over the generated dates
+        product_dates = [product.created_at for product, _, _ in rows]
+        products = Product.objects.bulk_create([product for product, _, _ in rows])
+        set_created_at(Product, products, product_dates)
+        movements = [
+            # bulk_create bypasses the ledger: stock_quantity already holds the sum
+            StockMovement(
+                product_id=product.pk, movement_type=movement_type, quantity=quantity,
+                stock_change=quantity if movement_type == 'IN' else -quantity,
+                reason=reason, created_at=created_at, created_by_id=user_id,
+            )
+            for product, (_, history, _) in zip(products, rows)
+            for movement_type, quantity, reason, created_at in history
+        ]
+        movement_dates = [movement.created_at for movement in movements]
+        StockMovement.objects.bulk_create(movements, batch_size=BATCH_SIZE)
+        set_created_at(StockMovement, movements, movement_dates)
+        valuation.record_products(Product.objects.filter(pk__in=[product.pk for product in products]))
+        PriceChange.objects.bulk_create([
+            PriceChange(
+                product_id=product.pk, net_price=product.net_price, vat_rate=product.vat_rate,
+                valid_from=product.created_at, source=PriceChange.SOURCE_INITIAL,
+            )
+            for product in products
+        ], batch_size=BATCH_SIZE)
+        images = []
+        if image_name:
+            images = [
+                ProductImage(product_id=product.pk, image=image_name, is_main=n == 0, order=n)
+                for product, (_, _, image_count) in zip(products, rows)
+                for n in range(image_count)
+            ]
+            ProductImage.objects.bulk_create(images, batch_size=BATCH_SIZE)
+    return len(products), len(movements), len(images)
+
+
+def _write_batch(job):
+    shape, start, count, category_ids, supplier_ids, until, user_id, image_name = job
+    rows = product_batch(shape, start, count, category_ids, supplier_ids, until)
+    return save_batch(rows, user_id=user_id, image_name=image_name)
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    # Spawned workers start from scratch; forked ones must not share the parent's sockets
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def generate(shape, user=None, batch_size=BATCH_SIZE, workers=1, progress=None):
+    """
+    Create the whole data set described by `shape`, writing the product
+    batches on `workers` processes. `progress(generated)` is called after
+    every batch.
+    """
+    result = Generated()
+    result.category_ids = create_categories(shape.category_depth, shape.category_fanout)
+    result.categories = len(result.category_ids)
+    supplier_ids = create_suppliers(shape.suppliers)
+    result.suppliers = len(supplier_ids)
+
+    image_name = None
+    if shape.images:
+        image_name = placeholder_image(ProductImage._meta.get_field('image').storage)
+
+    until = timezone.now()
+    user_id = user.pk if user else None
+    jobs = (
+        (shape, start, min(batch_size, shape.offset + shape.products - start),
+         result.category_ids, supplier_ids, until, user_id, image_name)
+        for start in range(shape.offset, shape.offset + shape.products, batch_size)
+    )
+
+    if workers > 1:
+        connections.close_all()
+        with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+            for counts in pool.imap_unordered(_write_batch, jobs):
+                result.add(counts)
+                if progress:
+                    progress(result)
+    else:
+        for job in jobs:
+            result.add(_write_batch(job))
+            if progress:
+                progress(result)
+    # The generated movements are dated in the past, before any incremental refresh would look
+    reorder.refresh(full=True)
+    return result
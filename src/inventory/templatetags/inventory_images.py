@@ -0,0 +1,16 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail_url(product_image, size=120):
+    """{{ image|thumbnail_url:120 }} - WebP rendition URL of a ProductImage"""
+    return product_image.thumbnail_url(int(size))
+
+
+@register.filter
+def thumbnail_jpeg_url(product_image, size=120):
+    """{{ image|thumbnail_jpeg_url:120 }} - JPEG fallback for browsers without WebP"""
+    return product_image.thumbnail_url(int(size), fmt='jpg')
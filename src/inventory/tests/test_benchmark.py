@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from inventory import benchmark
+from inventory.models import StockMovement
+from inventory.synthetic import Shape, generate
+
+
+class BenchmarkRunTests(TestCase):
+    # Scenarios answered without an HTML template: JSON and a redirect
+    SCENARIOS = ['product_search_json', 'stock_movement_create']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('raktar')
+        generate(Shape(products=20, movements=30, images=0, history_days=30), user=cls.user)
+
+    def test_run_and_compare(self):
+        booked = StockMovement.objects.filter(reason='benchmark')
+        results = benchmark.run(self.user, self.SCENARIOS, repeat=3, warmup=1)
+        self.assertEqual(list(results['scenarios']), self.SCENARIOS)
+        for timings in results['scenarios'].values():
+            self.assertEqual(timings['runs'], 3)
+            self.assertGreater(timings['queries'], 0)
+        # Every run books a movement for one of the sampled products
+        self.assertEqual(booked.count(), 4)
+        self.assertEqual(benchmark.compare(results, results), [])
+
+    def test_unknown_scenario(self):
+        with self.assertRaisesMessage(benchmark.BenchmarkError, "Unknown scenarios: nincs"):
+            benchmark.run(self.user, ['nincs'], repeat=1, warmup=0)
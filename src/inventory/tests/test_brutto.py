@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, Value
+from django.test import TestCase
+
+from inventory.export import product_rows
+from inventory.models import BruttoPrice, Product, calculate_brutto, calculate_brutto_many
+
+
+VAT_RATES = [Decimal('0.00'), Decimal('5.00'), Decimal('18.00'), Decimal('27.00')]
+# Every cent up to 2.00, both signs: plenty of x.xx5 products at each rate
+NET_PRICES = [Decimal(cents) / 100 for cents in range(-200, 201)]
+
+
+class BruttoPriceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name=f"{net_price} {vat_rate}", sku=f'B{i}', net_price=net_price, vat_rate=vat_rate)
+            for i, (net_price, vat_rate) in enumerate(
+                (net_price, vat_rate) for vat_rate in VAT_RATES for net_price in NET_PRICES
+            )
+        ])
+
+    def test_half_cents_round_away_from_zero(self):
+        for net_price, vat_rate, brutto in [
+            ('0.50', '27.00', '0.64'),  # 0.635
+            ('-0.50', '27.00', '-0.64'),
+            ('0.25', '18.00', '0.30'),  # 0.295
+            ('0.10', '5.00', '0.11'),  # 0.105
+            ('0.30', '5.00', '0.32'),  # 0.315
+            ('0.00', '27.00', '0.00'),
+            ('1.99', '0.00', '1.99'),
+        ]:
+            expected = Decimal(brutto)
+            self.assertEqual(calculate_brutto(Decimal(net_price), Decimal(vat_rate)), expected)
+            product = Product.objects.with_brutto_price().get(net_price=net_price, vat_rate=vat_rate)
+            self.assertEqual(product.annotated_brutto_price, expected, (net_price, vat_rate))
+            # Query parameters instead of columns
+            literal = BruttoPrice(*(Value(Decimal(v), output_field=DecimalField()) for v in (net_price, vat_rate)))
+            self.assertEqual(Product.objects.annotate(brutto=literal).values_list('brutto', flat=True)[0], expected)
+
+    def test_database_and_columns_match_python(self):
+        products = list(Product.objects.with_brutto_price().order_by('pk'))
+        expected = [calculate_brutto(product.net_price, product.vat_rate) for product in products]
+        self.assertEqual([product.brutto_price for product in products], expected)
+        self.assertEqual(
+            calculate_brutto_many([p.net_price for p in products], [p.vat_rate for p in products]), expected,
+        )
+        self.assertEqual(calculate_brutto_many([None, Decimal('1.00')], [Decimal('27.00'), None]), [Decimal('0.00')] * 2)
+
+    def test_export_column_matches_the_model(self):
+        by_sku = {product.sku: product.brutto_price for product in Product.objects.all()}
+        rows = list(product_rows(Product.objects.all()))
+        self.assertEqual(len(rows), len(by_sku))
+        for row in rows:
+            self.assertEqual(row[7], by_sku[row[0]], row)
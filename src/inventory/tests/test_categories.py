@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from inventory.categories import get_category_path, get_category_tree
+from inventory.models import Category, Product
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create(self, name, parent=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category(name=name, parent=parent)
+            category.save()
+        return category
+
+    def test_tree_order_keeps_subtrees_under_their_parent(self):
+        green = self.create("Zöld")
+        self.create("Zöld (régi)")
+        self.create("Zöld-Kék")
+        apple = self.create("Alma", green)
+        self.create("Jonatán", apple)
+        self.create("Körte", green)
+        self.assertEqual(
+            [(category['name'], category['depth']) for category in get_category_tree()],
+            [("Zöld", 0), ("Alma", 1), ("Jonatán", 2), ("Körte", 1), ("Zöld (régi)", 0), ("Zöld-Kék", 0)],
+        )
+
+    def test_changes_reach_the_cached_tree(self):
+        fruit = self.create("Gyümölcs")
+        self.assertEqual(len(get_category_tree()), 1)
+        apple = self.create("Alma", fruit)
+        self.assertEqual(get_category_path(apple.pk), f'/{fruit.pk}/{apple.pk}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apple.name = "Alma (bio)"
+            apple.save()
+        self.assertEqual(get_category_tree()[1]['full_name'], "Gyümölcs > Alma (bio)")
+        self.assertIsNone(get_category_path('x'))
+
+    def test_moving_a_subtree(self):
+        fruit, vegetable = self.create("Gyümölcs"), self.create("Zöldség")
+        apple = self.create("Alma", fruit)
+        jonathan = self.create("Jonatán", apple)
+        with self.captureOnCommitCallbacks(execute=True):
+            apple.parent = vegetable
+            apple.save()
+        jonathan.refresh_from_db()
+        self.assertEqual(jonathan.path, f'/{vegetable.pk}/{apple.pk}/{jonathan.pk}/')
+        self.assertEqual((jonathan.full_name, jonathan.depth), ("Zöldség > Alma > Jonatán", 2))
+        self.assertEqual(
+            [category['name'] for category in get_category_tree()], ["Gyümölcs", "Zöldség", "Alma", "Jonatán"],
+        )
+
+    def test_products_in_category_tree(self):
+        fruit = self.create("Gyümölcs")
+        apple = self.create("Alma", fruit)
+        other = self.create("Egyéb")
+        Product.objects.create(name="Jonatán", sku='C-1', category=apple)
+        Product.objects.create(name="Szög", sku='C-2', category=other)
+        self.assertEqual(list(Product.objects.in_category_tree(fruit).values_list('sku', flat=True)), ['C-1'])
+        self.assertEqual(Product.objects.in_category_tree(str(fruit.pk)).count(), 1)
+        self.assertEqual(Product.objects.in_category_tree(10 ** 6).count(), 0)
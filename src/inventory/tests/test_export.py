@@ -0,0 +1,62 @@
+import csv
+import io
+import zipfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from inventory.export import product_rows, stream_csv, stream_xlsx
+from inventory.models import Category, Product
+
+
+class ProductExportTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Vasáru")
+        Product.objects.create(
+            name="=HYPERLINK(\"http://x\")", sku='+SKU', net_price=Decimal('-5.00'), category=category,
+        )
+        Product.objects.create(name="Anya", sku='A-1', ean13='5990000000017', net_price=100, stock_quantity=-3)
+
+    def read_csv(self, rows):
+        text = ''.join(stream_csv(rows))
+        self.assertTrue(text.startswith('﻿'))
+        return list(csv.reader(io.StringIO(text[1:]), delimiter=';'))
+
+    def test_rows_in_name_order(self):
+        rows = list(product_rows(Product.objects.all()))
+        self.assertEqual([row[0] for row in rows], ['+SKU', 'A-1'])
+        self.assertEqual(rows[0][3], "Vasáru")
+        self.assertEqual(rows[1][1:3], ('5990000000017', "Anya"))
+        self.assertEqual(rows[1][7], Decimal('127.00'))
+
+    def test_csv_escapes_formula_cells(self):
+        header, first, second = self.read_csv(product_rows(Product.objects.all()))
+        self.assertEqual(header[0], "Cikkszám")
+        self.assertEqual(first[0], "'+SKU")
+        self.assertEqual(first[2], "'=HYPERLINK(\"http://x\")")
+        # Numbers are left alone, negative ones included
+        self.assertEqual(first[5], '-5.00')
+        self.assertEqual(second[:3], ['A-1', '5990000000017', "Anya"])
+        self.assertEqual(second[8], '-3')
+
+    def test_csv_escapes_every_formula_prefix(self):
+        _, row = self.read_csv([('=1+1', '+1', '-1', '@SUM(A1)', '\t=1', 'a=b', '')])
+        self.assertEqual(row, ["'=1+1", "'+1", "'-1", "'@SUM(A1)", "'\t=1", 'a=b', ''])
+
+    def test_xlsx_keeps_text_as_is(self):
+        data = b''.join(stream_xlsx(product_rows(Product.objects.all())))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        # Inline strings are never evaluated
+        self.assertIn('<t xml:space="preserve">+SKU</t>', sheet)
+        self.assertIn('<c><v>-5.00</v></c>', sheet)
+
+    def test_export_view(self):
+        self.client.force_login(get_user_model().objects.create_user('raktar', password='x'))
+        response = self.client.get(reverse('inventory:product_export', args=['csv']))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn("'=HYPERLINK", body)
+        self.assertEqual(self.client.get(reverse('inventory:product_export', args=['pdf'])).status_code, 404)
@@ -0,0 +1,205 @@
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from inventory import thumbnails
+from inventory.models import Product, ProductImage
+from inventory.uploads import reencode, store_images
+
+
+ORIENTATION, MAKE = 0x0112, 0x010F
+
+
+def upload(name='a.jpg', size=(300, 200), mode='RGB', fmt='JPEG', color='blue', exif=None):
+    data = io.BytesIO()
+    options = {'exif': exif.tobytes()} if exif is not None else {}
+    Image.new(mode, size, color).save(data, fmt, **options)
+    return SimpleUploadedFile(name, data.getvalue())
+
+
+class SynchronousExecutor:
+    """Stands in for the thumbnail pool: runs every job on submit"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@override_settings(INVENTORY_THUMBNAIL_WORKERS=2, INVENTORY_THUMBNAIL_SIZES=[120, 480])
+class ImageTestCase(TestCase):
+    """Images in a temporary MEDIA_ROOT; the thumbnail pool runs jobs synchronously"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.product = Product.objects.create(name="Füzet", sku='F1')
+        self.storage = ProductImage._meta.get_field('image').storage
+        for patch in (
+            mock.patch.object(thumbnails, '_get_executor', return_value=SynchronousExecutor()),
+            # Jobs run inside the test transaction, whose connection must stay open
+            mock.patch.object(thumbnails, 'close_old_connections'),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def run_callbacks(self, callbacks):
+        for callback in callbacks:
+            callback()
+
+
+class ThumbnailTests(ImageTestCase):
+    def add_image(self, name='a.jpg', color='blue'):
+        """A new image and its still pending thumbnail job"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            image = ProductImage.objects.create(product=self.product, image=upload(name, color=color))
+        return image, callbacks
+
+    def test_original_is_served_until_rendered(self):
+        image, callbacks = self.add_image()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(image.has_thumbnails)
+        self.assertEqual(image.thumbnail_url(), image.image.url)
+
+        self.run_callbacks(callbacks)
+        image.refresh_from_db()
+        self.assertTrue(image.has_thumbnails)
+        name = image.image.name
+        self.assertEqual(image.thumbnail_url(), self.storage.url(thumbnails.thumbnail_name(name, 120)))
+        self.assertEqual(image.thumbnail_url(200, 'jpg'), self.storage.url(thumbnails.thumbnail_name(name, 480, 'jpg')))
+        for size in (120, 480):
+            for fmt in thumbnails.FORMATS:
+                with self.storage.open(thumbnails.thumbnail_name(name, size, fmt)) as f:
+                    self.assertEqual(max(Image.open(f).size), min(size, 300))
+
+    def test_failed_rendering_keeps_the_original(self):
+        image, callbacks = self.add_image()
+        with mock.patch.object(thumbnails, 'render', side_effect=OSError), self.assertLogs(thumbnails.logger):
+            self.run_callbacks(callbacks)
+        image.refresh_from_db()
+        self.assertEqual(image.thumbnail_url(), image.image.url)
+
+    def test_command_skips_rendered_images(self):
+        rendered, callbacks = self.add_image('a.jpg', 'blue')
+        self.run_callbacks(callbacks)
+        pending, _ = self.add_image('b.jpg', 'red')
+
+        out = io.StringIO()
+        with mock.patch.object(thumbnails.Image, 'open', wraps=Image.open) as opened:
+            call_command('generate_thumbnails', stdout=out)
+        self.assertIn("1 images rendered, 0 failed", out.getvalue())
+        self.assertEqual(opened.call_count, 1)
+        self.assertTrue(ProductImage.objects.get(pk=pending.pk).has_thumbnails)
+
+        thumb = self.storage.path(thumbnails.thumbnail_name(rendered.image.name, 120))
+        os.utime(thumb, (0, 0))
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn("0 images rendered, 0 failed", out.getvalue())
+        self.assertEqual(os.path.getmtime(thumb), 0)
+        call_command('generate_thumbnails', '--all', stdout=out)
+        self.assertIn("2 images rendered, 0 failed", out.getvalue())
+        self.assertNotEqual(os.path.getmtime(thumb), 0)
+
+
+class ReencodeTests(TestCase):
+    def test_exif_is_applied_and_dropped(self):
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6  # rotated 90° clockwise
+        exif[MAKE] = "Kamera"
+        content, extension = reencode(upload(exif=exif))
+        self.assertEqual(extension, 'jpg')
+        image = Image.open(io.BytesIO(content))
+        self.assertEqual(image.size, (200, 300))
+        self.assertEqual(dict(image.getexif()), {})
+        self.assertNotIn('exif', image.info)
+
+    @override_settings(INVENTORY_IMAGE_MAX_DIMENSION=100)
+    def test_longer_side_is_capped(self):
+        content, _ = reencode(upload(size=(300, 200)))
+        self.assertEqual(Image.open(io.BytesIO(content)).size, (100, 67))
+        # Smaller images are not enlarged; transparency keeps them PNG
+        content, extension = reencode(upload('a.png', size=(40, 80), mode='RGBA', fmt='PNG'))
+        self.assertEqual((Image.open(io.BytesIO(content)).size, extension), ((40, 80), 'png'))
+
+
+class StoreImagesTests(ImageTestCase):
+    def store(self, files):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with mock.patch.object(ProductImage.objects, 'bulk_create', wraps=ProductImage.objects.bulk_create) as bulk:
+                errors = store_images(self.product, files)
+        return errors, bulk, callbacks
+
+    def test_one_insert_then_thumbnails(self):
+        errors, bulk, callbacks = self.store([
+            upload('a.jpg', color='blue'), SimpleUploadedFile('rossz.jpg', b'nem kep'), upload('b.jpg', color='red'),
+        ])
+        self.assertEqual(errors, ["rossz.jpg: a fájl nem érvényes kép."])
+        bulk.assert_called_once()
+        images = list(self.product.images.order_by('order'))
+        self.assertEqual([image.order for image in images], [0, 1])
+        self.assertEqual(len({image.image.name for image in images}), 2)
+
+        # Queued for after the commit, one job per stored image
+        self.assertEqual(len(callbacks), 2)
+        self.assertFalse(self.product.images.filter(has_thumbnails=True).exists())
+        self.run_callbacks(callbacks)
+        self.assertEqual(self.product.images.filter(has_thumbnails=True).count(), 2)
+
+        # Later uploads are ordered after the existing images
+        self.store([upload('c.jpg', color='green')])
+        self.assertEqual(self.product.images.order_by('order').last().order, 2)
+
+    def test_nothing_to_store(self):
+        errors, bulk, callbacks = self.store([])
+        self.assertEqual((errors, callbacks), ([], []))
+        bulk.assert_not_called()
+
+
+class ProductListImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user('raktar'))
+
+    def add_products(self, count):
+        for n in range(count):
+            product = Product.objects.create(name=f"Termék {n}", sku=f'IMG-{Product.objects.count()}')
+            ProductImage.objects.bulk_create([
+                ProductImage(product=product, image=f'products/{product.sku}-{i}.jpg', order=i, is_main=i == 1)
+                for i in range(n % 3 + 1)
+            ])
+
+    def get_list(self):
+        with mock.patch('inventory.views.render', return_value=HttpResponse()) as render:
+            self.client.get(reverse('inventory:product_list'))
+        return render.call_args.args[2]['products']
+
+    def test_main_image_and_count_in_a_fixed_number_of_queries(self):
+        self.add_products(9)
+        self.get_list()
+        # Session, user, the page of products and all of their images
+        with self.assertNumQueries(4):
+            products = self.get_list()
+        with self.assertNumQueries(0):
+            shown = [(product.image_count, product.main_image.image.name) for product in products]
+        self.assertEqual(len(shown), 9)
+        expected = [
+            (product.images.count(), product.images.order_by(*ProductImage.MAIN_FIRST).first().image.name)
+            for product in products
+        ]
+        self.assertEqual(shown, expected)
+        self.assertIn((2, 'products/IMG-1-1.jpg'), shown)
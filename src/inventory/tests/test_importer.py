@@ -0,0 +1,127 @@
+import io
+import tempfile
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from inventory import scan
+from inventory.export import product_rows, stream_csv
+from inventory.importer import import_products, read_csv
+from inventory.models import Category, PriceChange, Product, Supplier
+
+
+CSV = """Cikkszám;Név;EAN-13;Nettó ár;Bruttó ár;ÁFA kulcs (%);Kategória;Szállító;Készlet;Minimum készlet
+A1;Alma;5901234123457;100,50;;27;Iroda > Papír;Szállító;10;2
+A2;Körte;;;127;27;Papír;;0;1
+A3;Rossz ean;5901234123458;10;;27;;;1;0
+A1;Dupla;;10;;27;;;1;0
+A4;Ismeretlen kat;;10;;27;Nincs;;1;0
+A5;Nincs ár;;;;27;;;1;0
+EX;Meglevo uj nev;;55;;5;;;99;50
+A6;Ean foglalt;4006381333931;10;;27;;;1;0
+"""
+
+
+def rows(text):
+    return read_csv(io.StringIO(text))
+
+
+class ImportProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        scan.local_codes.clear()
+        root = Category.objects.create(name="Iroda")
+        self.paper = Category.objects.create(name="Papír", parent=root)
+        self.supplier = Supplier.objects.create(name="Szállító")
+        Product.objects.create(name="Meglevo", sku='EX', stock_quantity=7, min_stock_level=0, net_price=1)
+        Product.objects.create(name="Other", sku='OT', ean13='4006381333931', net_price=1)
+
+    def test_upsert_with_line_errors(self):
+        scan.lookup('EX')
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_products(rows(CSV), chunk_size=3)
+        self.assertEqual((result.created, result.updated), (2, 1))
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6, 7, 9])
+
+        a1 = Product.objects.get(sku='A1')
+        self.assertEqual((a1.net_price, a1.category, a1.supplier), (Decimal('100.50'), self.paper, self.supplier))
+        self.assertEqual(a1.stock_quantity, 10)
+        a2 = Product.objects.get(sku='A2')
+        self.assertEqual(a2.net_price, Decimal('100.00'))
+        self.assertIsNone(a2.ean13)
+        self.assertTrue(a2.is_low_stock)
+        # Stock of an existing product only changes through the ledger
+        ex = Product.objects.get(sku='EX')
+        self.assertEqual((ex.name, ex.stock_quantity, ex.min_stock_level, ex.is_low_stock), ("Meglevo uj nev", 7, 50, True))
+        self.assertEqual(scan.lookup('EX')['name'], "Meglevo uj nev")
+
+        result = import_products(rows(CSV))
+        self.assertEqual((result.created, result.updated), (0, 3))
+
+    def test_update_keeps_columns_not_in_the_file(self):
+        product = Product.objects.create(
+            name="Füzet", sku='F1', ean13='5901234123457', description="A5, vonalas", net_price=100,
+            vat_rate=Decimal('5.00'), category=self.paper, supplier=self.supplier,
+            stock_quantity=3, min_stock_level=10,
+        )
+        result = import_products(rows("sku;name;net_price\nF1;Füzet A5;120\n"))
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.net_price), ("Füzet A5", Decimal('120.00')))
+        self.assertEqual(product.description, "A5, vonalas")
+        self.assertEqual(product.ean13, '5901234123457')
+        self.assertEqual((product.category, product.supplier), (self.paper, self.supplier))
+        self.assertEqual((product.vat_rate, product.min_stock_level), (Decimal('5.00'), 10))
+        self.assertTrue(product.is_low_stock)
+        change = PriceChange.objects.filter(product=product).latest('valid_from')
+        self.assertEqual((change.net_price, change.vat_rate), (Decimal('120.00'), Decimal('5.00')))
+
+    def test_gross_price_uses_the_stored_vat_rate(self):
+        product = Product.objects.create(name="Füzet", sku='F1', net_price=100, vat_rate=Decimal('5.00'))
+        import_products(rows("Cikkszám;Bruttó ár\nF1;210\n"))
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.net_price, product.vat_rate), ("Füzet", Decimal('200.00'), Decimal('5.00')))
+
+    def test_defaults_apply_to_new_products(self):
+        result = import_products(rows("sku;name;net_price;vat_rate\nN1;Új;10;\n"))
+        self.assertEqual(result.created, 1)
+        product = Product.objects.get(sku='N1')
+        self.assertEqual((product.vat_rate, product.stock_quantity, product.min_stock_level), (Decimal('27.00'), 0, 0))
+
+    def test_empty_cells_clear_present_columns(self):
+        product = Product.objects.create(
+            name="Füzet", sku='F1', description="Régi", net_price=100, category=self.paper,
+        )
+        import_products(rows("sku;description;category;net_price\nF1;;;100\n"))
+        product.refresh_from_db()
+        self.assertEqual((product.description, product.category), ('', None))
+
+    def test_export_round_trip(self):
+        Product.objects.create(name="-10% akciós csavar", sku='+TOLL', net_price=10, category=self.paper)
+        Product.objects.create(name="@otthon", sku='=1+1', description="Régi", net_price=1)
+        fields = ['sku', 'name', 'description', 'category', 'net_price', 'vat_rate', 'min_stock_level']
+        before = list(Product.objects.order_by('pk').values_list(*fields))
+        text = ''.join(stream_csv(product_rows(Product.objects.all())))
+        self.assertIn(";'-10% akciós csavar;", text)
+
+        result = import_products(rows(text[1:]))
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual((result.created, result.updated), (0, 4))
+        self.assertEqual(list(Product.objects.order_by('pk').values_list(*fields)), before)
+
+    def test_dry_run_and_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8') as file:
+            file.write(CSV)
+            file.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_products', file.name, '--dry-run', stdout=out, stderr=err)
+            self.assertIn("2 products would be created, 1 updated, 5 rows failed", out.getvalue())
+            self.assertIn("line 6: Ismeretlen kategória: Nincs", err.getvalue())
+            self.assertFalse(Product.objects.filter(sku='A1').exists())
+
+            call_command('import_products', file.name, '--supplier', "Szállító", stdout=out, stderr=err)
+        self.assertEqual(Product.objects.get(sku='A2').supplier, self.supplier)
+        self.assertEqual(Product.objects.get(sku='EX').supplier, self.supplier)
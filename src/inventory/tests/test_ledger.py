@@ -0,0 +1,147 @@
+from django.test import TestCase, override_settings
+
+from inventory.ledger import (
+    POLICY_ALLOW_NEGATIVE, POLICY_CLAMP, POLICY_REJECT, InsufficientStock, apply_change, apply_delta,
+    book_movements,
+)
+from inventory.models import Product, StockMovement
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Csavar", sku='L-1', stock_quantity=10, min_stock_level=3)
+
+    def reload(self):
+        return Product.objects.get(pk=self.product.pk)
+
+    def test_receipt_adds_to_stock(self):
+        self.assertEqual(apply_delta(self.product.pk, 5), 15)
+        self.assertEqual(self.reload().stock_quantity, 15)
+
+    def test_clamp_stops_at_zero_and_reports_the_change_taken(self):
+        balance, change = apply_change(self.product.pk, -25, policy=POLICY_CLAMP)
+        self.assertEqual((balance, change), (0, -10))
+        product = self.reload()
+        self.assertEqual(product.stock_quantity, 0)
+        self.assertTrue(product.is_low_stock)
+
+    def test_reject_leaves_stock_untouched(self):
+        with self.assertRaises(InsufficientStock):
+            apply_delta(self.product.pk, -11, policy=POLICY_REJECT)
+        self.assertEqual(self.reload().stock_quantity, 10)
+        self.assertEqual(apply_delta(self.product.pk, -10, policy=POLICY_REJECT), 0)
+
+    def test_allow_negative(self):
+        balance, change = apply_change(self.product.pk, -12, policy=POLICY_ALLOW_NEGATIVE)
+        self.assertEqual((balance, change), (-2, -12))
+        self.assertTrue(self.reload().is_low_stock)
+
+    def test_low_stock_flag_follows_the_balance(self):
+        apply_delta(self.product.pk, -7)
+        self.assertTrue(self.reload().is_low_stock)
+        apply_delta(self.product.pk, 1)
+        self.assertFalse(self.reload().is_low_stock)
+
+    def test_unknown_product(self):
+        with self.assertRaises(Product.DoesNotExist):
+            apply_delta(self.product.pk + 1000, 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            apply_delta(self.product.pk, 1, policy='maybe')
+
+    @override_settings(INVENTORY_STOCK_POLICY=POLICY_REJECT)
+    def test_policy_setting(self):
+        with self.assertRaises(InsufficientStock):
+            apply_delta(self.product.pk, -11)
+
+
+class StockMovementSaveTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Csavar", sku='L-1', stock_quantity=10)
+
+    def test_movement_books_its_delta_once(self):
+        movement = StockMovement(product=self.product, movement_type='OUT', quantity=4)
+        movement.save()
+        self.assertEqual(movement.stock_change, -4)
+        # The loaded product is kept in sync
+        self.assertEqual(self.product.stock_quantity, 6)
+
+        movement.reason = "Javítás"
+        movement.save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 6)
+
+    def test_clamped_movement_records_the_change_applied(self):
+        movement = StockMovement(product=self.product, movement_type='OUT', quantity=15)
+        movement.save(policy=POLICY_CLAMP)
+        self.assertEqual(movement.stock_change, -10)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 0)
+
+    def test_rejected_movement_is_not_saved(self):
+        movement = StockMovement(product=self.product, movement_type='OUT', quantity=15)
+        with self.assertRaises(InsufficientStock):
+            movement.save(policy=POLICY_REJECT)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_adjustment_carries_its_sign(self):
+        StockMovement(product=self.product, movement_type='ADJUSTMENT', quantity=-3).save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 7)
+
+
+class BookMovementsTests(TestCase):
+    def setUp(self):
+        self.screw = Product.objects.create(name="Csavar", sku='L-1', ean13='5990000000017', stock_quantity=10)
+        self.nut = Product.objects.create(name="Anya", sku='L-2', stock_quantity=2)
+
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).stock_quantity
+
+    def test_books_every_line_with_one_update_per_product(self):
+        result = book_movements([
+            {'code': 'L-1', 'movement_type': 'OUT', 'quantity': 3},
+            {'code': '5990000000017', 'movement_type': 'IN', 'quantity': '5'},
+            {'product': self.nut.pk, 'movement_type': 'ADJUSTMENT', 'quantity': -1, 'reason': "Leltár"},
+        ])
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(result.balances, {self.screw.pk: 12, self.nut.pk: 1})
+        self.assertEqual(StockMovement.objects.count(), 3)
+        self.assertEqual(self.stock(self.screw), 12)
+
+    def test_invalid_line_books_nothing(self):
+        result = book_movements([
+            {'code': 'L-1', 'movement_type': 'OUT', 'quantity': 3},
+            {'code': 'NINCS', 'movement_type': 'OUT', 'quantity': 1},
+            {'code': 'L-2', 'movement_type': 'OUT', 'quantity': -1},
+        ])
+        self.assertEqual([line for line, _ in result.errors], [2, 3])
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual(self.stock(self.screw), 10)
+
+    def test_quantity_must_be_a_whole_number(self):
+        for quantity in (1.5, '1.5', True, False, None, [], '', 0):
+            with self.subTest(quantity=quantity):
+                result = book_movements([{'code': 'L-1', 'movement_type': 'IN', 'quantity': quantity}])
+                self.assertEqual([line for line, _ in result.errors], [1])
+        self.assertEqual(self.stock(self.screw), 10)
+        result = book_movements([{'code': 'L-1', 'movement_type': 'IN', 'quantity': 2.0}])
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(self.stock(self.screw), 12)
+
+    def test_reject_policy_books_nothing(self):
+        result = book_movements([
+            {'code': 'L-1', 'movement_type': 'OUT', 'quantity': 1},
+            {'code': 'L-2', 'movement_type': 'OUT', 'quantity': 3},
+        ], policy=POLICY_REJECT)
+        self.assertFalse(result.ok)
+        self.assertEqual(result.balances, {})
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual((self.stock(self.screw), self.stock(self.nut)), (10, 2))
+
+    def test_clamp_is_recorded_on_the_last_movement(self):
+        result = book_movements([
+            {'code': 'L-2', 'movement_type': 'OUT', 'quantity': 1},
+            {'code': 'L-2', 'movement_type': 'OUT', 'quantity': 4},
+        ], policy=POLICY_CLAMP)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual([m.stock_change for m in result.movements], [-1, -1])
+        self.assertEqual(self.stock(self.nut), 0)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase
+from django.urls import reverse
+
+from inventory.importer import import_products
+from inventory.ledger import apply_change, book_movements
+from inventory.models import Product
+
+
+class LowStockFlagTests(TestCase):
+    """save(), the ledger UPDATE and the importer agree on is_low_stock"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Csavar", sku='SC-1', stock_quantity=10, min_stock_level=3)
+        self.no_minimum = Product.objects.create(name="Anya", sku='AN-1', stock_quantity=2, min_stock_level=0)
+
+    def flag(self, product):
+        return Product.objects.values_list('is_low_stock', flat=True).get(pk=product.pk)
+
+    def assertFlagsAgree(self):
+        """The stored flag is what refresh_low_stock() computes from the stored stock"""
+        for product in Product.objects.all():
+            stored = product.is_low_stock
+            product.refresh_low_stock()
+            self.assertEqual(stored, product.is_low_stock, product.sku)
+
+    def test_save(self):
+        self.assertFalse(self.flag(self.product))
+        self.product.stock_quantity = 3
+        self.product.save()
+        self.assertTrue(self.flag(self.product))
+        self.product.min_stock_level = 2
+        self.product.save(update_fields=['min_stock_level'])
+        self.assertFalse(self.flag(self.product))
+        # Zero is at the minimum level of 0
+        empty = Product.objects.create(name="Üres", sku='E-1', stock_quantity=0, min_stock_level=0)
+        self.assertTrue(self.flag(empty))
+        self.assertFlagsAgree()
+
+    def test_ledger_update(self):
+        apply_change(self.product.pk, -7)
+        self.assertTrue(self.flag(self.product))
+        apply_change(self.product.pk, 1)
+        self.assertFalse(self.flag(self.product))
+        # Clamped to zero: low even with a minimum level of 0
+        self.assertEqual(apply_change(self.no_minimum.pk, -5), (0, -2))
+        self.assertTrue(self.flag(self.no_minimum))
+        apply_change(self.no_minimum.pk, 1)
+        self.assertFalse(self.flag(self.no_minimum))
+        apply_change(self.no_minimum.pk, -4, policy='allow_negative')
+        self.assertTrue(self.flag(self.no_minimum))
+        self.assertFlagsAgree()
+
+    def test_batch_booking(self):
+        result = book_movements([
+            {'product': self.product.pk, 'movement_type': 'OUT', 'quantity': 8},
+            {'product': self.no_minimum.pk, 'movement_type': 'OUT', 'quantity': 9},
+        ])
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(result.balances, {self.product.pk: 2, self.no_minimum.pk: 0})
+        self.assertTrue(self.flag(self.product))
+        self.assertTrue(self.flag(self.no_minimum))
+        self.assertFlagsAgree()
+
+    def test_import(self):
+        result = import_products([
+            # Existing: only the minimum level changes, the stock stays 10
+            (2, {'sku': 'SC-1', 'name': "Csavar", 'net_price': '1', 'min_stock_level': '10'}),
+            (3, {'sku': 'AN-1', 'name': "Anya", 'net_price': '1', 'min_stock_level': '1'}),
+            (4, {'sku': 'N-1', 'name': "Új", 'net_price': '1', 'stock_quantity': '0', 'min_stock_level': '0'}),
+            (5, {'sku': 'N-2', 'name': "Új 2", 'net_price': '1', 'stock_quantity': '4'}),
+        ])
+        self.assertTrue(result.ok, result.errors)
+        self.assertTrue(self.flag(self.product))
+        self.assertFalse(self.flag(self.no_minimum))
+        self.assertEqual(
+            dict(Product.objects.filter(sku__startswith='N-').values_list('sku', 'is_low_stock')),
+            {'N-1': True, 'N-2': False},
+        )
+        self.assertFlagsAgree()
+
+    def test_warnings_list_reads_the_flag(self):
+        apply_change(self.product.pk, -8)
+        self.client.force_login(get_user_model().objects.create_user('raktar'))
+        with mock.patch('inventory.views.render', return_value=HttpResponse()) as render:
+            self.client.get(reverse('inventory:product_warnings'))
+        self.assertEqual([product.sku for product in render.call_args.args[2]['products']], ['SC-1'])
+
+        # A product is listed by its flag, not by comparing the stock again
+        Product.objects.filter(pk=self.product.pk).update(is_low_stock=False)
+        with mock.patch('inventory.views.render', return_value=HttpResponse()) as render:
+            self.client.get(reverse('inventory:product_warnings'))
+        self.assertEqual(list(render.call_args.args[2]['products']), [])
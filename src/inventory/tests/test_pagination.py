@@ -0,0 +1,80 @@
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+
+from inventory.models import Product
+from inventory.pagination import InvalidCursor, KeysetPaginator, paginate_request
+
+
+def walk_forward(paginator):
+    pages = [paginator.page()]
+    while pages[-1].has_next:
+        pages.append(paginator.page(pages[-1].next_cursor))
+    return pages
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Repeated names and stock levels: the primary key breaks the ties
+        Product.objects.bulk_create([
+            Product(name=f"Termék {n % 4}", sku=f'P-{n:02d}', stock_quantity=n % 3 - 1)
+            for n in range(23)
+        ])
+
+    def expected(self, *ordering):
+        return list(Product.objects.order_by(*ordering).values_list('pk', flat=True))
+
+    def test_forward_walk_visits_every_row_once_in_order(self):
+        for ordering in (['name', 'id'], ['stock_quantity', 'name', 'id'], ['-name', '-id']):
+            pages = walk_forward(KeysetPaginator(Product.objects.all(), ordering, page_size=5))
+            self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+            self.assertEqual([p.pk for page in pages for p in page], self.expected(*ordering))
+
+    def test_backward_walk_returns_the_same_pages(self):
+        paginator = KeysetPaginator(Product.objects.all(), ['stock_quantity', 'name', 'id'], page_size=5)
+        forward = walk_forward(paginator)
+        self.assertFalse(forward[0].has_previous)
+        self.assertFalse(forward[-1].has_next)
+
+        page = forward[-1]
+        backward = [page]
+        while page.has_previous:
+            page = paginator.page(page.previous_cursor)
+            backward.append(page)
+        backward.reverse()
+        self.assertEqual(
+            [[p.pk for p in page] for page in backward],
+            [[p.pk for p in page] for page in forward],
+        )
+        self.assertFalse(backward[0].has_previous)
+        # Forward again from a page reached backwards
+        self.assertEqual([p.pk for p in paginator.page(backward[1].next_cursor)], [p.pk for p in forward[2]])
+
+    def test_filtered_queryset(self):
+        products = Product.objects.filter(stock_quantity__lt=0)
+        pages = walk_forward(KeysetPaginator(products, ['name', 'id'], page_size=3))
+        self.assertEqual(
+            [p.pk for page in pages for p in page],
+            list(products.order_by('name', 'id').values_list('pk', flat=True)),
+        )
+
+    def test_page_size_is_bounded(self):
+        self.assertEqual(KeysetPaginator(Product.objects.all(), ['id'], page_size=0).page_size, 1)
+        self.assertEqual(KeysetPaginator(Product.objects.all(), ['id'], page_size=10 ** 6).page_size, 200)
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Product.objects.all(), ['name', 'id'])
+        for cursor in ('!!!', 'eyJkIjoibmV4dCJ9', paginator.encode_cursor(Product.objects.first(), 'up')):
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+        request = RequestFactory().get('/', {'cursor': 'garbage', 'page_size': 'x'})
+        with self.assertRaises(Http404):
+            paginate_request(request, Product.objects.all(), ['name', 'id'])
+
+    def test_request_keeps_the_other_parameters(self):
+        request = RequestFactory().get('/', {'q': 'Termék', 'page_size': '10'})
+        page = paginate_request(request, Product.objects.all(), ['name', 'id'])
+        self.assertEqual(len(page), 10)
+        self.assertIn('q=Term', page.next_querystring)
+        self.assertIn('cursor=', page.next_querystring)
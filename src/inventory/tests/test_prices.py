@@ -0,0 +1,93 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory import prices, snapshots, valuation
+from inventory.importer import import_products
+from inventory.models import PriceChange, Product
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('raktar')
+
+    def test_saves_record_price_changes_only(self):
+        product = Product.objects.create(name="Füzet", sku='F1', net_price=10)
+        self.assertEqual(
+            list(product.price_changes.values_list('net_price', 'vat_rate', 'source')),
+            [(Decimal('10.00'), Decimal('27.00'), PriceChange.SOURCE_FORM)],
+        )
+        product.name = "Füzet A5"
+        product.save(changed_by=self.user)
+        self.assertEqual(product.price_changes.count(), 1)
+        product.vat_rate = Decimal('5.00')
+        product.save(changed_by=self.user)
+        latest = product.price_changes.first()
+        self.assertEqual((latest.vat_rate, latest.changed_by), (Decimal('5.00'), self.user))
+
+    def test_import_records_changed_prices(self):
+        product = Product.objects.create(name="Füzet", sku='F1', net_price=10)
+        result = import_products([
+            (2, {'sku': 'F1', 'name': "Füzet", 'net_price': '15'}),
+            (3, {'sku': 'F2', 'name': "Toll", 'net_price': '1', 'vat_rate': '5'}),
+        ], user=self.user)
+        self.assertTrue(result.ok, result.errors)
+        latest = product.price_changes.first()
+        self.assertEqual(
+            (latest.net_price, latest.source, latest.changed_by), (Decimal('15.00'), PriceChange.SOURCE_IMPORT, self.user),
+        )
+        self.assertEqual(PriceChange.objects.filter(product__sku='F2').count(), 1)
+        # The same price again, written differently, is not a change
+        import_products([(2, {'sku': 'F1', 'name': "Füzet", 'net_price': '15,00'})])
+        self.assertEqual(product.price_changes.count(), 2)
+
+
+class PricesAtTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.ten_days_ago = self.now - datetime.timedelta(days=10)
+        self.five_days_ago = self.now - datetime.timedelta(days=5)
+        self.pen = Product.objects.create(name="Toll", sku='T1', net_price=10, stock_quantity=5)
+        self.pad = Product.objects.create(
+            name="Jegyzettömb", sku='J1', net_price=3, vat_rate=Decimal('5.00'), stock_quantity=1,
+        )
+        self.pen.net_price = Decimal('20.00')
+        self.pen.save()
+        # Both created ten days ago; the pen's price went up two days ago
+        Product.objects.update(created_at=self.ten_days_ago)
+        PriceChange.objects.update(valid_from=self.ten_days_ago)
+        self.pen.price_changes.filter(net_price=20).update(valid_from=self.now - datetime.timedelta(days=2))
+
+    def test_prices_at(self):
+        self.assertEqual(prices.prices_at(self.five_days_ago), {
+            self.pen.pk: (Decimal('10.00'), Decimal('27.00')),
+            self.pad.pk: (Decimal('3.00'), Decimal('5.00')),
+        })
+        self.assertEqual(prices.prices_at(self.now, [self.pen]), {self.pen.pk: (Decimal('20.00'), Decimal('27.00'))})
+        self.assertEqual(prices.prices_at(self.now, [self.pad.pk]), {self.pad.pk: (Decimal('3.00'), Decimal('5.00'))})
+        # Before the first price there is none
+        self.assertEqual(prices.prices_at(self.ten_days_ago - datetime.timedelta(seconds=1)), {})
+        with self.assertNumQueries(1):
+            prices.prices_at(self.five_days_ago, Product.objects.all())
+
+    def test_with_price_at(self):
+        pen = Product.objects.with_price_at(self.five_days_ago).get(pk=self.pen.pk)
+        self.assertEqual((pen.net_price_at, pen.vat_rate_at, pen.net_price), (Decimal('10.00'), Decimal('27.00'), Decimal('20.00')))
+
+    def test_same_moment_takes_the_later_row(self):
+        PriceChange.objects.create(
+            product=self.pad, net_price=4, vat_rate=5, valid_from=self.ten_days_ago, source=PriceChange.SOURCE_IMPORT,
+        )
+        self.assertEqual(prices.prices_at(self.five_days_ago, [self.pad])[self.pad.pk], (Decimal('4.00'), Decimal('5.00')))
+
+    def test_frozen_valuation_uses_the_prices_of_the_moment(self):
+        snapshots.take_snapshot(self.five_days_ago)
+        valuation.freeze_snapshot(self.five_days_ago)
+        # 5 × 10.00 + 1 × 3.00, not the pen's current 20.00
+        self.assertEqual(valuation.build_report(self.five_days_ago).total.net, Decimal('53.00'))
@@ -0,0 +1,112 @@
+import datetime
+import math
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory import reorder
+from inventory.models import Product, ProductVelocity, StockMovement, Supplier
+from inventory.synthetic import Shape, generate
+
+
+VELOCITY_FIELDS = ['product', 'out_7d', 'out_30d', 'out_90d', 'daily_velocity']
+
+
+def velocities():
+    return list(ProductVelocity.objects.order_by('product').values_list(*VELOCITY_FIELDS))
+
+
+class ReorderTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.supplier = Supplier.objects.create(name="Szállító", lead_time_days=10)
+        self.screw = self.product('A', min_stock_level=5, supplier=self.supplier)
+        self.nut = self.product('B', net_price=2)
+
+    def product(self, sku, age_days=200, **fields):
+        fields = {'name': sku, 'net_price': 10, 'stock_quantity': 0, **fields}
+        product = Product.objects.create(sku=sku, **fields)
+        Product.objects.filter(pk=product.pk).update(created_at=self.now - datetime.timedelta(days=age_days))
+        return product
+
+    def move(self, product, movement_type, quantity, days_ago):
+        movement = StockMovement(product=product, movement_type=movement_type, quantity=quantity)
+        movement.save(policy='allow_negative')
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=self.now - datetime.timedelta(days=days_ago))
+
+    def test_velocity_and_suggestion(self):
+        self.move(self.screw, 'IN', 1000, 150)
+        self.move(self.screw, 'OUT', 70, 3)
+        self.move(self.screw, 'OUT', 300, 20)
+        self.move(self.screw, 'OUT', 900, 60)  # leaves the stock at -270
+        self.move(self.nut, 'IN', 100, 150)
+        self.assertEqual(reorder.refresh(now=self.now), 1)
+
+        velocity = ProductVelocity.objects.get(product=self.screw)
+        self.assertEqual((velocity.out_7d, velocity.out_30d, velocity.out_90d), (70, 370, 1270))
+        self.assertAlmostEqual(velocity.daily_velocity, 0.5 * 70 / 7 + 0.3 * 370 / 30 + 0.2 * 1270 / 90, places=3)
+
+        suggestion, = reorder.suggestions()
+        self.assertEqual(suggestion.pk, self.screw.pk)
+        self.assertEqual(suggestion.days_until_stockout, 0)
+        # Lead time 10 + 14 cover days, the minimum level and the shortfall
+        self.assertEqual(suggestion.suggested_quantity, math.ceil(velocity.daily_velocity * 24 + 5 + 270))
+
+    def test_young_product_and_low_stock_without_velocity(self):
+        young = self.product('C', age_days=2, min_stock_level=3, net_price=1)
+        self.move(young, 'IN', 20, 1)
+        self.move(young, 'OUT', 10, 1)
+        reorder.refresh(now=self.now)
+        # Two days old: every window is divided by 2
+        self.assertAlmostEqual(ProductVelocity.objects.get(product=young).daily_velocity, 5.0, places=3)
+
+        suggestions = {product.pk: product for product in reorder.suggestions()}
+        # At its minimum level without consumption: up to the minimum
+        self.assertEqual(suggestions[self.screw.pk].suggested_quantity, 5)
+        # Stock 10, 5 a day, default lead time 7: 5 × 21 + 3 - 10
+        self.assertEqual(suggestions[young.pk].suggested_quantity, 98)
+        self.assertAlmostEqual(suggestions[young.pk].days_until_stockout, 2.0)
+
+        totals = {total['supplier']: total for total in reorder.supplier_totals()}
+        self.assertEqual(totals[self.supplier.pk]['lines'], 1)
+        self.assertEqual(float(totals[None]['value']), 98.0)
+
+    def assertIncrementalEqualsFull(self, now):
+        reorder.refresh(now=now)
+        incremental = velocities()
+        reorder.refresh(full=True, now=now)
+        self.assertEqual(incremental, velocities())
+
+    def test_incremental_refresh_equals_a_full_one(self):
+        generate(Shape(products=30, movements=400, images=0, history_days=120))
+        reorder.refresh(full=True, now=self.now)
+        # A withdrawal booked after the last run
+        self.move(self.nut, 'OUT', 14, -0.02)
+        self.assertIncrementalEqualsFull(self.now + datetime.timedelta(hours=1))
+        self.assertTrue(ProductVelocity.objects.filter(product=self.nut).exists())
+        # Withdrawals leaving the 7 and 30 day windows as time passes
+        self.assertIncrementalEqualsFull(self.now + datetime.timedelta(days=9))
+        self.assertIncrementalEqualsFull(self.now + datetime.timedelta(days=40))
+
+    def test_rows_go_once_everything_leaves_the_windows(self):
+        self.move(self.screw, 'IN', 100, 50)
+        self.move(self.screw, 'OUT', 90, 3)
+        reorder.refresh(now=self.now)
+        later = self.now + datetime.timedelta(days=5)
+        reorder.refresh(now=later)
+        velocity = ProductVelocity.objects.get(product=self.screw)
+        self.assertEqual((velocity.out_7d, velocity.computed_at), (0, later))
+        reorder.refresh(now=self.now + datetime.timedelta(days=400))
+        self.assertFalse(ProductVelocity.objects.exists())
+
+    def test_command(self):
+        self.move(self.screw, 'IN', 100, 50)
+        self.move(self.screw, 'OUT', 90, 2)
+        out = StringIO()
+        call_command('refresh_reorder', stdout=out)
+        self.assertIn("all products", out.getvalue())
+        call_command('refresh_reorder', stdout=out)
+        self.assertIn("changes since", out.getvalue())
+        self.assertTrue(ProductVelocity.objects.filter(product=self.screw).exists())
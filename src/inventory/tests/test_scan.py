@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from inventory import scan
+from inventory.ledger import apply_delta
+from inventory.models import Product
+
+
+class ScanLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        scan.local_codes.clear()
+        self.product = Product.objects.create(
+            name="Csavar", sku='SC-1', ean13='5990000000017', stock_quantity=10, net_price=100,
+        )
+
+    def test_lookup_by_sku_and_ean13(self):
+        self.assertEqual(scan.lookup(' SC-1 ')['id'], self.product.pk)
+        payload = scan.lookup('5990000000017')
+        self.assertEqual((payload['sku'], payload['stock'], payload['brutto_price']), ('SC-1', 10, '127.00'))
+        self.assertIsNone(scan.lookup('NINCS'))
+
+    def test_cached_lookup_needs_no_query(self):
+        scan.lookup('SC-1')
+        with self.assertNumQueries(0):
+            self.assertEqual(scan.lookup('SC-1')['stock'], 10)
+
+    def test_stock_booking_drops_the_payload(self):
+        scan.lookup('SC-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_delta(self.product.pk, -3)
+        self.assertEqual(scan.lookup('SC-1')['stock'], 7)
+
+    def test_code_moved_to_another_product(self):
+        scan.lookup('SC-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.sku = 'SC-2'
+            self.product.save()
+            other = Product.objects.create(name="Anya", sku='SC-1')
+        self.assertEqual(scan.lookup('SC-1')['id'], other.pk)
+        self.assertEqual(scan.lookup('SC-2')['id'], self.product.pk)
+
+    def test_lookup_many(self):
+        results = scan.lookup_many(['SC-1', '', 'NINCS', '5990000000017'])
+        self.assertEqual(list(results), ['SC-1', 'NINCS', '5990000000017'])
+        self.assertIsNone(results['NINCS'])
+        self.assertEqual(results['SC-1'], results['5990000000017'])
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = scan.LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+    def test_entries_expire(self):
+        lru = scan.LRUCache(maxsize=2, ttl=-1)
+        lru.set('a', 1)
+        self.assertIsNone(lru.get('a'))
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from inventory.models import Product
+from inventory.search import (
+    ContainsSearchBackend, PostgresSearchBackend, SqliteFTSSearchBackend, get_search_backend, normalize_query,
+    search_products,
+)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name="Piros alma", sku='GY-001', description="Édes, ropogós"),
+            Product(name="Zöld alma", sku='GY-002'),
+            Product(name="Alma lé", sku='IT-001', ean13='5990000000017', description="Piros almából"),
+            Product(name="Körte", sku='GY-003'),
+        ])
+
+    def names(self, products):
+        return sorted(products.values_list('name', flat=True))
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.names(search_products(Product.objects.all(), "alma piros")), ["Alma lé", "Piros alma"])
+        self.assertEqual(self.names(search_products(Product.objects.all(), "körte")), ["Körte"])
+        self.assertEqual(search_products(Product.objects.all(), "szilva").count(), 0)
+
+    def test_codes(self):
+        self.assertEqual(self.names(search_products(Product.objects.all(), "GY-002")), ["Zöld alma"])
+        self.assertEqual(self.names(search_products(Product.objects.all(), "5990000000017")), ["Alma lé"])
+
+    def test_ranked_results_match_the_unranked_ones(self):
+        products = Product.objects.filter(sku__startswith='GY')
+        ranked = search_products(products, "alma", ranked=True)
+        self.assertEqual(self.names(ranked), self.names(search_products(products, "alma")))
+        self.assertEqual(ranked.count(), 2)
+        self.assertTrue(all(rank is not None for rank in ranked.values_list('search_rank', flat=True)))
+
+    def test_empty_query_does_not_filter(self):
+        self.assertEqual(search_products(Product.objects.all(), " ,. ", ranked=True).count(), 4)
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("Piros  ALMA alma"), normalize_query("alma piros"))
+
+    def test_fallback_backend(self):
+        backend = ContainsSearchBackend()
+        self.assertEqual(self.names(backend.search(Product.objects.all(), "ropogós alma")), ["Piros alma"])
+
+    def test_sqlite_ranking_matches_once(self):
+        if not isinstance(get_search_backend(), SqliteFTSSearchBackend):
+            self.skipTest("SQLite FTS5 backend not in use")
+        ranked = search_products(Product.objects.all(), "piros alma", ranked=True)
+        sql = str(ranked.query)
+        # Joined, not a MATCH repeated per row in a correlated subquery
+        self.assertEqual(sql.count('MATCH'), 1)
+        self.assertEqual(self.names(ranked), ["Alma lé", "Piros alma"])
+
+
+class LiveSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('raktar', password='jelszo-12345')
+        Product.objects.bulk_create([
+            Product(name="Abc 001 adapter abc", sku='X-100'),
+            Product(name="Abc 001 kábel", sku='X-101'),
+            Product(name="Csavar", sku='ABC-001'),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def search(self, q):
+        response = self.client.get(reverse('inventory:product_search_json'), {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [result['sku'] for result in response.json()['results']]
+
+    def test_exact_code_comes_first(self):
+        if not isinstance(get_search_backend(), PostgresSearchBackend):
+            self.skipTest("Exact code matches are ranked by the PostgreSQL backend")
+        self.assertEqual(self.search("ABC-001")[0], 'ABC-001')
+        # Same normalized query, but not the code as typed: cached separately
+        self.assertNotEqual(self.search("abc-001")[0], 'ABC-001')
+
+    def test_results_and_etag(self):
+        response = self.client.get(reverse('inventory:product_search_json'), {'q': "kábel abc"})
+        self.assertEqual([result['sku'] for result in response.json()['results']], ['X-101'])
+        response = self.client.get(
+            reverse('inventory:product_search_json'), {'q': "abc kábel"}, HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,155 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory import scan
+from inventory.forms import StockMovementFilterForm, StockMovementForm
+from inventory.models import Product, StockMovement
+from inventory.pagination import KeysetPaginator, paginate_request
+
+
+class StockMovementFormTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        scan.local_codes.clear()
+        self.product = Product.objects.create(name="Csavar", sku='SC-1', ean13='5990000000017', stock_quantity=10)
+        self.user = get_user_model().objects.create_user('raktar')
+
+    def form(self, **data):
+        return StockMovementForm(data={'movement_type': 'OUT', 'quantity': 4, 'reason': '', **data})
+
+    def test_product_is_given_by_code(self):
+        for code in ('SC-1', ' 5990000000017 '):
+            form = self.form(code=code)
+            self.assertTrue(form.is_valid(), form.errors)
+            movement = form.save()
+            self.assertEqual(movement.product, self.product)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+
+    def test_unknown_code(self):
+        form = self.form(code='NINCS')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['code'], ['Ismeretlen cikkszám vagy EAN-13 kód.'])
+        self.assertFalse(self.form(code='').is_valid())
+
+    def test_no_catalog_wide_choices(self):
+        form = StockMovementForm()
+        self.assertNotIn('product', form.fields)
+        with self.assertNumQueries(0):
+            str(form['code'])
+
+    def test_booked_for_a_given_product(self):
+        form = StockMovementForm(data={'movement_type': 'IN', 'quantity': 5, 'reason': ''}, product=self.product)
+        self.assertNotIn('code', form.fields)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().product, self.product)
+
+    def test_create_view_books_the_movement(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('inventory:stock_movement_create'),
+            {'code': '5990000000017', 'movement_type': 'IN', 'quantity': 3, 'reason': "Beérkezés"},
+        )
+        self.assertRedirects(response, reverse('inventory:stock_movement_list'), fetch_redirect_response=False)
+        movement = StockMovement.objects.get()
+        self.assertEqual((movement.product, movement.quantity, movement.created_by), (self.product, 3, self.user))
+
+
+class StockMovementListTests(TestCase):
+    """The list view's filters and its keyset pagination over ['-created_at', '-id']"""
+
+    ORDERING = ['-created_at', '-id']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = get_user_model().objects.create_user('alice')
+        cls.bob = get_user_model().objects.create_user('bob')
+        cls.screw = Product.objects.create(name="Csavar", sku='SC-1', ean13='5990000000017', stock_quantity=1000)
+        cls.nut = Product.objects.create(name="Anya", sku='AN-1', stock_quantity=1000)
+        # Local midnight of ten days ago, then movements every 9 hours; some
+        # share a timestamp so the id has to break the tie
+        start = timezone.make_aware(datetime.datetime.combine(
+            timezone.localdate() - datetime.timedelta(days=10), datetime.time.min,
+        ))
+        for n in range(24):
+            movement = StockMovement.objects.create(
+                product=cls.screw if n % 3 else cls.nut, movement_type='OUT' if n % 2 else 'IN',
+                quantity=1, created_by=cls.alice if n % 4 else cls.bob,
+            )
+            created_at = start + datetime.timedelta(hours=9 * (n // 2))
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=created_at)
+        cls.start = start
+
+    def setUp(self):
+        cache.clear()
+        scan.local_codes.clear()
+
+    def filtered(self, **data):
+        form = StockMovementFilterForm(data=data)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.filter(StockMovement.objects.all())
+
+    def walk(self, movements, page_size=5):
+        paginator = KeysetPaginator(movements, self.ORDERING, page_size)
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return [movement.pk for page in pages for movement in page]
+
+    def expected(self, movements):
+        return list(movements.order_by(*self.ORDERING).values_list('pk', flat=True))
+
+    def test_walk_visits_every_movement_once(self):
+        self.assertEqual(self.walk(StockMovement.objects.all()), self.expected(StockMovement.objects.all()))
+        self.assertEqual(self.walk(StockMovement.objects.all(), page_size=7), self.expected(StockMovement.objects.all()))
+
+    def test_filter_by_code(self):
+        for code in ('SC-1', '5990000000017'):
+            movements = self.filtered(code=code)
+            self.assertEqual(movements.count(), 16)
+            self.assertEqual(self.walk(movements), self.expected(StockMovement.objects.filter(product=self.screw)))
+        self.assertEqual(self.filtered(product=self.nut.pk).count(), 8)
+
+    def test_filter_by_type_and_user(self):
+        movements = self.filtered(movement_type='OUT', created_by=self.alice.pk, code='AN-1')
+        expected = StockMovement.objects.filter(movement_type='OUT', created_by=self.alice, product=self.nut)
+        self.assertEqual(self.walk(movements, page_size=2), self.expected(expected))
+        self.assertTrue(expected.exists())
+
+    def test_filter_by_local_days(self):
+        day = timezone.localdate() - datetime.timedelta(days=8)
+        movements = self.filtered(date_from=day, date_to=day)
+        expected = [
+            movement.pk for movement in StockMovement.objects.order_by(*self.ORDERING)
+            if timezone.localdate(movement.created_at) == day
+        ]
+        self.assertEqual(len(expected), 4)
+        self.assertEqual(self.walk(movements, page_size=4), expected)
+        self.assertEqual(self.filtered(date_to=day).count(), len(expected) + 12)
+
+    def test_invalid_filters(self):
+        form = StockMovementFilterForm(data={'date_from': '2024-02-02', 'date_to': '2024-02-01'})
+        self.assertFalse(form.is_valid())
+        form = StockMovementFilterForm(data={'code': 'NINCS'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('code', form.errors)
+
+    def test_next_page_keeps_the_filters(self):
+        def page_of(request):
+            form = StockMovementFilterForm(request.GET)
+            self.assertTrue(form.is_valid())
+            return paginate_request(request, form.filter(StockMovement.objects.all()), self.ORDERING)
+
+        first = page_of(RequestFactory().get('/', {'code': 'SC-1', 'page_size': 5}))
+        request = RequestFactory().get('/?' + first.next_querystring)
+        self.assertEqual((request.GET['code'], request.GET['page_size']), ('SC-1', '5'))
+        second = page_of(request)
+        self.assertEqual(
+            [movement.pk for movement in first] + [movement.pk for movement in second],
+            self.expected(StockMovement.objects.filter(product=self.screw))[:10],
+        )
@@ -0,0 +1,143 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from inventory.models import Product, ProductImage
+from inventory.storage import ContentAddressedStorage, release_blob
+from inventory.thumbnails import thumbnail_name
+
+
+def image_file(name, color='blue'):
+    data = io.BytesIO()
+    Image.new('RGB', (300, 200), color).save(data, 'JPEG')
+    return SimpleUploadedFile(name, data.getvalue())
+
+
+@override_settings(INVENTORY_THUMBNAIL_WORKERS=0)
+class ImageBlobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = ProductImage._meta.get_field('image').storage
+        self.product = Product.objects.create(name="Füzet", sku='F1')
+
+    def path(self, name):
+        return os.path.join(self.media_root, name)
+
+    def files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def age(self, name, seconds):
+        past = time.time() - seconds
+        os.utime(self.path(name), (past, past))
+
+    def add_image(self, name='a.jpg', color='blue'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(product=self.product, image=image_file(name, color))
+
+    def delete_image(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+
+    def test_same_content_is_stored_once(self):
+        first = self.add_image('a.jpg')
+        second = self.add_image('b.JPG')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^products/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len([name for name in self.files() if '/thumbs/' not in name]), 1)
+
+    def missed_once(self):
+        """touch() not finding the blob the first time, as before a concurrent upload wrote it"""
+        touch, missed = ContentAddressedStorage.touch, [False]
+
+        def side_effect(storage, name):
+            return missed.pop() if missed else touch(storage, name)
+        return mock.patch.object(ContentAddressedStorage, 'touch', autospec=True, side_effect=side_effect)
+
+    def test_concurrent_uploads_of_new_content_share_the_blob(self):
+        name = self.storage.save('products/a.jpg', image_file('a.jpg'))
+        self.age(name, 7200)
+        with self.missed_once():
+            self.assertEqual(self.storage.save('products/b.jpg', image_file('b.jpg')), name)
+        self.assertLess(time.time() - os.path.getmtime(self.path(name)), 60)
+
+        # The other upload wrote it between the name check and the write
+        self.age(name, 7200)
+        with self.missed_once(), mock.patch.object(ContentAddressedStorage, 'exists', side_effect=[False, True]):
+            self.assertEqual(self.storage.save('products/c.jpg', image_file('c.jpg')), name)
+        self.assertLess(time.time() - os.path.getmtime(self.path(name)), 60)
+        self.assertEqual(self.files(), [name])
+
+    @override_settings(INVENTORY_IMAGE_BLOB_GRACE=0)
+    def test_last_row_releases_the_blob_and_thumbnails(self):
+        first, second = self.add_image('a.jpg'), self.add_image('b.jpg')
+        name = first.image.name
+        self.assertTrue(os.path.exists(self.path(thumbnail_name(name, 120))))
+        self.delete_image(first)
+        self.assertTrue(os.path.exists(self.path(name)))
+        self.delete_image(second)
+        self.assertEqual(self.files(), [])
+
+    def test_blob_reused_by_a_pending_upload_is_kept(self):
+        image = self.add_image()
+        name = image.image.name
+        self.age(name, 7200)
+        # Another upload of the same content stored its file but has not
+        # committed its row when the last old row goes away
+        self.assertEqual(self.storage.save('products/c.jpg', image_file('c.jpg')), name)
+        self.delete_image(image)
+        self.assertTrue(os.path.exists(self.path(name)))
+        self.assertTrue(os.path.exists(self.path(thumbnail_name(name, 120))))
+
+    def test_delete_unused(self):
+        name = self.add_image().image.name
+        storage = ContentAddressedStorage()
+        self.assertFalse(storage.delete_unused(name, grace=60))
+        self.assertTrue(os.path.exists(self.path(name)))
+        self.age(name, 120)
+        self.assertTrue(storage.delete_unused(name, grace=60))
+        self.assertFalse(storage.delete_unused(name, grace=60))
+        self.assertFalse(any(name.endswith('.released') for name in self.files()))
+        # An upload that finds the blob gone stores it again
+        self.assertFalse(storage.touch(name))
+        self.assertEqual(storage.save('products/d.jpg', image_file('d.jpg')), name)
+        self.assertTrue(os.path.exists(self.path(name)))
+
+    def test_release_keeps_referenced_blobs(self):
+        image = self.add_image()
+        self.assertFalse(release_blob(image.image.name, self.storage, grace=0))
+        self.assertFalse(release_blob('', self.storage, grace=0))
+
+    def test_sweep_command(self):
+        kept = self.add_image('a.jpg', 'blue')
+        released = self.add_image('b.jpg', 'red')
+        name = released.image.name
+        self.delete_image(released)
+        self.assertTrue(os.path.exists(self.path(name)))
+
+        out = io.StringIO()
+        call_command('sweep_image_blobs', '--dry-run', stdout=out)
+        self.assertIn(name, out.getvalue())
+        self.assertIn("1 of 2 files are unreferenced", out.getvalue())
+        call_command('sweep_image_blobs', stdout=out)
+        self.assertIn("0 unreferenced files deleted, 1 kept as recently used", out.getvalue())
+
+        self.age(name, 7200)
+        call_command('sweep_image_blobs', stdout=out)
+        self.assertFalse(os.path.exists(self.path(name)))
+        self.assertFalse(os.path.exists(self.path(thumbnail_name(name, 120))))
+        self.assertTrue(os.path.exists(self.path(kept.image.name)))
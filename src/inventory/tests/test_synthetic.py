@@ -0,0 +1,31 @@
+import datetime
+from unittest import mock
+
+from django.db.models import Max, Min
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory.models import Product, StockMovement
+from inventory.synthetic import Shape, generate
+
+
+class SyntheticDatesTests(TestCase):
+    def test_past_dates_without_touching_auto_now_add(self):
+        fields = [Product._meta.get_field('created_at'), StockMovement._meta.get_field('created_at')]
+        seen = []
+        bulk_create = StockMovement.objects.bulk_create
+
+        def check(*args, **kwargs):
+            # Another thread saving a movement meanwhile still gets its timestamp
+            seen.append([field.auto_now_add for field in fields])
+            return bulk_create(*args, **kwargs)
+
+        start = timezone.now()
+        with mock.patch.object(StockMovement.objects, 'bulk_create', side_effect=check):
+            generate(Shape(products=10, movements=40, images=0, history_days=30))
+        self.assertEqual(seen, [[True, True]])
+
+        dates = StockMovement.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        self.assertLess(dates['first'], start - datetime.timedelta(days=7))
+        self.assertLess(dates['last'], start)
+        self.assertLess(Product.objects.aggregate(last=Max('created_at'))['last'], start)
@@ -0,0 +1,170 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory import valuation
+from inventory.importer import import_products
+from inventory.ledger import book_movements
+from inventory.models import Category, Product, StockMovement, Supplier, ValuationChange, ValuationSnapshot
+from inventory.synthetic import Shape, generate
+
+
+def normalized(values):
+    """Valuation groups with non-zero values, VAT rates and values as two-place Decimals"""
+    cent = valuation.CENT
+    values = {
+        (category, supplier, Decimal(vat_rate).quantize(cent)): Decimal(value).quantize(cent)
+        for (category, supplier, vat_rate), value in values.items()
+    }
+    return {key: value for key, value in values.items() if value}
+
+
+class ValuationChangeTests(TestCase):
+    """The recorded changes always add up to the valuation summed over the products"""
+
+    maxDiff = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('raktar')
+        generate(
+            Shape(products=40, movements=300, images=0, history_days=60, category_depth=2, category_fanout=3, suppliers=4),
+            user=cls.user,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertValuationUpToDate(self):
+        self.assertEqual(
+            normalized(valuation.current_values()), normalized(valuation.group_values(Product.objects.all())),
+        )
+
+    def test_stock_movements(self):
+        self.assertValuationUpToDate()
+        first, second = Product.objects.order_by('pk')[:2]
+        StockMovement.objects.create(product=first, movement_type='IN', quantity=7, created_by=self.user)
+        # Clamped: only the stock there was leaves the valuation
+        StockMovement.objects.create(product=first, movement_type='OUT', quantity=10 ** 6, created_by=self.user)
+        self.assertValuationUpToDate()
+        result = book_movements([
+            {'product': first.pk, 'movement_type': 'IN', 'quantity': 5},
+            {'product': second.pk, 'movement_type': 'OUT', 'quantity': 10 ** 6},
+        ], user=self.user)
+        self.assertTrue(result.ok)
+        self.assertValuationUpToDate()
+
+    def test_product_edits(self):
+        product = Product.objects.order_by('pk')[0]
+        product.net_price, product.vat_rate = Decimal('123.45'), Decimal('5.00')
+        product.category = Category.objects.order_by('pk').last()
+        product.stock_quantity = 11
+        product.save()
+        self.assertValuationUpToDate()
+
+        # Fields the value does not depend on record nothing
+        recorded = ValuationChange.objects.count()
+        product.name = "Átnevezett"
+        product.save()
+        self.assertEqual(ValuationChange.objects.count(), recorded)
+
+    def test_created_and_deleted(self):
+        Product.objects.create(name="Új", sku='NEW-1', net_price=10, stock_quantity=3)
+        self.assertValuationUpToDate()
+        Product.objects.order_by('pk')[1].delete()
+        self.assertValuationUpToDate()
+        # Deleting a category or supplier moves its products to "none"
+        Category.objects.filter(parent__isnull=True).order_by('pk').first().delete()
+        Supplier.objects.order_by('pk').first().delete()
+        self.assertValuationUpToDate()
+
+    def test_import(self):
+        existing = Product.objects.order_by('pk')[3]
+        result = import_products([
+            (2, {'sku': existing.sku, 'name': "Import", 'net_price': '999.99', 'vat_rate': '27', 'stock_quantity': '5'}),
+            (3, {'sku': 'IMP-2', 'name': "Import 2", 'net_price': '2', 'vat_rate': '27', 'stock_quantity': '4'}),
+        ])
+        self.assertTrue(result.ok, result.errors)
+        self.assertValuationUpToDate()
+
+    def test_compact_and_rebuild(self):
+        StockMovement.objects.create(
+            product=Product.objects.order_by('pk')[0], movement_type='IN', quantity=3, created_by=self.user,
+        )
+        before = normalized(valuation.current_values())
+        rows = valuation.compact()
+        self.assertEqual(ValuationChange.objects.count(), rows)
+        self.assertEqual(rows, len(before))
+        self.assertEqual(normalized(valuation.current_values()), before)
+
+        valuation.rebuild()
+        self.assertEqual(normalized(valuation.current_values()), before)
+        out = StringIO()
+        call_command('compact_valuation', '--rebuild', stdout=out)
+        self.assertIn("total changed by 0.00", out.getvalue())
+
+    def test_daily_snapshot_compacts(self):
+        StockMovement.objects.create(
+            product=Product.objects.order_by('pk')[0], movement_type='IN', quantity=3, created_by=self.user,
+        )
+        before = normalized(valuation.current_values())
+        recorded = ValuationChange.objects.count()
+        self.assertGreater(recorded, len(before))
+        call_command('snapshot_stock', '--no-compact', stdout=StringIO())
+        self.assertEqual(ValuationChange.objects.count(), recorded)
+        call_command('snapshot_stock', stdout=StringIO())
+        self.assertEqual(ValuationChange.objects.count(), len(before))
+        self.assertEqual(normalized(valuation.current_values()), before)
+
+
+class ValuationReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        green = Category.objects.create(name="Zöld")
+        old_green = Category.objects.create(name="Zöld (régi)", parent=green)
+        blue = Category.objects.create(name="Kék")
+        supplier = Supplier.objects.create(name="Szállító")
+        Product.objects.create(name="A", sku='A', net_price=10, stock_quantity=10, category=green)
+        Product.objects.create(name="B", sku='B', net_price=5, stock_quantity=4, category=old_green, supplier=supplier)
+        Product.objects.create(
+            name="C", sku='C', net_price=Decimal('2.50'), vat_rate=Decimal('5.00'), stock_quantity=2, category=blue,
+        )
+        Product.objects.create(name="D", sku='D', net_price=1, stock_quantity=7)
+
+    def test_rollup(self):
+        report = valuation.build_report()
+        self.assertEqual(report.total.net, Decimal('132.00'))
+        # 27% of 127.00 and 5% of 5.00, rounded per group
+        self.assertEqual(report.total.vat, Decimal('34.54'))
+        self.assertEqual(
+            [(line.label, line.depth, line.net) for line in report.by_category],
+            [
+                ("Kék", 0, Decimal('5.00')),
+                ("Zöld", 0, Decimal('120.00')),
+                ("Zöld (régi)", 1, Decimal('20.00')),
+                ("Kategória nélkül", 0, Decimal('7.00')),
+            ],
+        )
+        self.assertEqual(
+            [(line.label, line.net) for line in report.by_vat_rate], [("27%", Decimal('127.00')), ("5%", Decimal('5.00'))],
+        )
+        self.assertEqual(
+            [(line.label, line.net) for line in report.by_supplier],
+            [("Szállító nélkül", Decimal('112.00')), ("Szállító", Decimal('20.00'))],
+        )
+
+    def test_frozen_snapshot(self):
+        at = timezone.now() + datetime.timedelta(seconds=1)
+        call_command('snapshot_stock', '--at', at.isoformat(), stdout=StringIO())
+        self.assertTrue(ValuationSnapshot.objects.exists())
+        taken_at = valuation.snapshot_times()[0]
+        # Later changes leave the frozen report alone
+        Product.objects.filter(sku='A').update(stock_quantity=0)
+        frozen = valuation.build_report(taken_at)
+        self.assertEqual((frozen.taken_at, frozen.total.net), (taken_at, Decimal('132.00')))
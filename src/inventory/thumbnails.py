@@ -0,0 +1,146 @@
+"""
+Thumbnail renditions of product images.
+
+Every ProductImage gets a WebP and a JPEG rendition per size in
+INVENTORY_THUMBNAIL_SIZES, stored next to the original:
+
+    products/photo.jpg -> products/thumbs/photo.jpg.120.webp, products/thumbs/photo.jpg.120.jpg
+
+Renditions are generated on a small thread pool once the upload has been
+committed, so the request that stored the image does not wait for Pillow.
+Until they exist (or if generation failed) thumbnail_url() falls back to
+the original file. `manage.py generate_thumbnails` backfills missing ones.
+"""
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def get_sizes():
+    return sorted(getattr(settings, 'INVENTORY_THUMBNAIL_SIZES', [120, 480]))
+
+
+def pick_size(size):
+    """Smallest configured size that covers `size` pixels (the largest otherwise)"""
+    sizes = get_sizes()
+    return next((s for s in sizes if s >= size), sizes[-1])
+
+
+def thumbnail_name(name, size, fmt='webp'):
+    """Storage name of a rendition of the original file `name`"""
+    # The full file name is kept so photo.jpg and photo.png do not collide
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'thumbs', f'{filename}.{size}.{fmt}')
+
+
+def render(original, size, fmt):
+    """Encode a copy of `original` that fits in a size x size box"""
+    pil_format, options = FORMATS[fmt]
+    image = original.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    output = BytesIO()
+    image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def generate_thumbnails(product_image, force=False):
+    """Write every rendition of one ProductImage and mark it as ready"""
+    from .models import ProductImage
+
+    field = product_image.image
+    storage = field.storage
+    images = ProductImage.objects.filter(pk=product_image.pk, image=field.name)
+    # Rows sharing a content-addressed blob share its renditions too
+    shared = ProductImage.objects.filter(image=field.name, has_thumbnails=True).exclude(pk=product_image.pk)
+    if not force and shared.exists():
+        images.update(has_thumbnails=True)
+        return
+
+    with storage.open(field.name, 'rb') as f:
+        original = Image.open(f)
+        # Honor the camera orientation before the EXIF block is dropped
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    save = getattr(storage, 'save_exact', storage.save)
+    for size in get_sizes():
+        for fmt in FORMATS:
+            name = thumbnail_name(field.name, size, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            save(name, ContentFile(render(original, size, fmt)))
+
+    images.update(has_thumbnails=True)
+
+
+def delete_thumbnails(name, storage):
+    """Remove the renditions of the original file `name`"""
+    for size in get_sizes():
+        for fmt in FORMATS:
+            thumb = thumbnail_name(name, size, fmt)
+            if storage.exists(thumb):
+                storage.delete(thumb)
+
+
+def _generate(pk):
+    from .models import ProductImage
+
+    try:
+        product_image = ProductImage.objects.filter(pk=pk).first()
+        if product_image is not None:
+            generate_thumbnails(product_image)
+    except Exception:
+        logger.exception("Thumbnail generation failed for product image %s", pk)
+
+
+def _generate_in_worker(pk):
+    # Worker threads keep their own connections; honor CONN_MAX_AGE like requests do
+    close_old_connections()
+    try:
+        _generate(pk)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INVENTORY_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def schedule(pk):
+    """
+    Generate the renditions of a ProductImage after the current transaction
+    commits: on the worker pool, or inline when INVENTORY_THUMBNAIL_WORKERS is 0.
+    """
+    def submit():
+        if settings.INVENTORY_THUMBNAIL_WORKERS:
+            _get_executor().submit(_generate_in_worker, pk)
+        else:
+            _generate(pk)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,90 @@
+"""
+Product image uploads.
+
+The files of one request are validated, re-encoded and written to storage
+concurrently on a short-lived thread pool (Pillow and file I/O release the
+GIL), then all ProductImage rows are inserted with a single bulk_create.
+Re-encoding drops EXIF (GPS position, camera serial...) after applying its
+orientation and caps the longer side at INVENTORY_IMAGE_MAX_DIMENSION.
+"""
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from . import thumbnails
+from .forms import validate_image_size
+
+
+MAX_IMAGES = 5
+
+
+class _Stored:
+    def __init__(self, name=None, error=None):
+        self.name = name
+        self.error = error
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def reencode(uploaded):
+    """Decode an upload and return (bytes, extension) of the cleaned image"""
+    image = Image.open(uploaded)
+    image = ImageOps.exif_transpose(image)
+    max_dimension = settings.INVENTORY_IMAGE_MAX_DIMENSION
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    output = BytesIO()
+    # Saving without exif= leaves the metadata behind
+    if _has_alpha(image):
+        image.convert('RGBA').save(output, 'PNG', optimize=True)
+        return output.getvalue(), 'png'
+    image.convert('RGB').save(output, 'JPEG', quality=88, optimize=True, progressive=True)
+    return output.getvalue(), 'jpg'
+
+
+def _store(uploaded, field, storage):
+    try:
+        validate_image_size(uploaded)
+        content, extension = reencode(uploaded)
+    except ValidationError as e:
+        return _Stored(error=f'{uploaded.name}: {e.messages[0]}')
+    except Exception:
+        return _Stored(error=f'{uploaded.name}: a fájl nem érvényes kép.')
+    stem = posixpath.splitext(posixpath.basename(uploaded.name))[0] or 'image'
+    name = field.generate_filename(None, f'{stem}.{extension}')
+    return _Stored(name=storage.save(name, ContentFile(content)))
+
+
+def store_images(product, files):
+    """
+    Store uploaded images for `product` and return the error messages of
+    the files that were skipped. New images are ordered after the existing ones.
+    """
+    from .models import ProductImage
+
+    if not files:
+        return []
+    field = ProductImage._meta.get_field('image')
+    storage = field.storage
+
+    with ThreadPoolExecutor(max_workers=min(len(files), MAX_IMAGES)) as executor:
+        results = list(executor.map(lambda uploaded: _store(uploaded, field, storage), files))
+
+    first_order = product.images.count()
+    images = [
+        ProductImage(product=product, image=result.name, order=first_order + i)
+        for i, result in enumerate(r for r in results if r.name)
+    ]
+    # bulk_create skips save() and post_save, so thumbnails are queued here
+    # (backends that do not return primary keys rely on generate_thumbnails)
+    for image in ProductImage.objects.bulk_create(images):
+        if image.pk is not None:
+            thumbnails.schedule(image.pk)
+    return [result.error for result in results if result.error]
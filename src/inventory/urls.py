@@ -8,10 +8,18 @@ urlpatterns = [
     path('', views.product_list, name='product_list'),
     path('products/', views.product_list, name='product_list'),
     path('products/create/', views.product_create, name='product_create'),
+    path('products/search.json', views.product_search_json, name='product_search_json'),
+    path('products/export.<str:fmt>', views.product_export, name='product_export'),
     path('products/<int:pk>/', views.product_detail, name='product_detail'),
     path('products/<int:pk>/edit/', views.product_update, name='product_update'),
     path('products/<int:pk>/delete/', views.product_delete, name='product_delete'),
     path('warnings/', views.product_warnings, name='product_warnings'),
+    path('valuation/', views.valuation_report, name='valuation_report'),
+    path('reorder/', views.reorder_suggestions, name='reorder_suggestions'),
+
+    # Barcode scanning
+    path('scan/batch.json', views.scan_batch, name='scan_batch'),
+    path('scan/<str:code>/', views.scan_lookup, name='scan_lookup'),
 
     # Category management
     path('categories/', views.category_list, name='category_list'),
@@ -28,5 +36,7 @@ urlpatterns = [
     # Stock movements
     path('stock/', views.stock_movement_list, name='stock_movement_list'),
     path('stock/create/', views.stock_movement_create, name='stock_movement_create'),
+    path('stock/batch/', views.stock_movement_batch, name='stock_movement_batch'),
+    path('stock/batch.json', views.stock_movement_batch_api, name='stock_movement_batch_api'),
     path('products/<int:pk>/add-to-order/', views.add_to_order, name='add_to_order'),
 ]
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+Inventory valuation: stock × net price by category subtree, supplier and
+VAT rate.
+
+Values are kept up to date incrementally instead of being summed over every
+product for each report. Whatever changes a product's stock value - a stock
+movement booked by the ledger, a product edit (price, VAT rate, category,
+supplier or stock), an import, a new or deleted product - adds signed
+ValuationChange rows for the (category, supplier, VAT rate) groups it
+affects, in the same transaction. The current valuation is their sum per
+group; `manage.py compact_valuation` folds them into one row per group, and
+`--rebuild` recomputes them from the products with a single GROUP BY.
+
+snapshot_stock freezes the valuation of each stock snapshot (snapshot
+quantities × the net prices of the price history valid at that moment) in
+ValuationSnapshot, so month-end reports are read back rather than
+recomputed. Totals are rolled up to category subtrees
+in Python over the cached category tree.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .categories import get_category_tree
+from .prices import latest_prices
+from .models import Product, StockSnapshot, Supplier, ValuationChange, ValuationSnapshot
+
+
+CENT = Decimal('0.01')
+# Product fields the stock value of a product depends on
+VALUE_FIELDS = frozenset({
+    'stock_quantity', 'net_price', 'vat_rate', 'category', 'category_id', 'supplier', 'supplier_id',
+})
+NET_VALUE = ExpressionWrapper(
+    F('stock_quantity') * F('net_price'), output_field=DecimalField(max_digits=18, decimal_places=2)
+)
+
+
+def group_values(products):
+    """{(category id, supplier id, VAT rate): net value} of a Product queryset, summed by the database"""
+    rows = products.order_by().values_list('category', 'supplier', 'vat_rate').annotate(value=Sum(NET_VALUE))
+    return {(category, supplier, vat_rate): value for category, supplier, vat_rate, value in rows}
+
+
+def _add(totals, key, value):
+    totals[key] = totals.get(key, 0) + value
+
+
+def _write(totals):
+    ValuationChange.objects.bulk_create([
+        ValuationChange(category_id=category, supplier_id=supplier, vat_rate=vat_rate, net_value=value)
+        for (category, supplier, vat_rate), value in totals.items() if value
+    ])
+
+
+def record_products(products, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) the value of a Product queryset; call
+    it after creating and before deleting or overwriting the products.
+    Removal locks the rows until the end of the transaction.
+    """
+    if sign < 0:
+        ids = list(products.select_for_update().order_by('pk').values_list('pk', flat=True))
+        products = Product.objects.filter(pk__in=ids)
+    _write({key: sign * value for key, value in group_values(products).items()})
+
+
+def record_stock_changes(changes):
+    """Record the value of stock changes applied by the ledger ({product id: change})"""
+    changes = {pk: change for pk, change in changes.items() if change}
+    if not changes:
+        return
+    totals = {}
+    rows = Product.objects.filter(pk__in=changes).values_list('pk', 'category', 'supplier', 'vat_rate', 'net_price')
+    for pk, category, supplier, vat_rate, net_price in rows:
+        _add(totals, (category, supplier, vat_rate), net_price * changes[pk])
+    _write(totals)
+
+
+def record_saved_product(product, stored):
+    """Record the value change of a saved product; `stored` is its row from before the save, if any"""
+    totals = {}
+    if stored is not None:
+        key = (stored['category'], stored['supplier'], stored['vat_rate'])
+        totals[key] = -stored['net_price'] * stored['stock_quantity']
+    opts = Product._meta
+    vat_rate = opts.get_field('vat_rate').to_python(product.vat_rate)
+    net_price = opts.get_field('net_price').to_python(product.net_price)
+    _add(totals, (product.category_id, product.supplier_id, vat_rate), net_price * product.stock_quantity)
+    _write(totals)
+
+
+def _lock(model, mode):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(model._meta.db_table)} IN {mode} MODE')
+
+
+def rebuild():
+    """Replace the recorded changes with the valuation computed from the products"""
+    with transaction.atomic():
+        # Keep products from changing while they are summed
+        _lock(Product, 'SHARE')
+        ValuationChange.objects.all().delete()
+        _write(group_values(Product.objects.all()))
+
+
+def compact():
+    """Fold the recorded changes into one row per group; returns the number of rows left"""
+    with transaction.atomic():
+        _lock(ValuationChange, 'EXCLUSIVE')
+        totals = current_values()
+        ValuationChange.objects.all().delete()
+        _write(totals)
+    return sum(1 for value in totals.values() if value)
+
+
+def current_values():
+    """{(category id, supplier id, VAT rate): net value} summed from the recorded changes"""
+    rows = ValuationChange.objects.order_by().values_list('category', 'supplier', 'vat_rate').annotate(
+        value=Sum('net_value')
+    )
+    # SQLite sums decimals as floats
+    return {
+        (category, supplier, vat_rate): Decimal(value).quantize(CENT)
+        for category, supplier, vat_rate, value in rows
+    }
+
+
+def freeze_snapshot(taken_at):
+    """Store the valuation of the stock snapshot taken at `taken_at`, at the prices valid then"""
+    latest = latest_prices(taken_at, product=OuterRef('product'))
+    snapshot = StockSnapshot.objects.filter(taken_at=taken_at).annotate(
+        # Products without price history yet are valued at their current price
+        net_price_at=Coalesce(Subquery(latest.values('net_price')[:1]), F('product__net_price')),
+        vat_rate_at=Coalesce(Subquery(latest.values('vat_rate')[:1]), F('product__vat_rate')),
+    )
+    value = ExpressionWrapper(
+        F('quantity') * F('net_price_at'), output_field=DecimalField(max_digits=18, decimal_places=2)
+    )
+    rows = snapshot.order_by().values_list(
+        'product__category', 'product__supplier', 'vat_rate_at'
+    ).annotate(value=Sum(value))
+    with transaction.atomic():
+        ValuationSnapshot.objects.filter(taken_at=taken_at).delete()
+        ValuationSnapshot.objects.bulk_create([
+            ValuationSnapshot(
+                taken_at=taken_at, category_id=category, supplier_id=supplier, vat_rate=vat_rate, net_value=value,
+            )
+            for category, supplier, vat_rate, value in rows if value
+        ])
+
+
+def snapshot_values(taken_at):
+    rows = ValuationSnapshot.objects.filter(taken_at=taken_at).values_list(
+        'category', 'supplier', 'vat_rate', 'net_value'
+    )
+    return {(category, supplier, vat_rate): value for category, supplier, vat_rate, value in rows}
+
+
+def snapshot_times(limit=None):
+    """Moments with a frozen valuation, newest first"""
+    times = ValuationSnapshot.objects.order_by('-taken_at').values_list('taken_at', flat=True).distinct()
+    return list(times[:limit] if limit else times)
+
+
+class ValuationLine:
+    """Net value, VAT and gross value of one line of the report"""
+
+    def __init__(self, label, depth=0):
+        self.label = label
+        self.depth = depth
+        self.net = Decimal('0.00')
+        self.vat = Decimal('0.00')
+
+    def add(self, net, vat):
+        self.net += net
+        self.vat += vat
+
+    @property
+    def gross(self):
+        return self.net + self.vat
+
+
+class Report:
+    """Valuation totals, by VAT rate, category subtree and supplier"""
+
+    def __init__(self, values, taken_at=None):
+        self.taken_at = taken_at
+        self.total = ValuationLine("Összesen")
+        vat_rates, categories, suppliers = {}, {}, {}
+        for (category, supplier, vat_rate), net in values.items():
+            net = Decimal(net).quantize(CENT)
+            if not net:
+                continue
+            # VAT is rounded once per group, half up like calculate_brutto()
+            vat = (net * Decimal(vat_rate) / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+            self.total.add(net, vat)
+            keys = ((vat_rates, Decimal(vat_rate).quantize(CENT)), (categories, category), (suppliers, supplier))
+            for lines, key in keys:
+                lines.setdefault(key, ValuationLine(None)).add(net, vat)
+
+        self.by_vat_rate = []
+        for vat_rate in sorted(vat_rates, reverse=True):
+            vat_rates[vat_rate].label = f"{vat_rate.normalize():f}%"
+            self.by_vat_rate.append(vat_rates[vat_rate])
+        self.by_category = self._category_lines(categories)
+        self.by_supplier = self._supplier_lines(suppliers)
+
+    @staticmethod
+    def _category_lines(values):
+        tree = get_category_tree()
+        paths = {category['id']: category['path'] for category in tree}
+        subtrees = {}
+        unknown = ValuationLine("Kategória nélkül")
+        for category, value in values.items():
+            if category not in paths:
+                unknown.add(value.net, value.vat)
+                continue
+            # Every category on the path gets the value of its descendants
+            for ancestor in paths[category].strip('/').split('/'):
+                subtrees.setdefault(int(ancestor), ValuationLine(None)).add(value.net, value.vat)
+        lines = []
+        for category in tree:
+            line = subtrees.get(category['id'])
+            if line is not None:
+                line.label, line.depth = category['name'], category['depth']
+                lines.append(line)
+        if unknown.net or unknown.vat:
+            lines.append(unknown)
+        return lines
+
+    @staticmethod
+    def _supplier_lines(values):
+        names = dict(Supplier.objects.filter(pk__in=[pk for pk in values if pk]).values_list('pk', 'name'))
+        for supplier, line in values.items():
+            line.label = names.get(supplier, "Szállító nélkül")
+        return sorted(values.values(), key=lambda line: line.net, reverse=True)
+
+
+def build_report(taken_at=None):
+    """Report of the current valuation, or of the snapshot taken at `taken_at`"""
+    values = current_values() if taken_at is None else snapshot_values(taken_at)
+    return Report(values, taken_at)
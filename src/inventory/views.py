@@ -1,33 +1,59 @@
+import hashlib
+import itertools
+import json
+
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, F
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from core.profiling import query_budget
 from .models import Product, Category, Supplier, StockMovement, ProductImage
-from .forms import ProductForm, CategoryForm, SupplierForm, StockMovementForm, ProductImageForm
-
-
-@login_required
-def product_list(request):
-    """List all products with search and filtering"""
-    products = Product.objects.all()
+from .forms import (
+    ProductForm, CategoryForm, SupplierForm, StockMovementForm, ProductImageForm,
+    StockMovementBatchForm, StockMovementFilterForm,
+)
+from .categories import get_category_tree
+from .export import product_rows, stream_csv, stream_xlsx
+from .ledger import InsufficientStock, book_movements
+from .pagination import paginate_request
+from . import reorder, scan, valuation
+from .search import normalize_query, search_products
+from .uploads import MAX_IMAGES, store_images
+
+
+def filter_products(request, products):
+    """Apply the `q` search and `category` subtree filters of the product lists"""
     query = request.GET.get('q')
     category_id = request.GET.get('category')
 
     if query:
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(sku__icontains=query) |
-            Q(description__icontains=query)
-        )
+        products = search_products(products, query)
 
     if category_id:
-        products = products.filter(category_id=category_id)
+        products = products.in_category_tree(category_id)
+
+    return products, query, category_id
 
-    categories = Category.objects.all()
-    low_stock_products = products.filter(stock_quantity__lte=F('min_stock_level'))
+
+@login_required
+@query_budget(8)
+def product_list(request):
+    """List all products with search and filtering"""
+    products, query, category_id = filter_products(
+        request, Product.objects.select_related('category').with_main_image().with_brutto_price()
+    )
+
+    categories = get_category_tree()
+    low_stock_products = products.filter(is_low_stock=True)
+    page = paginate_request(request, products, ['name', 'id'])
 
     context = {
-        'products': products,
+        'products': page.object_list,
+        'page': page,
         'categories': categories,
         'query': query,
         'selected_category': category_id,
@@ -37,29 +63,20 @@ def product_list(request):
 
 
 @login_required
+@query_budget(8)
 def product_warnings(request):
     """List products with warnings (low stock, negative stock)"""
-    products = Product.objects.filter(
-        Q(stock_quantity__lte=F('min_stock_level')) | Q(stock_quantity__lt=0)
-    ).order_by('stock_quantity')  # Negative first, then low stock
-
-    query = request.GET.get('q')
-    category_id = request.GET.get('category')
-
-    if query:
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(sku__icontains=query) |
-            Q(description__icontains=query)
-        )
-
-    if category_id:
-        products = products.filter(category_id=category_id)
+    products, query, category_id = filter_products(
+        request, Product.objects.filter(is_low_stock=True).select_related('category').with_brutto_price()
+    )
 
-    categories = Category.objects.all()
+    categories = get_category_tree()
+    # Negative first, then low stock
+    page = paginate_request(request, products, ['stock_quantity', 'name', 'id'])
 
     context = {
-        'products': products,
+        'products': page.object_list,
+        'page': page,
         'categories': categories,
         'query': query,
         'selected_category': category_id,
@@ -67,11 +84,174 @@ def product_warnings(request):
     return render(request, 'inventory/product_warnings.html', context)
 
 
+VALUATION_SNAPSHOT_CHOICES = 36
+
+
+@login_required
+@query_budget(8)
+def valuation_report(request):
+    """Stock value by category subtree, supplier and VAT rate, now or at a stock snapshot"""
+    times = valuation.snapshot_times(VALUATION_SNAPSHOT_CHOICES)
+    selected = request.GET.get('at', '')
+    taken_at = next((moment for moment in times if str(int(moment.timestamp())) == selected), None)
+
+    context = {
+        'report': valuation.build_report(taken_at),
+        'snapshot_times': [(str(int(moment.timestamp())), moment) for moment in times],
+        'selected': selected if taken_at else '',
+    }
+    return render(request, 'inventory/valuation_report.html', context)
+
+
+REORDER_LINES = 500
+
+
+@login_required
+@query_budget(8)
+def reorder_suggestions(request):
+    """Suggested purchase list per supplier, from the consumption velocity of the products"""
+    supplier_id = request.GET.get('supplier', '')
+    lines = reorder.suggestions(Product.objects.select_related('supplier'))
+    if supplier_id == 'none':
+        lines = lines.filter(supplier__isnull=True)
+    elif supplier_id.isdigit():
+        lines = lines.filter(supplier=supplier_id)
+    else:
+        supplier_id = ''
+    lines = list(lines[:REORDER_LINES + 1])
+
+    groups = []
+    for supplier, products in itertools.groupby(lines[:REORDER_LINES], key=lambda product: product.supplier):
+        products = list(products)
+        for product in products:
+            product.order_value = product.suggested_quantity * product.net_price
+        lead_time_days = getattr(supplier, 'lead_time_days', None)
+        groups.append({
+            'supplier': supplier,
+            'lead_time_days': reorder.lead_time_days() if lead_time_days is None else lead_time_days,
+            'products': products,
+            'value': sum(product.order_value for product in products),
+        })
+
+    context = {
+        'groups': groups,
+        'truncated': len(lines) > REORDER_LINES,
+        'supplier_totals': reorder.supplier_totals(),
+        'selected_supplier': supplier_id,
+        'refreshed_at': reorder.last_refresh(),
+        'cover_days': reorder.cover_days(),
+    }
+    return render(request, 'inventory/reorder_suggestions.html', context)
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', stream_xlsx),
+}
+
+
+@login_required
+def product_export(request, fmt):
+    """Stream the filtered product list as CSV or XLSX"""
+    if fmt not in EXPORT_FORMATS:
+        raise Http404("Ismeretlen export formátum.")
+    content_type, stream = EXPORT_FORMATS[fmt]
+    products, _, _ = filter_products(request, Product.objects.all())
+    response = StreamingHttpResponse(stream(product_rows(products)), content_type=content_type)
+    filename = f"termekek-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+LIVE_SEARCH_MIN_LENGTH = 3
+LIVE_SEARCH_LIMIT = 10
+LIVE_SEARCH_MAX_LIMIT = 50
+
+
+@login_required
+@query_budget(4)
+def product_search_json(request):
+    """Search-as-you-type: top matches as compact JSON, cached and ETag-tagged"""
+    raw_query = request.GET.get('q', '').strip()
+    query = normalize_query(raw_query)
+    category_id = request.GET.get('category', '')
+    try:
+        limit = min(int(request.GET.get('limit', LIVE_SEARCH_LIMIT)), LIVE_SEARCH_MAX_LIMIT)
+    except ValueError:
+        limit = LIVE_SEARCH_LIMIT
+    if not category_id.isdigit():
+        category_id = ''
+
+    # A single word may be a code, matched exactly as typed; otherwise word
+    # order and case do not change the results
+    code = raw_query if len(raw_query.split()) == 1 else ''
+    key = 'inventory:search:' + hashlib.md5(f'{query}|{code}|{category_id}|{limit}'.encode()).hexdigest()
+    cached = cache.get(key)
+    if cached is None:
+        results = []
+        if len(query) >= LIVE_SEARCH_MIN_LENGTH and limit > 0:
+            products = Product.objects.all()
+            if category_id:
+                products = products.in_category_tree(category_id)
+            products = search_products(products, raw_query, ranked=True)
+            results = [
+                {'id': pk, 'sku': sku, 'name': name, 'ean13': ean13, 'stock': stock}
+                for pk, sku, name, ean13, stock in products.values_list(
+                    'id', 'sku', 'name', 'ean13', 'stock_quantity'
+                )[:limit]
+            ]
+        body = json.dumps({'query': query, 'results': results})
+        etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+        cached = (body, etag)
+        cache.set(key, cached, settings.INVENTORY_SEARCH_CACHE_TTL)
+
+    body, etag = cached
+    max_age = f'private, max-age={settings.INVENTORY_SEARCH_CACHE_TTL}'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = max_age
+    return response
+
+
+@login_required
+@query_budget(4)
+def scan_lookup(request, code):
+    """Resolve a scanned EAN-13 or SKU to a compact product payload"""
+    payload = scan.lookup(code)
+    if payload is None:
+        return JsonResponse({'code': code, 'error': 'Ismeretlen vonalkód vagy cikkszám.'}, status=404)
+    return JsonResponse(payload)
+
+
+@login_required
+@query_budget(4)
+def scan_batch(request):
+    """Resolve many codes at once: POST {"codes": [...]} or GET ?code=...&code=..."""
+    if request.method == 'POST':
+        try:
+            codes = json.loads(request.body)['codes']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Érvénytelen kérés.'}, status=400)
+        if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+            return JsonResponse({'error': 'Érvénytelen kérés.'}, status=400)
+    else:
+        codes = request.GET.getlist('code')
+    if len(codes) > scan.MAX_BATCH_CODES:
+        return JsonResponse({'error': f'Legfeljebb {scan.MAX_BATCH_CODES} kód kérdezhető le egyszerre.'}, status=400)
+    return JsonResponse({'results': scan.lookup_many(codes)})
+
+
 @login_required
+@query_budget(12)
 def product_detail(request, pk):
     """Show product details"""
-    product = get_object_or_404(Product, pk=pk)
-    stock_movements = StockMovement.objects.filter(product=product).order_by('-created_at')[:10]
+    product = get_object_or_404(Product.objects.select_related('category', 'supplier').with_brutto_price(), pk=pk)
+    stock_movements = StockMovement.objects.filter(product=product).select_related(
+        'product', 'created_by'
+    ).order_by('-created_at', '-id')[:10]
 
     context = {
         'product': product,
@@ -91,16 +271,13 @@ def product_create(request):
             # Ensure net_price from cleaned_data (clean() may have calculated it from gross)
             net_price = form.cleaned_data['net_price']
             product.net_price = net_price
-            product.save()
+            product.save(changed_by=request.user)
 
-            # Handle image uploads (no deletions on create)
+            # Handle image uploads (no deletions on create, max 5 images)
             images = request.FILES.getlist('images')
-            # Only allow up to 5 images total
-            current_image_count = product.images.count()
-            max_new = max(0, 5 - current_image_count)
-            for image in images[:max_new]:
-                ProductImage.objects.create(product=product, image=image)
-            
+            for error in store_images(product, images[:MAX_IMAGES]):
+                messages.warning(request, error)
+
             messages.success(request, f'Termék "{product.name}" sikeresen létrehozva.')
             return redirect('inventory:product_detail', pk=product.pk)
     else:
@@ -113,7 +290,7 @@ def product_create(request):
 @login_required
 def product_update(request, pk):
     """Update an existing product"""
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(Product.objects.with_brutto_price(), pk=pk)
 
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
@@ -122,7 +299,7 @@ def product_update(request, pk):
             product = form.save(commit=False)
             net_price = form.cleaned_data['net_price']
             product.net_price = net_price
-            product.save()
+            product.save(changed_by=request.user)
 
             # Handle image deletions first so we free up slots for new uploads
             delete_image_ids = request.POST.getlist('delete_images')
@@ -131,11 +308,10 @@ def product_update(request, pk):
 
             # Handle image uploads (respect max 5 images total)
             images = request.FILES.getlist('images')
-            current_image_count = product.images.count()
-            max_new_images = max(0, 5 - current_image_count)
-            for image in images[:max_new_images]:
-                ProductImage.objects.create(product=product, image=image)
-            
+            max_new_images = max(0, MAX_IMAGES - product.images.count())
+            for error in store_images(product, images[:max_new_images]):
+                messages.warning(request, error)
+
             messages.success(request, f'Termék "{product.name}" sikeresen módosítva. Nettó ár: {product.net_price}, Bruttó ár: {product.brutto_price}')
             return redirect('inventory:product_detail', pk=product.pk)
     else:
@@ -291,11 +467,21 @@ def supplier_delete(request, pk):
 
 
 @login_required
+@query_budget(6)
 def stock_movement_list(request):
-    """List stock movements"""
-    movements = StockMovement.objects.select_related('product', 'created_by').order_by('-created_at')
+    """List stock movements, newest first, filtered and keyset paginated"""
+    movements = StockMovement.objects.select_related('product', 'created_by')
+    form = StockMovementFilterForm(request.GET)
+    if form.is_valid():
+        movements = form.filter(movements)
+    else:
+        movements = movements.none()
+
+    page = paginate_request(request, movements, ['-created_at', '-id'])
     return render(request, 'inventory/stock_movement_list.html', {
-        'movements': movements
+        'movements': page.object_list,
+        'page': page,
+        'form': form,
     })
 
 
@@ -307,11 +493,20 @@ def stock_movement_create(request):
         if form.is_valid():
             movement = form.save(commit=False)
             movement.created_by = request.user
-            movement.save()
-            messages.success(request, 'Készletmozgás sikeresen rögzítve.')
-            return redirect('inventory:stock_movement_list')
+            try:
+                movement.save()
+            except InsufficientStock as e:
+                form.add_error('quantity', e)
+            else:
+                messages.success(request, 'Készletmozgás sikeresen rögzítve.')
+                return redirect('inventory:stock_movement_list')
     else:
-        form = StockMovementForm()
+        # Links from a product pass its id; the form takes its code
+        product_id = request.GET.get('product', '')
+        sku = None
+        if product_id.isdigit():
+            sku = Product.objects.filter(pk=product_id).values_list('sku', flat=True).first()
+        form = StockMovementForm(initial={'code': sku} if sku else None)
 
     return render(request, 'inventory/stock_movement_form.html', {
         'form': form,
@@ -319,6 +514,42 @@ def stock_movement_create(request):
     })
 
 
+@login_required
+def stock_movement_batch(request):
+    """Book many stock movements (e.g. a pallet goods receipt) at once"""
+    result = None
+    if request.method == 'POST':
+        form = StockMovementBatchForm(request.POST)
+        if form.is_valid():
+            result = book_movements(form.get_lines(), user=request.user)
+            if result.ok:
+                messages.success(request, f'{len(result.movements)} készletmozgás sikeresen rögzítve.')
+                return redirect('inventory:stock_movement_list')
+    else:
+        form = StockMovementBatchForm()
+
+    return render(request, 'inventory/stock_movement_batch_form.html', {
+        'form': form,
+        'result': result,
+        'title': 'Tömeges készletmozgás'
+    })
+
+
+@login_required
+@require_POST
+def stock_movement_batch_api(request):
+    """JSON batch booking: {"lines": [{"code"|"product", "movement_type", "quantity", "reason"}]}"""
+    try:
+        lines = json.loads(request.body)['lines']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'ok': False, 'errors': [{'line': None, 'error': 'Érvénytelen kérés.'}]}, status=400)
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+        return JsonResponse({'ok': False, 'errors': [{'line': None, 'error': 'Érvénytelen kérés.'}]}, status=400)
+
+    result = book_movements(lines, user=request.user)
+    return JsonResponse(result.as_dict(), status=200 if result.ok else 400)
+
+
 @login_required
 def add_to_order(request, pk):
     """Add a product to a simple session-based cart (placeholder for future order module)"""